@@ -0,0 +1,37 @@
+"""
+Compares two result files written by bench --output or benchmarks/suite.py,
+exiting with 1 when a workload's ops/s dropped by more than the tolerance.
+
+    python benchmarks/compare.py baseline.json current.json --tolerance 0.1
+"""
+import argparse
+import json
+import sys
+
+import typer
+
+from s3_tool import benchmark
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Drop in ops/s reported as a regression, 0.1 is 10%%",
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    report, regressed = benchmark.compare(baseline, current, args.tolerance)
+    typer.echo(f"{baseline['version']} -> {current['version']}")
+    typer.echo(report)
+    for workload in regressed:
+        typer.echo(f"Regression -> {workload}", err=True)
+    sys.exit(1 if regressed else 0)
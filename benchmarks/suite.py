@@ -0,0 +1,67 @@
+"""
+Runs bench with the standard profiles, writing one result file per profile
+to benchmarks/results named after the installed version.
+
+    python benchmarks/suite.py
+    python benchmarks/compare.py benchmarks/results/0.3.5-small.json \
+        benchmarks/results/0.3.6-small.json
+
+Results are only comparable between runs on the same machine.
+"""
+import argparse
+import os
+import sys
+
+import typer
+
+from s3_tool import __version__, main
+
+# name: (objects, size, threads)
+PROFILES = {
+    # Many small objects, bound by requests per second
+    "small": (1000, "4KB", 16),
+    # Single request objects, bound by both
+    "medium": (100, "1MB", 8),
+    # Multipart objects, bound by bytes per second
+    "large": (4, "64MB", 4),
+}
+
+
+def run(profiles, output_dir: str) -> int:
+    os.makedirs(output_dir, exist_ok=True)
+    failed = 0
+    for name in profiles:
+        objects, size, threads = PROFILES[name]
+        output = os.path.join(output_dir, f"{__version__}-{name}.json")
+        typer.echo(f"\n{name}: {objects} objects of {size}, {threads} threads")
+        try:
+            main.bench(
+                objects=objects,
+                size=size,
+                threads=threads,
+                workloads=[],
+                output=output,
+            )
+        except typer.Exit as e:
+            failed += bool(e.exit_code)
+        typer.echo(f"Written to {output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "profiles",
+        nargs="*",
+        metavar="PROFILE",
+        help=f"One of {', '.join(PROFILES)}. All of them by default",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=os.path.join(os.path.dirname(__file__), "results"),
+    )
+    args = parser.parse_args()
+    unknown = set(args.profiles) - set(PROFILES)
+    if unknown:
+        parser.error(f"Unknown profiles: {', '.join(sorted(unknown))}")
+    sys.exit(run(args.profiles or list(PROFILES), args.output_dir))
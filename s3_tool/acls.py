@@ -0,0 +1,42 @@
+ALL_USERS = "http://acs.amazonaws.com/groups/global/AllUsers"
+AUTHENTICATED_USERS = "http://acs.amazonaws.com/groups/global/AuthenticatedUsers"
+
+# Grants each canned ACL gives on top of the owner's FULL_CONTROL.
+# aws-exec-read and bucket-owner-* depend on accounts not found in the
+# object's ACL, so they are left out and always written
+CANNED_GRANTS = {
+    "private": set(),
+    "public-read": {(ALL_USERS, "READ")},
+    "public-read-write": {(ALL_USERS, "READ"), (ALL_USERS, "WRITE")},
+    "authenticated-read": {(AUTHENTICATED_USERS, "READ")},
+}
+
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+
+def _grantee(grant: dict) -> str:
+    grantee = grant["Grantee"]
+    return grantee.get("URI") or grantee.get("ID") or grantee.get("EmailAddress")
+
+
+def has_canned_acl(acl: dict, canned: str) -> bool:
+    """Checks a GetObjectAcl response against the grants of a canned ACL"""
+    if canned not in CANNED_GRANTS:
+        return False
+    expected = {(acl["Owner"]["ID"], "FULL_CONTROL")} | CANNED_GRANTS[canned]
+    grants = {(_grantee(g), g["Permission"]) for g in acl.get("Grants", [])}
+    return grants == expected
+
+
+def set_acl(client, bucket: str, key: str, canned: str, diff: bool = False) -> str:
+    """
+    Sets a canned ACL on an object. With diff, the current grants are read
+    first and the ACL is only written when they differ. Returns CHANGED or
+    UNCHANGED.
+    """
+    if diff and has_canned_acl(client.get_object_acl(Bucket=bucket, Key=key), canned):
+        return UNCHANGED
+    client.put_object_acl(Bucket=bucket, Key=key, ACL=canned)
+    return CHANGED
@@ -0,0 +1,279 @@
+"""
+asyncio engine for upload, download, move-object and change-permissions.
+Objects are sent with single requests (PutObject, GetObject, CopyObject), so
+it suits large batches of small objects rather than multi-GB files.
+"""
+import asyncio
+import mimetypes
+import os
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Tuple,
+    Union,
+)
+
+from s3_tool import metrics, progress, throttling
+from s3_tool.deletion import iter_batches
+from s3_tool.options import Options
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:  # pragma: no cover
+    get_session = None
+
+# Size of the chunks streamed from GetObject bodies into local files
+CHUNK_SIZE = 1024 * 1024
+
+
+def create_client(login_data: dict, limit: int, options: Options = Options()):
+    """
+    Builds an aiobotocore client from the login_data get_login connected
+    with: the same endpoint and credentials as the (sync) client, and the
+    same retry settings. Its connection pool is sized to limit, the amount
+    of requests allowed in flight.
+    """
+    if get_session is None:
+        raise ImportError(
+            'The async engine needs aiobotocore. Install it with: pip install "s3-tool[async]"'
+        )
+
+    return get_session().create_client(
+        "s3",
+        endpoint_url=login_data["endpoint_url"],
+        aws_access_key_id=login_data["aws_access_key_id"],
+        aws_secret_access_key=login_data["aws_secret_access_key"],
+        config=AioConfig(
+            max_pool_connections=limit,
+            retries=throttling.retries(options.retry_mode, options.max_attempts),
+        ),
+    )
+
+
+def in_flight(limit: int, max_requests: int = 0) -> int:
+    """
+    limit, capped by --max-requests when one is set. The cap is fixed: the
+    budget's adaptive limit is thread based and can not pause coroutines.
+    """
+    return min(limit, max_requests) if max_requests > 0 else limit
+
+
+def attach(aclient, options: Options = Options()) -> None:
+    """Instruments aclient as get_login does the sync client"""
+    if options.metrics_enabled:
+        metrics.attach_async(aclient)
+    throttling.attach_async(aclient, options.max_rate)
+
+
+async def _aiter(items: Union[Iterable, AsyncIterator]) -> AsyncIterator:
+    if hasattr(items, "__aiter__"):
+        async for item in items:  # type: ignore
+            yield item
+    else:
+        for item in items:  # type: ignore
+            yield item
+
+
+async def run_bounded(
+    func: Callable[..., Awaitable],
+    items: Union[Iterable, AsyncIterator],
+    limit: int,
+    tracker: Union[progress.Progress, None] = None,
+) -> List[Tuple[object, Exception]]:
+    """
+    Awaits func(item) for every item with at most limit calls in
+    flight. Items are pulled only when a slot frees up, so items can be a
+    lazy listing. Returns the (item, exception) pairs of the calls that failed.
+    """
+    semaphore = asyncio.Semaphore(limit)
+    failed: List[Tuple[object, Exception]] = []
+    tasks = set()
+
+    async def run(item):
+        try:
+            await func(item)
+        except Exception as e:
+            failed.append((item, e))
+            if tracker is not None:
+                tracker.object_failed()
+        else:
+            if tracker is not None:
+                tracker.object_done()
+        finally:
+            semaphore.release()
+
+    async for item in _aiter(items):
+        await semaphore.acquire()
+        task = asyncio.create_task(run(item))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+    return failed
+
+
+async def _expected(items: AsyncIterator, tracker: progress.Progress) -> AsyncIterator:
+    """Adds the items of a listing to the totals of tracker as they are read"""
+    async for item in items:
+        tracker.expect()
+        yield item
+    tracker.totals_known()
+
+
+async def iter_keys(aclient, bucket: str, prefix: str) -> AsyncIterator[str]:
+    paginator = aclient.get_paginator("list_objects_v2")
+    async for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"]
+
+
+async def upload(
+    login_data: dict,
+    bucket: str,
+    files: List[str],
+    upload_path: str,
+    permission: str,
+    limit: int,
+    options: Options = Options(),
+) -> List[Tuple[object, Exception]]:
+    limit = in_flight(limit, options.max_requests)
+
+    async def put(file_path: str):
+        mimetype, _ = mimetypes.guess_type(file_path)
+        body = await asyncio.to_thread(Path(file_path).read_bytes)
+        await aclient.put_object(
+            Bucket=bucket,
+            Key=f"{upload_path}/{Path(file_path).name}",
+            Body=body,
+            ContentType=mimetype or "",
+            ACL=permission,
+        )
+        tracker.add_bytes(len(body))
+
+    tracker = options.tracker(
+        "upload",
+        total_bytes=sum(os.path.getsize(file_path) for file_path in files),
+        total_objects=len(files),
+    )
+    tracker.totals_known()
+    with tracker:
+        async with create_client(login_data, limit, options) as aclient:
+            attach(aclient, options)
+            failed = await run_bounded(put, files, limit, tracker)
+    return failed
+
+
+async def download(
+    login_data: dict,
+    bucket: str,
+    keys: Union[List[str], None],
+    download_path: str,
+    limit: int,
+    destination: Callable[[str, str, bool], str],
+    recursive: Union[str, None] = None,
+    options: Options = Options(),
+) -> List[Tuple[object, Exception]]:
+    """
+    Downloads a list of keys, or every key under the recursive prefix.
+    destination(key, download_path, recursive) gives the local path of a key.
+    """
+    limit = in_flight(limit, options.max_requests)
+
+    async def get(key: str):
+        dest = destination(key, download_path, recursive is not None)
+        response = await aclient.get_object(Bucket=bucket, Key=key)
+        async with response["Body"] as stream:
+            with open(dest, "wb") as f:
+                while chunk := await stream.read(CHUNK_SIZE):
+                    f.write(chunk)
+                    tracker.add_bytes(len(chunk))
+
+    tracker = options.tracker("download", total_objects=len(keys or []))
+    with tracker:
+        async with create_client(login_data, limit, options) as aclient:
+            attach(aclient, options)
+            if recursive:
+                items = _expected(iter_keys(aclient, bucket, recursive), tracker)
+            else:
+                tracker.totals_known()
+                items = keys
+            failed = await run_bounded(get, items, limit, tracker)  # type: ignore
+    return failed
+
+
+async def move(
+    login_data: dict,
+    bucket: str,
+    moves: Dict[str, str],
+    permission: str,
+    limit: int,
+    options: Options = Options(),
+) -> List[Tuple[object, Exception]]:
+    """
+    Copies every origin key to its destination server side, then deletes
+    the origins that were copied in DeleteObjects batches.
+    """
+    limit = in_flight(limit, options.max_requests)
+    copied: List[str] = []
+    delete_errors: List[Tuple[object, Exception]] = []
+
+    async def copy(orig: str):
+        await aclient.copy_object(
+            Bucket=bucket,
+            Key=moves[orig],
+            CopySource={"Bucket": bucket, "Key": orig},
+            MetadataDirective="COPY",
+            ACL=permission,
+        )
+        copied.append(orig)
+
+    async def delete(keys: List[str]):
+        response = await aclient.delete_objects(
+            Bucket=bucket, Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True}
+        )
+        for error in response.get("Errors", []):
+            delete_errors.append((error["Key"], Exception(error.get("Message"))))
+
+    tracker = options.tracker("move", total_objects=len(moves))
+    tracker.totals_known()
+    with tracker:
+        async with create_client(login_data, limit, options) as aclient:
+            attach(aclient, options)
+            failed = await run_bounded(copy, moves, limit, tracker)
+            failed += await run_bounded(delete, iter_batches(copied), limit)
+    return failed + delete_errors
+
+
+async def change_permissions(
+    login_data: dict,
+    bucket: str,
+    prefixes: List[str],
+    permission: str,
+    limit: int,
+    options: Options = Options(),
+) -> List[Tuple[object, Exception]]:
+    limit = in_flight(limit, options.max_requests)
+
+    async def put_acl(key: str):
+        await aclient.put_object_acl(Bucket=bucket, Key=key, ACL=permission)
+
+    async def keys():
+        for prefix in prefixes:
+            async for key in iter_keys(aclient, bucket, prefix):
+                yield key
+
+    with options.tracker("change-permissions") as tracker:
+        async with create_client(login_data, limit, options) as aclient:
+            attach(aclient, options)
+            failed = await run_bounded(
+                put_acl, _expected(keys(), tracker), limit, tracker
+            )
+    return failed
@@ -0,0 +1,227 @@
+"""
+Throughput benchmarks of the tool's own commands against a local S3 server.
+The server is moto's, run on a thread of the same process, so results are
+only comparable between runs on the same machine, but they tell whether a
+change made a command faster or slower.
+"""
+import json
+import logging
+import os
+import socket
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
+
+from s3_tool import __version__, metrics
+
+WORKLOADS = (
+    "upload",
+    "list",
+    "download",
+    "change-permissions",
+    "move",
+    "delete",
+)
+
+# Operations whose latency is reported for each workload, the others they
+# send (listings of download, deletes of move...) are only counted
+LATENCY_OPERATIONS = {
+    "upload": ("PutObject", "UploadPart"),
+    "list": ("ListObjects", "ListObjectsV2"),
+    "download": ("GetObject",),
+    "change-permissions": ("PutObjectAcl",),
+    "move": ("CopyObject", "UploadPartCopy"),
+    "delete": ("DeleteObjects", "DeleteObject"),
+}
+
+BUCKET = "s3-tool-bench"
+
+# Largest block of random data written at once when creating files
+_BLOCK_SIZE = 1024 * 1024
+
+
+class Result(NamedTuple):
+    workload: str
+    objects: int
+    bytes: int
+    seconds: float
+    requests: int
+    errors: int
+    p50: float
+    p99: float
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.objects / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1024**2 / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            **self._asdict(),
+            "ops_per_second": round(self.ops_per_second, 2),
+            "mb_per_second": round(self.mb_per_second, 2),
+        }
+
+
+class LocalServer:
+    """moto's S3 server on a free local port"""
+
+    def __init__(self, host: str = "127.0.0.1"):
+        # Imported here, moto takes a while to import and only bench needs it
+        try:
+            from moto.server import ThreadedMotoServer
+        except ImportError:
+            raise ImportError(
+                "bench needs the moto server. "
+                'Install it with: pip install "s3-tool[bench]"'
+            )
+        self.host = host
+        with socket.socket() as s:
+            s.bind((host, 0))
+            self.port = s.getsockname()[1]
+        self._server = ThreadedMotoServer(
+            ip_address=host, port=self.port, verbose=False
+        )
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "LocalServer":
+        # Every request would be logged to stderr
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self._server.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.stop()
+
+
+def login_data(server: LocalServer) -> dict:
+    """What get_login caches, pointing at the local server's bucket"""
+    return {
+        "endpoint_url": server.endpoint_url,
+        "aws_access_key_id": "bench",
+        "aws_secret_access_key": "bench",
+        "bucket": BUCKET,
+    }
+
+
+def create_bucket(client) -> None:
+    region = client.meta.region_name
+    if region and region != "us-east-1":
+        client.create_bucket(
+            Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": region}
+        )
+    else:
+        client.create_bucket(Bucket=BUCKET)
+
+
+def make_files(directory: str, count: int, size: int) -> List[str]:
+    """count files of size random bytes, all with the same contents"""
+    block = os.urandom(min(size, _BLOCK_SIZE))
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"object-{i:06d}.bin")
+        with open(path, "wb") as f:
+            left = size
+            while left > 0:
+                f.write(block[:left])
+                left -= len(block)
+        paths.append(path)
+    return paths
+
+
+def measure(workload: str, run: Callable[[], None], objects: int, size: int) -> Result:
+    """
+    Runs a workload and times it, reading the latency of its requests from
+    the metrics recorded meanwhile. size is the bytes moved per object, 0
+    for workloads that move no data.
+    """
+    metrics.reset()
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+
+    recorded = metrics.operations()
+    latency = metrics.Operation()
+    for name in LATENCY_OPERATIONS[workload]:
+        if name in recorded:
+            latency.add(recorded[name])
+    return Result(
+        workload,
+        objects,
+        objects * size,
+        round(seconds, 4),
+        sum(operation.requests for operation in recorded.values()),
+        sum(operation.errors for operation in recorded.values()),
+        round(latency.percentile(0.5), 6),
+        round(latency.percentile(0.99), 6),
+    )
+
+
+def table(results: Iterable[Result]) -> str:
+    lines = [
+        f"{'workload':<20}{'objects':>9}{'seconds':>10}{'ops/s':>10}"
+        f"{'MB/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r.workload:<20}{r.objects:>9}{r.seconds:>10.2f}"
+            f"{r.ops_per_second:>10.1f}{r.mb_per_second:>10.2f}"
+            f"{r.p50 * 1000:>10.1f}{r.p99 * 1000:>10.1f}{r.errors:>8}"
+        )
+    return "\n".join(lines)
+
+
+def as_json(results: Iterable[Result], settings: Dict[str, Union[int, str]]) -> str:
+    return json.dumps(
+        {
+            "version": __version__,
+            "settings": settings,
+            "results": [r.as_dict() for r in results],
+        },
+        indent=2,
+    )
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(
+    baseline: dict, current: dict, tolerance: float = 0.1
+) -> Tuple[str, List[str]]:
+    """
+    Compares two results written by bench --output, workload by workload.
+    Returns a table of the changes and the workloads whose ops/s dropped by
+    more than tolerance (0.1 is 10%). Latencies are shown but not judged,
+    their tails are too noisy on a shared machine.
+    """
+    before = {r["workload"]: r for r in baseline["results"]}
+    lines = [
+        f"{'workload':<20}{'ops/s':>12}{'change':>10}{'MB/s':>10}"
+        f"{'p50':>10}{'p99':>10}"
+    ]
+    regressed = []
+    for r in current["results"]:
+        old = before.get(r["workload"])
+        if old is None:
+            continue
+        lines.append(
+            f"{r['workload']:<20}{r['ops_per_second']:>12.1f}"
+            f"{_change(old['ops_per_second'], r['ops_per_second']):>10}"
+            f"{_change(old['mb_per_second'], r['mb_per_second']):>10}"
+            f"{_change(old['p50'], r['p50']):>10}"
+            f"{_change(old['p99'], r['p99']):>10}"
+        )
+        if r["ops_per_second"] < old["ops_per_second"] * (1 - tolerance):
+            regressed.append(r["workload"])
+    if baseline.get("settings") != current.get("settings"):
+        lines.append("Warning: the runs were made with different settings")
+    return "\n".join(lines), regressed
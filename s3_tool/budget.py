@@ -0,0 +1,157 @@
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Union
+
+from s3_tool import throttling
+
+_budgets: Dict[str, "RequestBudget"] = {}
+_budgets_lock = threading.Lock()
+
+
+class RequestBudget:
+    """
+    Caps the requests in flight against an endpoint, whatever thread pools
+    they come from. Threads waiting for a slot are queued by group (e.g.
+    the prefix they work on) and freed slots go to the groups in turn, so a
+    group with many threads does not starve the others.
+
+    A slot is held from the moment a request is sent until its response
+    arrives, but not while a streamed body is being read or a retry waits.
+
+    The limit adapts to the endpoint (AIMD): a throttled response (503
+    SlowDown) halves it, and every limit clean responses in a row raise it
+    by one, up to the configured limit again.
+    """
+
+    def __init__(self, limit: int):
+        self.ceiling = limit
+        self.limit = limit
+        self.lowest = limit
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._waiting: Dict[object, Deque[threading.Event]] = {}
+        self._local = threading.local()
+        self._clean = 0
+        self._since_cut = limit
+
+    def acquire(self) -> None:
+        group = getattr(self._local, "group", None)
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiting:
+                self._in_flight += 1
+                return
+            slot = threading.Event()
+            self._waiting.setdefault(group, deque()).append(slot)
+        slot.wait()
+
+    def _next_waiter(self) -> threading.Event:
+        group = next(iter(self._waiting))
+        waiters = self._waiting.pop(group)
+        slot = waiters.popleft()
+        # The group served goes to the back of the line
+        if waiters:
+            self._waiting[group] = waiters
+        return slot
+
+    def release(self) -> None:
+        with self._lock:
+            # After a cut, slots are given up until under the new limit
+            if not self._waiting or self._in_flight > self.limit:
+                self._in_flight -= 1
+                return
+            slot = self._next_waiter()
+        # The slot is handed over, the amount in flight stays the same
+        slot.set()
+
+    def throttled(self) -> None:
+        with self._lock:
+            self._clean = 0
+            # Responses to requests sent before the last cut don't cut again
+            if self._since_cut < self.limit:
+                return
+            self._since_cut = 0
+            self.limit = max(1, self.limit // 2)
+            self.lowest = min(self.lowest, self.limit)
+
+    def succeeded(self) -> None:
+        freed = []
+        with self._lock:
+            self._since_cut += 1
+            self._clean += 1
+            if self._clean < self.limit or self.limit >= self.ceiling:
+                return
+            self._clean = 0
+            self.limit += 1
+            while self._waiting and self._in_flight < self.limit:
+                self._in_flight += 1
+                freed.append(self._next_waiter())
+        for slot in freed:
+            slot.set()
+
+    def grouped(self, group, func: Callable) -> Callable:
+        """Wraps func so the requests it sends wait in group's line"""
+
+        def wrapper(*args, **kwargs):
+            previous = getattr(self._local, "group", None)
+            self._local.group = group
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.group = previous
+
+        return wrapper
+
+    def _before_send(self, **kwargs) -> None:
+        # A request that failed while its response was parsed never got
+        # response-received, its slot is reused instead of leaking
+        if not getattr(self._local, "holding", False):
+            self.acquire()
+            self._local.holding = True
+
+    def _response_received(self, parsed_response=None, **kwargs) -> None:
+        if throttling.is_throttled(parsed_response):
+            self.throttled()
+        else:
+            self.succeeded()
+        if getattr(self._local, "holding", False):
+            self._local.holding = False
+            self.release()
+
+    def attach(self, client) -> None:
+        client.meta.events.register("before-send.s3", self._before_send)
+        client.meta.events.register("response-received.s3", self._response_received)
+
+
+def for_endpoint(endpoint_url: str, limit: int) -> Union[RequestBudget, None]:
+    """
+    The budget shared by every client of an endpoint, allowing limit
+    requests in flight, None when limit is 0
+    """
+    if limit <= 0:
+        return None
+    with _budgets_lock:
+        budget = _budgets.get(endpoint_url)
+        if budget is None or budget.ceiling != limit:
+            budget = _budgets[endpoint_url] = RequestBudget(limit)
+        return budget
+
+
+def attach(client, limit: int) -> Union[RequestBudget, None]:
+    """Makes client's requests count against its endpoint's budget"""
+    budget = for_endpoint(client.meta.endpoint_url, limit)
+    if budget is not None:
+        budget.attach(client)
+    return budget
+
+
+def grouped(client, group, func: Callable, limit: int) -> Callable:
+    """
+    Wraps func to queue in group's line for client's endpoint, if its
+    requests are limited
+    """
+    if client is None:
+        return func
+    budget = for_endpoint(client.meta.endpoint_url, limit)
+    if budget is None:
+        return func
+    return budget.grouped(group, func)
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class Directions(str, Enum):
+    up = "up"
+    down = "down"
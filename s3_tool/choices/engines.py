@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class Engines(str, Enum):
+    threads = "threads"
+    asyncio = "async"
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class ManifestFormats(str, Enum):
+    commas = "commas"
+    lines = "lines"
+    nul = "nul"
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class MetricsFormats(str, Enum):
+    json = "json"
+    prometheus = "prometheus"
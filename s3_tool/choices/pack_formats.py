@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class PackFormats(str, Enum):
+    tar = "tar"
+    zip = "zip"
@@ -0,0 +1,9 @@
+from enum import Enum
+
+
+class ProgressModes(str, Enum):
+    auto = "auto"
+    bar = "bar"
+    summary = "summary"
+    json = "json"
+    none = "none"
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class RetryModes(str, Enum):
+    legacy = "legacy"
+    standard = "standard"
+    adaptive = "adaptive"
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class SkipModes(str, Enum):
+    mtime = "mtime"
+    etag = "etag"
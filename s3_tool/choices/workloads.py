@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class Workloads(str, Enum):
+    upload = "upload"
+    list = "list"
+    download = "download"
+    change_permissions = "change-permissions"
+    move = "move"
+    delete = "delete"
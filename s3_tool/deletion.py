@@ -0,0 +1,57 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+# DeleteObjects accepts at most this many keys per request
+MAX_BATCH_SIZE = 1000
+
+
+def iter_batches(
+    keys: Iterable[str], size: int = MAX_BATCH_SIZE
+) -> Iterator[List[str]]:
+    """Groups a (possibly lazy) stream of keys into lists of at most size keys"""
+    keys = iter(keys)
+    while batch := list(islice(keys, size)):
+        yield batch
+
+
+def delete_batch(client, bucket: str, keys: List[str]) -> Tuple[List[str], List[dict]]:
+    """
+    Deletes up to 1000 keys with a single DeleteObjects request.
+    Returns the deleted keys and the per-key errors reported by S3.
+    """
+    response = client.delete_objects(
+        Bucket=bucket,
+        Delete={"Objects": [{"Key": k} for k in keys], "Quiet": False},
+    )
+    deleted = [d["Key"] for d in response.get("Deleted", [])]
+    return deleted, response.get("Errors", [])
+
+
+def delete_keys(
+    client,
+    bucket: str,
+    keys: Iterable[str],
+    threads: int = 1,
+    batch_size: int = MAX_BATCH_SIZE,
+) -> Iterator[Tuple[List[str], List[dict]]]:
+    """
+    Deletes a stream of keys in DeleteObjects batches sent in parallel,
+    yielding (deleted, errors) for every batch as it completes.
+
+    Keys are pulled from the stream only when a worker is free, so a
+    paginator can be fed straight in without buffering the whole listing.
+    """
+    batches = iter_batches(keys, min(batch_size, MAX_BATCH_SIZE))
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = set()
+        for batch in batches:
+            pending.add(executor.submit(delete_batch, client, bucket, batch))
+            if len(pending) >= threads:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        for future in pending:
+            yield future.result()
@@ -0,0 +1,270 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+# Size of the blocks read while hashing
+READ_SIZE = 1024 * 1024
+
+# Files checked against the destination per round of hashing
+HASH_BATCH_SIZE = 64
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT NOT NULL,
+    part_size INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    PRIMARY KEY (path, part_size)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS downloads (
+    path TEXT NOT NULL PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    etag TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def file_etag(path: str, part_size: Union[int, None] = None) -> str:
+    """
+    Computes the ETag S3 gives to a file uploaded in one piece (its MD5), or
+    when a part_size is given, uploaded in parts of that size (the MD5 of the
+    parts' MD5s, followed by -<amount of parts>).
+    """
+    size = os.path.getsize(path)
+    if not part_size:
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            while block := f.read(READ_SIZE):
+                digest.update(block)
+        return f'"{digest.hexdigest()}"'
+
+    part_digests = []
+    with open(path, "rb") as f:
+        for _ in range(max(1, math.ceil(size / part_size))):
+            digest = hashlib.md5()
+            remaining = part_size
+            while remaining and (block := f.read(min(READ_SIZE, remaining))):
+                digest.update(block)
+                remaining -= len(block)
+            part_digests.append(digest.digest())
+
+    return f'"{hashlib.md5(b"".join(part_digests)).hexdigest()}-{len(part_digests)}"'
+
+
+def object_part_size(client, bucket: str, key: str, etag: str) -> Union[int, None]:
+    """
+    A multipart ETag depends on the part size the object was uploaded with,
+    which S3 reports as the size of its first part.
+    """
+    if "-" not in etag:
+        return None
+    return client.head_object(Bucket=bucket, Key=key, PartNumber=1)["ContentLength"]
+
+
+def matches_etag(
+    path: str, etag: Union[str, None], part_size: Union[int, None]
+) -> bool:
+    """
+    Checks a local file against an object's ETag. part_size is the one given
+    by object_part_size, without it multipart ETags can not be checked and
+    are taken as a match.
+    """
+    if not etag:
+        return True
+    if "-" not in etag:
+        return file_etag(path) == etag
+    if not part_size:
+        return True
+    return file_etag(path, part_size) == etag
+
+
+def cache_path() -> str:
+    return os.getenv(
+        "S3_TOOL_HASH_CACHE", os.path.join(Path.home(), ".s3_tool", "hashes.sqlite3")
+    )
+
+
+def _connect_cache(path: Union[str, None] = None) -> sqlite3.Connection:
+    path = path or cache_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Shared by the threads of a download run, see DownloadedETags
+    db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(CACHE_SCHEMA)
+    return db
+
+
+def _hash(request: Tuple[str, int]) -> str:
+    path, part_size = request
+    return file_etag(path, part_size or None)
+
+
+def file_etags(
+    requests: List[Tuple[str, Union[int, None]]],
+    executor: Union[Executor, None] = None,
+    cache: Union[str, None] = None,
+) -> List[str]:
+    """
+    ETags of many (path, part_size), as file_etag computes them, hashed on
+    executor when given. Hashes are cached by path, size and modification
+    time, so a file is only hashed again once it changed.
+    """
+    etags: List[Union[str, None]] = [None] * len(requests)
+    db = _connect_cache(cache)
+    try:
+        misses = []
+        for i, (file_path, part_size) in enumerate(requests):
+            path = os.path.abspath(file_path)
+            stat = os.stat(path)
+            row = db.execute(
+                "SELECT etag FROM hashes WHERE path = ? AND part_size = ?"
+                " AND size = ? AND mtime_ns = ?",
+                (path, part_size or 0, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+            if row:
+                etags[i] = row[0]
+            else:
+                misses.append((i, (path, part_size or 0), stat))
+
+        todo = [request for _, request, _ in misses]
+        hashed = executor.map(_hash, todo) if executor else map(_hash, todo)
+        rows = []
+        # The stat taken before hashing is stored, a file changed while
+        # being hashed gets hashed again next time
+        for (i, (path, part_size), stat), etag in zip(misses, hashed):
+            etags[i] = etag
+            rows.append((path, part_size, stat.st_size, stat.st_mtime_ns, etag))
+        with db:
+            db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)", rows)
+    finally:
+        db.close()
+    return etags  # type: ignore
+
+
+class DownloadedETags:
+    """
+    ETags of the objects files were downloaded from, cached in the downloads
+    table so skip-existing can tell a file is the same without hashing it.
+    A single connection is shared by the threads of a download run, and the
+    ETags remembered are written in batches of batch_size and at close.
+    """
+
+    def __init__(
+        self, cache: Union[str, None] = None, batch_size: int = HASH_BATCH_SIZE
+    ):
+        self.batch_size = batch_size
+        self._db = _connect_cache(cache)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[int, int, str]] = {}
+
+    def get(self, path: str) -> Union[str, None]:
+        """
+        The ETag remembered for path, as long as the file was not changed
+        since it was downloaded
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            row = self._pending.get(path)
+            if row is None:
+                row = self._db.execute(
+                    "SELECT size, mtime_ns, etag FROM downloads WHERE path = ?",
+                    (path,),
+                ).fetchone()
+        if row and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+        return None
+
+    def remember(self, path: str, etag: str) -> None:
+        """Caches the ETag of the object a file was downloaded from"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            self._pending[path] = (stat.st_size, stat.st_mtime_ns, etag)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?)",
+                [(path, *row) for path, row in self._pending.items()],
+            )
+        self._pending.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush()
+            finally:
+                self._db.close()
+
+    def __enter__(self) -> "DownloadedETags":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def identical(
+    files: Iterable[Tuple[str, str]],
+    remote: Callable[[str], Union[Tuple[int, str], None]],
+    part_size: Callable[[str, str], Union[int, None]],
+    processes: Union[int, None] = None,
+    batch_size: int = HASH_BATCH_SIZE,
+    cache: Union[str, None] = None,
+) -> Iterator[Tuple[str, str, bool]]:
+    """
+    Checks a stream of (path, key) against the objects already at their
+    keys, yielding (path, key, True) when the object has the same content.
+
+    remote(key) gives the size and ETag of the key's object, or None when
+    there is none. part_size(key, etag) gives the part size of an object
+    with a multipart ETag, see object_part_size.
+
+    Paths that are not files, and files missing or of a different size on
+    the destination, are yielded right away. The rest are hashed in batches on processes, with the
+    hashes cached (see file_etags). Multipart objects whose part size is
+    unknown are taken as different.
+    """
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+
+        def check(batch) -> Iterator[Tuple[str, str, bool]]:
+            requests = [(path, part) for path, _, _, part in batch]
+            for (path, key, etag, _), local in zip(
+                batch, file_etags(requests, executor, cache)
+            ):
+                yield path, key, local == etag
+
+        batch: List[Tuple[str, str, str, Union[int, None]]] = []
+        for path, key in files:
+            if not os.path.isfile(path):
+                # Left for the upload to report
+                yield path, key, False
+                continue
+            found = remote(key)
+            if found is None or not found[1] or found[0] != os.path.getsize(path):
+                yield path, key, False
+                continue
+            etag = found[1]
+            part = part_size(key, etag) if "-" in etag else None
+            if "-" in etag and not part:
+                yield path, key, False
+                continue
+            batch.append((path, key, etag, part))
+            if len(batch) >= batch_size:
+                yield from check(batch)
+                batch = []
+
+        if batch:
+            yield from check(batch)
@@ -0,0 +1,214 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Union
+
+from s3_tool import listing
+
+# Raised whenever SCHEMA changes, indexes of older versions are dropped
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    endpoint TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified REAL NOT NULL,
+    PRIMARY KEY (endpoint, bucket, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS prefixes (
+    endpoint TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    listed_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, bucket, prefix)
+) WITHOUT ROWID;
+"""
+
+
+def index_path() -> str:
+    return os.getenv(
+        "S3_TOOL_INDEX", os.path.join(Path.home(), ".s3_tool", "index.sqlite3")
+    )
+
+
+def _connect(path: Union[str, None] = None) -> sqlite3.Connection:
+    path = path or index_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Every call gets its own connection, so threads never share one
+    db = sqlite3.connect(path, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # Only a cache, the listings are made again
+        db.executescript(
+            "BEGIN IMMEDIATE;"
+            "DROP TABLE IF EXISTS objects; DROP TABLE IF EXISTS prefixes;"
+            f"{SCHEMA}PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;"
+        )
+    else:
+        db.executescript(SCHEMA)
+    return db
+
+
+def _key_range(prefix: str) -> tuple:
+    """SQL condition matching every key under prefix, usable by the primary key"""
+    if not prefix:
+        return "", ()
+    # Keys under "a/" sort between "a/" and "a0"
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return " AND key >= ? AND key < ?", (prefix, upper)
+
+
+def _listed_at(
+    db: sqlite3.Connection, endpoint: str, bucket: str, prefix: str
+) -> Union[float, None]:
+    """When prefix, or a prefix containing it, was last listed in full"""
+    row = db.execute(
+        "SELECT max(listed_at) FROM prefixes WHERE endpoint = ? AND bucket = ?"
+        " AND substr(?, 1, length(prefix)) = prefix",
+        (endpoint, bucket, prefix),
+    ).fetchone()
+    return row[0]
+
+
+def refresh(
+    client,
+    bucket: str,
+    prefix: str = "",
+    ttl: int = 3600,
+    path: Union[str, None] = None,
+) -> int:
+    """
+    Brings the index of prefix up to date and returns how many keys were
+    listed to do so.
+
+    A prefix listed less than ttl seconds ago is refreshed incrementally,
+    only listing the keys after the last one indexed (StartAfter), which
+    picks up new keys sorting after it. Other changes show up once the ttl
+    runs out and the whole prefix is listed again, replacing its entries.
+
+    Every page is written in a transaction of its own, so refreshes of
+    other prefixes running at the same time only wait for a page, never for
+    a whole listing. A full listing replaces the entries a page covers as it
+    goes, and the prefix only counts as listed once the last page is in.
+
+    Entries are kept per endpoint, buckets of the same name on different
+    endpoints are indexed apart.
+    """
+    endpoint = client.meta.endpoint_url
+    db = _connect(path)
+    try:
+        condition, params = _key_range(prefix)
+        listed_at = _listed_at(db, endpoint, bucket, prefix)
+        fresh = listed_at is not None and time.time() - listed_at < ttl
+
+        start_after = None
+        if fresh:
+            start_after = db.execute(
+                "SELECT max(key) FROM objects"
+                f" WHERE endpoint = ? AND bucket = ?{condition}",
+                (endpoint, bucket, *params),
+            ).fetchone()[0]
+
+        started = time.time()
+        listed = 0
+        # Last key of the previous page, entries up to it are up to date
+        last_key = None
+        for page in listing.iter_pages(client, bucket, prefix, start_after=start_after):
+            rows = [
+                (
+                    endpoint,
+                    bucket,
+                    obj["Key"],
+                    obj["Size"],
+                    obj.get("ETag"),
+                    obj["LastModified"].timestamp(),
+                )
+                for obj in page.get("Contents", [])
+            ]
+            if not rows:
+                continue
+            with db:
+                if not fresh:
+                    # Keys deleted since the last listing
+                    _delete_between(db, endpoint, bucket, prefix, last_key, rows[-1][2])
+                db.executemany(
+                    "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+            last_key = rows[-1][2]
+            listed += len(rows)
+
+        if not fresh:
+            with db:
+                _delete_between(db, endpoint, bucket, prefix, last_key, None)
+                db.execute(
+                    "INSERT OR REPLACE INTO prefixes VALUES (?, ?, ?, ?)",
+                    (endpoint, bucket, prefix, started),
+                )
+        return listed
+    finally:
+        db.close()
+
+
+def _delete_between(
+    db: sqlite3.Connection,
+    endpoint: str,
+    bucket: str,
+    prefix: str,
+    after: Union[str, None],
+    up_to: Union[str, None],
+) -> None:
+    """Deletes the entries under prefix after a key and up to another one"""
+    condition, params = _key_range(prefix)
+    if after is not None:
+        condition += " AND key > ?"
+        params += (after,)
+    if up_to is not None:
+        condition += " AND key <= ?"
+        params += (up_to,)
+    db.execute(
+        f"DELETE FROM objects WHERE endpoint = ? AND bucket = ?{condition}",
+        (endpoint, bucket, *params),
+    )
+
+
+def query(
+    endpoint: str, bucket: str, prefix: str = "", path: Union[str, None] = None
+) -> Iterator[dict]:
+    """
+    Yields the indexed objects under prefix of a bucket of endpoint in key
+    order, shaped like the Contents of a listing.
+    """
+    db = _connect(path)
+    try:
+        condition, params = _key_range(prefix)
+        rows = db.execute(
+            "SELECT key, size, etag, last_modified FROM objects"
+            f" WHERE endpoint = ? AND bucket = ?{condition} ORDER BY key",
+            (endpoint, bucket, *params),
+        )
+        for key, size, etag, last_modified in rows:
+            yield {
+                "Key": key,
+                "Size": size,
+                "ETag": etag,
+                "LastModified": datetime.fromtimestamp(last_modified, timezone.utc),
+            }
+    finally:
+        db.close()
+
+
+def objects(
+    client,
+    bucket: str,
+    prefix: str = "",
+    ttl: int = 3600,
+    path: Union[str, None] = None,
+) -> Iterator[dict]:
+    """Refreshes the index of prefix and yields its objects"""
+    refresh(client, bucket, prefix, ttl, path)
+    yield from query(client.meta.endpoint_url, bucket, prefix, path)
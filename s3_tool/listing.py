@@ -0,0 +1,192 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, NamedTuple, Union
+
+from s3_tool.pipeline import put
+
+
+def iter_pages(
+    client,
+    bucket: str,
+    prefix: str = "",
+    delimiter: str = "",
+    page_size: int = 1000,
+    fetch_owner: bool = False,
+    start_after: Union[str, None] = None,
+) -> Iterator[dict]:
+    """
+    Yields list_objects_v2 responses one page at a time. Continuation tokens
+    are followed lazily, so only the page being consumed is held in memory.
+    """
+    kwargs = {
+        "Bucket": bucket,
+        "Prefix": prefix,
+        "FetchOwner": fetch_owner,
+        "PaginationConfig": {"PageSize": page_size},
+    }
+    if delimiter:
+        kwargs["Delimiter"] = delimiter
+    if start_after:
+        kwargs["StartAfter"] = start_after
+
+    paginator = client.get_paginator("list_objects_v2")
+    yield from paginator.paginate(**kwargs)
+
+
+def iter_objects(client, bucket: str, prefix: str = "", **kwargs) -> Iterator[dict]:
+    """Yields every object under a prefix as returned in the listing's Contents"""
+    for page in iter_pages(client, bucket, prefix, **kwargs):
+        yield from page.get("Contents", [])
+
+
+class Shard(NamedTuple):
+    """Keys from start, included, up to end, excluded. No end for the last one"""
+
+    start: str
+    end: Union[str, None]
+
+
+def _just_before(key: str) -> str:
+    """
+    A StartAfter that lists from key onwards. Keys between the two are only
+    listed again, iter_shard skips them.
+    """
+    return key[:-1] + chr(ord(key[-1]) - 1)
+
+
+def discover_shards(
+    client,
+    bucket: str,
+    prefix: str = "",
+    fan_out: int = 8,
+    delimiter: str = "/",
+    page_size: int = 1000,
+    max_direct_keys: int = 10000,
+) -> List[Shard]:
+    """
+    Splits a prefix into at most fan_out contiguous key ranges.
+
+    The prefix's delimiter levels are walked breadth first until at least
+    fan_out "subfolders" are found, at most fan_out levels being listed,
+    serially. Neighbouring subfolders are then merged into fan_out ranges
+    holding about as many subfolders each, so a level with thousands of
+    small subfolders takes fan_out paginated listings, not one per
+    subfolder. A level holding more than max_direct_keys objects is not
+    split any further, so discovery never lists a flat prefix in full.
+
+    Objects sitting directly on the walked levels belong to the range they
+    sort into. The first range starts at the prefix itself.
+    """
+    leaves: List[str] = []
+    pending = [prefix]
+    walked = 0
+
+    while pending and len(pending) + len(leaves) < fan_out and walked < fan_out:
+        walked += 1
+        level = pending.pop(0)
+        keys = 0
+        subfolders: List[str] = []
+
+        for page in iter_pages(client, bucket, level, delimiter, page_size):
+            keys += len(page.get("Contents", []))
+            subfolders.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+            if keys > max_direct_keys:
+                break
+
+        if keys > max_direct_keys:
+            leaves.append(level)
+        else:
+            pending.extend(subfolders)
+
+    leaves = sorted(leaves + pending)
+    count = min(fan_out, len(leaves))
+    starts = [prefix] + [leaves[i * len(leaves) // count] for i in range(1, count)]
+    return [
+        Shard(start, starts[i + 1] if i + 1 < len(starts) else None)
+        for i, start in enumerate(starts)
+    ]
+
+
+def iter_shard(
+    client, bucket: str, prefix: str, shard: Shard, page_size: int = 1000
+) -> Iterator[List[dict]]:
+    """Yields the objects of a shard a page at a time"""
+    start_after = _just_before(shard.start) if shard.start != prefix else None
+    for page in iter_pages(
+        client, bucket, prefix, page_size=page_size, start_after=start_after
+    ):
+        contents = page.get("Contents", [])
+        objects = [
+            obj
+            for obj in contents
+            if obj["Key"] >= shard.start
+            and (shard.end is None or obj["Key"] < shard.end)
+        ]
+        if objects:
+            yield objects
+        # The next shard takes it from here
+        if shard.end is not None and contents and contents[-1]["Key"] >= shard.end:
+            return
+
+
+def _fill_queue(
+    q: queue.Queue, stop: threading.Event, client, bucket, prefix, shard, page_size
+):
+    try:
+        for objects in iter_shard(client, bucket, prefix, shard, page_size):
+            if not put(q, objects, stop):
+                return
+    except Exception as e:
+        put(q, e, stop)
+        return
+    put(q, None, stop)
+
+
+def _drain(queues: List[queue.Queue]) -> Iterator[dict]:
+    for q in queues:
+        while True:
+            page = q.get()
+            if page is None:
+                break
+            if isinstance(page, Exception):
+                raise page
+            yield from page
+
+
+def iter_sharded(
+    client,
+    bucket: str,
+    prefix: str = "",
+    fan_out: int = 8,
+    threads: Union[int, None] = None,
+    page_size: int = 1000,
+    max_buffered_pages: int = 4,
+) -> Iterator[dict]:
+    """
+    Lists a prefix by splitting it with discover_shards and listing every
+    shard concurrently, yielding objects in key order.
+
+    Shards are contiguous ranges of the keyspace, so reading them one after
+    the other keeps the output sorted. Each shard buffers at most
+    max_buffered_pages pages ahead of the reader.
+    """
+    shards = discover_shards(client, bucket, prefix, fan_out, page_size=page_size)
+
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=threads or fan_out)
+    queues: List[queue.Queue] = []
+    try:
+        # Shards are submitted in key order, so the one being read is always
+        # running or done and the reader can never wait on a queued shard.
+        for shard in shards:
+            q: queue.Queue = queue.Queue(maxsize=max_buffered_pages)
+            executor.submit(
+                _fill_queue, q, stop, client, bucket, prefix, shard, page_size
+            )
+            queues.append(q)
+
+        yield from _drain(queues)
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
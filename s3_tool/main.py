@@ -1,18 +1,62 @@
+import asyncio
+import io
+import itertools
 import mimetypes
 import os
-from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext, redirect_stderr, redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from pathlib import Path
 from sys import platform as os_platform
-from typing import List, Union
+from typing import Iterator, List, Tuple, Union
 
 import boto3
 import botocore
+import click
 import typer
+from boto3.s3.transfer import ProgressCallbackInvoker, create_transfer_manager
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from tqdm import tqdm
-
+from s3transfer.subscribers import BaseSubscriber
+
+from s3_tool import (
+    acls,
+    async_engine,
+    benchmark,
+    budget,
+    deletion,
+    hashing,
+    index,
+    listing,
+    manifest,
+    metrics,
+    moving,
+    packing,
+    pipeline,
+    progress,
+    ranged,
+    resumable,
+    sync,
+    throttling,
+    transfer_config,
+    walking,
+)
 from s3_tool.choices.access_types import ACLTypes
+from s3_tool.choices.directions import Directions
+from s3_tool.choices.engines import Engines
+from s3_tool.choices.manifest_formats import ManifestFormats
+from s3_tool.choices.metrics_formats import MetricsFormats
 from s3_tool.choices.object_methods import ObjectMethods
+from s3_tool.choices.pack_formats import PackFormats
+from s3_tool.choices.progress_modes import ProgressModes
+from s3_tool.choices.retry_modes import RetryModes
+from s3_tool.choices.skip_modes import SkipModes
+from s3_tool.choices.workloads import Workloads
+from s3_tool.options import Options
 
 load_dotenv()
 
@@ -20,6 +64,105 @@ load_dotenv()
 app = typer.Typer(help="S3 CLI Tool to execute basic commands")
 
 
+@app.callback()
+def main(
+    ctx: typer.Context,
+    max_requests: int = typer.Option(
+        0,
+        "--max-requests",
+        envvar="S3_TOOL_MAX_REQUESTS",
+        help="Requests in flight at once against the endpoint, shared by every thread of the command. change-permissions shares it fairly between prefixes. Halved when the endpoint throttles (503 SlowDown) and raised back while responses are clean, except with the async engine where it is a fixed cap. 0 leaves it to each command's threads",
+    ),
+    retry_mode: RetryModes = typer.Option(
+        RetryModes.standard,
+        "--retry-mode",
+        envvar="S3_TOOL_RETRY_MODE",
+        help="botocore retry mode. 'adaptive' also rate limits the client once it gets throttled",
+    ),
+    max_attempts: int = typer.Option(
+        3,
+        "--max-attempts",
+        envvar="S3_TOOL_MAX_ATTEMPTS",
+        help="Attempts per request, the first one included",
+    ),
+    max_rate: float = typer.Option(
+        0,
+        "--max-rate",
+        envvar="S3_TOOL_MAX_RATE",
+        help="Requests per second sent to the endpoint at most. 0 for no limit",
+    ),
+    progress_mode: ProgressModes = typer.Option(
+        ProgressModes.auto,
+        "--progress",
+        envvar="S3_TOOL_PROGRESS",
+        help="How the progress of a transfer is shown on stderr: a single bar for all files, a summary line or a JSON object every PROGRESS_INTERVAL seconds, or nothing. 'auto' shows the bar on a terminal and the summary otherwise",
+    ),
+    progress_interval: float = typer.Option(
+        10,
+        "--progress-interval",
+        envvar="S3_TOOL_PROGRESS_INTERVAL",
+        help="Seconds between progress summaries when they are not shown as a bar",
+    ),
+    metrics_path: Union[str, None] = typer.Option(
+        None,
+        "--metrics",
+        envvar="S3_TOOL_METRICS",
+        help="File the command writes, at exit, the requests it made per S3 operation to: their count, errors, retries, bytes sent and received and latency percentiles and histogram. - for stderr",
+    ),
+    metrics_format: MetricsFormats = typer.Option(
+        MetricsFormats.json,
+        "--metrics-format",
+        envvar="S3_TOOL_METRICS_FORMAT",
+        help="Format of the metrics: JSON, or Prometheus text to feed a node exporter's textfile collector or a Pushgateway",
+    ),
+):
+    options = ctx.obj = Options(
+        max_requests=max_requests,
+        retry_mode=retry_mode.value,
+        max_attempts=max_attempts,
+        max_rate=max_rate,
+        progress_mode=progress_mode.value,
+        progress_interval=progress_interval,
+        metrics_path=metrics_path,
+        metrics_format=metrics_format.value,
+        command=ctx.invoked_subcommand or "",
+        started=time.monotonic(),
+    )
+    ctx.call_on_close(lambda: _report_throttling(options))
+    ctx.call_on_close(
+        lambda: metrics.write(
+            options.metrics_path,
+            options.metrics_format,
+            options.command,
+            options.started,
+        )
+    )
+
+
+def _options() -> Options:
+    """
+    Options of the running invocation. Worker threads and commands called
+    outside of the CLI have no click context and get the defaults.
+    """
+    ctx = click.get_current_context(silent=True)
+    options = ctx.find_object(Options) if ctx is not None else None
+    return options or Options()
+
+
+def _report_throttling(options: Options) -> None:
+    events = throttling.events()
+    if not events:
+        return
+    per_operation = ", ".join(f"{op}: {n}" for op, n in events.most_common())
+    message = f"Throttled {sum(events.values())} times ({per_operation})"
+    limiter = budget.for_endpoint(
+        str(_login.get("login_data", {}).get("endpoint_url")), options.max_requests
+    )
+    if limiter is not None and limiter.lowest < limiter.ceiling:
+        message += f", requests in flight lowered to {limiter.lowest} at most"
+    typer.secho(message, fg=typer.colors.YELLOW, err=True)
+
+
 def bucket(bucket=os.getenv("BUCKET_NAME")) -> str:
     bucket_name = {"bucket": bucket}
 
@@ -29,52 +172,103 @@ def bucket(bucket=os.getenv("BUCKET_NAME")) -> str:
     return bucket_name["bucket"]
 
 
+_login_lock = threading.Lock()
+_login: dict = {}
+
+
 def get_login(
     endpoint=os.getenv("ENDPOINT"),
     access_key=os.getenv("ACCESS_KEY"),
     aws_secret_access_key=os.getenv("SECRET_ACCESS_KEY"),
+    max_pool_connections: Union[int, None] = None,
+    options: Union[Options, None] = None,
 ):
-    """Will prompt for your credentials if they are not in an .env file"""
-
-    login_data = {
-        "endpoint_url": endpoint,
-        "aws_access_key_id": access_key,
-        "aws_secret_access_key": aws_secret_access_key,
-    }
-
-    if not login_data.get("endpoint_url"):
-        login_data["endpoint_url"] = input("Enter endpoint URL: ")
-    if login_data.get("aws_access_key_id"):
-        login_data["aws_access_key_id"] = input("Enter your AWS Access Key: ")
-    if login_data.get("aws_secret_access_key"):
-        login_data["aws_secret_access_key"] = input(
-            "Enter your AWS Secret Access Key: "
+    """
+    Will prompt for your credentials if they are not in an .env file.
+
+    The resource, client and bucket are built once per process and shared by
+    every worker thread. Commands pass their thread count as
+    max_pool_connections so the HTTP pool fits their parallelism; asking for a
+    bigger pool than the cached one rebuilds the connection with that size.
+    """
+
+    with _login_lock:
+        cached = _login.get("connection")
+        if cached and (
+            max_pool_connections is None
+            or max_pool_connections <= _login["max_pool_connections"]
+        ):
+            return cached
+
+        login_data = _login.get("login_data")
+        if login_data is None:
+            login_data = {
+                "endpoint_url": endpoint,
+                "aws_access_key_id": access_key,
+                "aws_secret_access_key": aws_secret_access_key,
+            }
+
+            if not login_data.get("endpoint_url"):
+                login_data["endpoint_url"] = input("Enter endpoint URL: ")
+            if not login_data.get("aws_access_key_id"):
+                login_data["aws_access_key_id"] = input("Enter your AWS Access Key: ")
+            if not login_data.get("aws_secret_access_key"):
+                login_data["aws_secret_access_key"] = input(
+                    "Enter your AWS Secret Access Key: "
+                )
+
+            login_data["bucket"] = bucket()
+
+        pool_size = max_pool_connections or 10
+        options = options or _options()
+
+        s3 = boto3.resource(
+            "s3",
+            endpoint_url=login_data["endpoint_url"],
+            aws_access_key_id=login_data["aws_access_key_id"],
+            aws_secret_access_key=login_data["aws_secret_access_key"],
+            use_ssl=True,
+            config=botocore.config.Config(  # type: ignore
+                retries=throttling.retries(options.retry_mode, options.max_attempts),
+                max_pool_connections=pool_size,
+            ),
         )
 
-    s3 = boto3.resource(
-        "s3",
-        endpoint_url=login_data["endpoint_url"],
-        aws_access_key_id=login_data["aws_access_key_id"],
-        aws_secret_access_key=login_data["aws_secret_access_key"],
-        use_ssl=True,
-        config=botocore.config.Config(retries={"total_max_attempts": 3}),  # type: ignore
-    )
+        # Clients are thread safe, so the resource's own client is shared
+        # instead of building a second connection pool
+        client = s3.meta.client
+        budget.attach(client, options.max_requests)
+        throttling.attach(client, options.max_rate)
+        if options.metrics_enabled:
+            metrics.attach(client)
 
-    client = boto3.client(
-        "s3",
-        endpoint_url=os.getenv("ENDPOINT"),
-        aws_access_key_id=os.getenv("ACCESS_KEY"),
-        aws_secret_access_key=os.getenv("SECRET_ACCESS_KEY"),
-    )
+        # Bucket to be used
+        bucket_name = login_data["bucket"]
+
+        contents = s3.Bucket(name=bucket_name)
 
-    login_data["bucket"] = bucket()
+        _login["login_data"] = login_data
+        _login["max_pool_connections"] = pool_size
+        _login["connection"] = (contents, s3, bucket_name, client)
 
-    # Bucket to be used
-    bucket_name = login_data["bucket"]
+        return _login["connection"]
 
-    contents = s3.Bucket(name=bucket_name)
 
-    return contents, s3, bucket_name, client
+def _run_async(coroutine) -> None:
+    """Runs an async_engine coroutine and reports every object that failed"""
+    try:
+        failed = asyncio.run(coroutine)
+    except ImportError as e:
+        typer.secho(f"{e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1)
+
+    for item, e in failed:
+        pre_msg = typer.style("Error -> ", fg=typer.colors.RED)
+        typer.echo(pre_msg + f"{item}")
+        typer.secho(f"{e}", fg=typer.colors.RED, err=True)
+
+    if failed:
+        raise typer.Exit(code=1)
 
 
 @app.command()
@@ -106,15 +300,40 @@ def list_keys(
     key_methods: ObjectMethods = typer.Option(
         ObjectMethods.key, "--key-methods", "-km"
     ),
+    shards: int = typer.Option(
+        0,
+        "--shards",
+        "-s",
+        help="Used with --all. Splits the bucket into this many key ranges, made of neighbouring subfolders, and lists them in parallel",
+    ),
+    index_ttl: int = typer.Option(
+        0,
+        "--index-ttl",
+        envvar="S3_TOOL_INDEX_TTL",
+        help="Lists keys from a local index (S3_TOOL_INDEX) that only fetches keys added since the last listing, re-listing in full once this many seconds old. 0 disables the index",
+    ),
 ):
     """Lists keys according to a given prefix"""
-    contents, _, bucket_name, _ = get_login()
+    contents, _, bucket_name, client = get_login()
 
     endpoint = os.getenv("ENDPOINT")
     if str(os.getenv("ENDPOINT")).endswith("/"):
         endpoint = str(os.getenv("ENDPOINT"))[:-1]
 
-    if all is False and limit == 0:
+    # Owners and grants are not indexed
+    if index_ttl > 0 and not delimiter and key_methods not in ("owner", "acl"):
+        found = index.objects(client, bucket_name, "" if all else prefix, index_ttl)
+        for obj in itertools.islice(found, limit or None):
+            if http_prefix:
+                typer.echo(f"{endpoint}/{bucket_name}/{obj['Key']}")
+            elif key_methods == "size":
+                typer.echo(f"{obj['Key']} -> {round(obj['Size'] / 1024 ** 2, 2)}Mb")
+            elif key_methods == "last_modified":
+                typer.echo(f"{obj['Key']} -> {obj['LastModified']}")
+            else:
+                typer.echo(obj["Key"])
+
+    elif all is False and limit == 0:
         for obj in contents.objects.filter(
             Prefix=prefix, Delimiter=delimiter, MaxKeys=max_keys
         ):
@@ -141,6 +360,14 @@ def list_keys(
                 typer.echo(f"{endpoint}/{bucket_name}/{obj.key}")
             else:
                 typer.echo(obj.key)
+    elif shards > 1:
+        _, _, bucket_name, client = get_login(max_pool_connections=shards)
+        for obj in listing.iter_sharded(client, bucket_name, fan_out=shards):
+            if http_prefix:
+                typer.echo(f"{endpoint}/{bucket_name}/{obj['Key']}")
+
+            else:
+                typer.echo(obj["Key"])
     else:
         for obj in contents.objects.all():
             if http_prefix:
@@ -165,11 +392,14 @@ def list_keys_v2(
         1000,
         " --max-keys",
         "-mk",
-        help="Sets the maximum number of keys returned in the response. The response might contain fewer keys but will never contain more.",
+        help="Sets the maximum number of keys returned in each response page. Pages are followed until every key (or --limit keys) is listed.",
     ),
     http_prefix: bool = typer.Option(
         False, "--http-prefix", "-hp", help="Append HTTP URL Prefix to keys"
     ),
+    limit: int = typer.Option(
+        0, "--limit", "-l", help="Limits the amount of keys returned"
+    ),
     key_methods: ObjectMethods = typer.Option(
         ObjectMethods.key, "--key-methods", "-km"
     ),
@@ -178,6 +408,7 @@ def list_keys_v2(
     Lists keys using the S3 client rather than Resource (used for the
     list-keys command). Allows the usage of a delimiter to limit the output
     to "subfolders". Only operation not possible is the checking of ACL Grants.
+    Follows continuation tokens, printing each page as soon as it arrives.
     """
     _, _, bucket, client = get_login()
 
@@ -185,73 +416,96 @@ def list_keys_v2(
     if str(os.getenv("ENDPOINT")).endswith("/"):
         endpoint = str(os.getenv("ENDPOINT"))[:-1]
 
+    def format_key(x: dict) -> str:
+        if http_prefix:
+            return f'{endpoint}/{bucket}/{x.get("Key")}'
+        elif key_methods == "size":
+            return f"{x.get('Key')} -> {round(x.get('Size') / 1024 ** 2, 2)}Mb"
+        elif key_methods == "last_modified":
+            return f"{x.get('LastModified')}"
+        elif key_methods == "owner":
+            return f"{x.get('Owner')}"
+        return x.get("Key")
+
+    found = 0
     try:
-        if delimiter != "":
-            result = client.list_objects_v2(
-                Bucket=bucket, Prefix=prefix, Delimiter=delimiter, MaxKeys=max_keys
-            )
-            for o in result.get("CommonPrefixes"):
-                typer.echo(o.get("Prefix"))
-
-        elif http_prefix:
-            result = client.list_objects_v2(
-                Bucket=bucket, Prefix=prefix, MaxKeys=max_keys
-            )
-            for x in result.get("Contents"):
-                typer.echo(f'{endpoint}/{bucket}/{x.get("Key")}')
-
-        elif key_methods != "owner":
-            result = client.list_objects_v2(
-                Bucket=bucket, Prefix=prefix, MaxKeys=max_keys
-            )
-            for x in result.get("Contents"):
-                if key_methods == "key":
-                    typer.echo(x.get("Key"))
-                elif key_methods == "size":
-                    typer.echo(
-                        f"{x.get('Key')} -> {round(x.get('Size') / 1024 ** 2, 2)}Mb"
-                    )
-                elif key_methods == "last_modified":
-                    typer.echo(x.get("LastModified"))
+        for page in listing.iter_pages(
+            client,
+            bucket,
+            prefix=prefix,
+            delimiter=delimiter,
+            page_size=max_keys,
+            fetch_owner=key_methods == "owner" and not http_prefix,
+        ):
+            if delimiter != "":
+                lines = [o.get("Prefix") for o in page.get("CommonPrefixes", [])]
+            else:
+                lines = [format_key(x) for x in page.get("Contents", [])]
 
-        else:
-            result = client.list_objects_v2(
-                Bucket=bucket, Prefix=prefix, MaxKeys=max_keys, FetchOwner=True
-            )
-            for x in result.get("Contents"):
-                typer.echo(x.get("Owner"))
-    except Exception:
-        typer.echo("No key was found!")
+            if limit > 0:
+                lines = lines[: limit - found]
 
+            # One write per page instead of one per key
+            if lines:
+                typer.echo("\n".join(lines))
+                found += len(lines)
 
-def permission_changer(f, permissions: ACLTypes):
-    # Could check the permissions to know if to change them or not
-    try:
-        f.Acl().put(ACL=permissions.value)
+            if limit > 0 and found >= limit:
+                break
     except Exception as e:
-        typer.echo(f"Error -> {e}", err=True)
+        # Keys already printed are kept, the listing is incomplete though
+        typer.secho(f"{e}", fg=typer.colors.RED, err=True)
         raise typer.Exit(code=1)
 
+    if found == 0:
+        typer.echo("No key was found!")
 
-def file_gatherer(video_ids: str, changer_threads: int, permissions: ACLTypes):
-    contents, _, _, _ = get_login()
-    all_files = [
-        obj
-        for obj in contents.objects.filter(
-            Prefix=str(video_ids),
-        )
-    ]
-
-    progbar = tqdm(total=len(all_files), desc="files", unit="S3 files")
-    with ThreadPoolExecutor(max_workers=changer_threads) as executor:
-        results = [
-            executor.submit(permission_changer, file, permissions) for file in all_files
-        ]
 
-        for res in results:
-            progbar.update()
-            res.result()
-        progbar.close()
+def permission_changer(key: str, permissions: ACLTypes, diff: bool = False) -> str:
+    _, _, bucket_name, client = get_login()
+    try:
+        return acls.set_acl(client, bucket_name, key, permissions.value, diff)
+    except Exception as e:
+        typer.echo(f"Error -> {key}: {e}", err=True)
+        return acls.FAILED
+
+
+def file_gatherer(
+    video_ids: str,
+    changer_threads: int,
+    permissions: ACLTypes,
+    tracker: progress.Progress,
+    index_ttl: int = 0,
+    diff: bool = False,
+    max_requests: int = 0,
+) -> Counter:
+    _, _, bucket_name, client = get_login()
+    if index_ttl > 0:
+        found = index.objects(client, bucket_name, str(video_ids), index_ttl)
+    else:
+        found = listing.iter_objects(client, bucket_name, str(video_ids))
+
+    # Keys are changed while the following pages are still being listed
+    outcomes: Counter = Counter()
+    for _, changed, error in pipeline.stream(
+        budget.grouped(
+            client,
+            video_ids,
+            lambda key: permission_changer(key, permissions, diff),
+            max_requests,
+        ),
+        (obj["Key"] for obj in found),
+        changer_threads,
+        max_queued=changer_threads * 20,
+    ):
+        outcome = acls.FAILED if error else changed
+        outcomes[outcome] += 1
+        tracker.expect()
+        if outcome == acls.FAILED:
+            tracker.object_failed()
+        else:
+            tracker.object_done()
+    return outcomes
 
 
 @app.command()
@@ -267,52 +521,101 @@ def change_permissions(
     permissions: ACLTypes = typer.Option(
         ACLTypes.public_read, "--permissions", "-p", help="Changes the keys permissions"
     ),
+    engine: Engines = typer.Option(
+        Engines.threads,
+        "--engine",
+        help="'async' keeps up to PREFIX_THREADS * CHANGER_THREADS requests in flight on a single asyncio event loop. Needs aiobotocore",
+    ),
+    index_ttl: int = typer.Option(
+        0,
+        "--index-ttl",
+        envvar="S3_TOOL_INDEX_TTL",
+        help="Lists keys from a local index (S3_TOOL_INDEX) that only fetches keys added since the last listing, re-listing in full once this many seconds old. 0 disables the index",
+    ),
+    diff: bool = typer.Option(
+        False,
+        "--diff",
+        help="Reads the grants of every object first and only changes the ones with a different ACL. aws-exec-read and bucket-owner-* can not be told apart by their grants and are always changed. Not used by the async engine",
+    ),
 ):
     """Takes any number of keys and changes their permissions to public-read"""
     # try:
     if not args:
         typer.echo("You must specify at least one S3 Key")
     id_list = [str(i) for i in args]
-    progbar = tqdm(total=len(id_list), desc="Total", unit="permission")
+    options = _options()
+
+    if engine == Engines.asyncio:
+        _, _, bucket_name, _ = get_login()
+        _run_async(
+            async_engine.change_permissions(
+                _login["login_data"],
+                bucket_name,
+                id_list,
+                permissions.value,
+                prefix_threads * changer_threads,
+                options,
+            )
+        )
+        return
 
-    with ThreadPoolExecutor(max_workers=prefix_threads) as executor:
+    if options.max_requests > 0:
+        # More threads than requests allowed at once would only wait
+        changer_threads = min(changer_threads, options.max_requests)
+    get_login(max_pool_connections=prefix_threads * changer_threads)
+
+    outcomes: Counter = Counter()
+    with options.tracker("change-permissions") as tracker, ThreadPoolExecutor(
+        max_workers=prefix_threads
+    ) as executor:
         futures = [
-            executor.submit(file_gatherer, vid_id, changer_threads, permissions)
+            executor.submit(
+                file_gatherer,
+                vid_id,
+                changer_threads,
+                permissions,
+                tracker,
+                index_ttl,
+                diff,
+                options.max_requests,
+            )
             for vid_id in id_list
         ]
-        for f in futures:
-            progbar.update()
-            f.result()
-        progbar.close()
+        for f in as_completed(futures):
+            outcomes.update(f.result())
+
+    typer.echo(
+        f"Changed: {outcomes[acls.CHANGED]} | "
+        f"Unchanged: {outcomes[acls.UNCHANGED]} | "
+        f"Failed: {outcomes[acls.FAILED]}",
+        err=True,
+    )
+    if outcomes[acls.FAILED]:
+        raise typer.Exit(code=1)
     # except Exception as e:
     #     typer.echo(e)
     #     raise typer.Exit(code=1)
 
 
-def _deleter(k: str, prompt: bool = True, feedback: bool = True):
-    contents, s3, bucket_name, _ = get_login()
-
-    if prompt:
-        delete_prompt = typer.confirm(
-            f"Are you sure you want to delete -> {k}?",
-        )
-        if not delete_prompt:
-            typer.echo("Got cold feet?")
-            raise typer.Exit()
-
-    object_exists = list(contents.objects.filter(Prefix=k))
-
-    if any(object_exists) is False:
-        typer.echo(f"{k} does not exists!")
-        raise typer.Abort()
-
-    else:
-        s3.Object(bucket_name, k).delete()
-        if feedback:
+def _report_deleted(results, feedback: bool = True) -> int:
+    """Echoes the outcome of every DeleteObjects batch and returns the error count"""
+    failed = 0
+    for deleted, errors in results:
+        if feedback and deleted:
             message = "Deleted Key: "
-            deleted = typer.style(f"{k}", fg=typer.colors.RED)
-            typer.echo(message + deleted)
-        return
+            typer.echo(
+                "\n".join(
+                    message + typer.style(f"{k}", fg=typer.colors.RED) for k in deleted
+                )
+            )
+        for error in errors:
+            failed += 1
+            typer.secho(
+                f"Error deleting -> {error.get('Key')}: {error.get('Code')} {error.get('Message')}",
+                fg=typer.colors.RED,
+                err=True,
+            )
+    return failed
 
 
 @app.command()
@@ -323,47 +626,102 @@ def delete_key(
     prompt: bool = typer.Option(True, help="Display a prompt to confirm deletion"),
     threads: int = typer.Option(
         1,
-        help="Set the amount of threads to delete keys in parallel. Disable the prompt if using this option",
+        help="Set the amount of threads to delete keys in parallel. Each thread sends batches of up to 1000 keys",
+    ),
+    prefix: Union[str, None] = typer.Option(
+        None,
+        "--prefix",
+        "-p",
+        help="Deletes every key under this prefix. Must end with the delimiter /",
     ),
 ):
     """USE WITH EXTREME CAUTION! Deletes a given key or keys"""
 
-    if not files:
-        typer.echo("No files provided")
-        raise typer.Abort()
-
-    for f in files:
-        if f[0] == "/":
-            typer.echo("DO NOT DELETE A KEY STARTING WITH /")
+    if prefix:
+        if prefix[0] == "/" or prefix[-1] != "/":
+            typer.echo("The prefix must not start with / and must end with /")
             raise typer.Abort()
-    for f in files:
-        if f[-1] == "/":
-            typer.echo("DO NOT DELETE A KEY ENDING WITH /")
+
+        if prompt and not typer.confirm(
+            f"Are you sure you want to delete every key under -> {prefix}?",
+        ):
+            typer.echo("Got cold feet?")
+            raise typer.Exit()
+
+        _, _, bucket_name, client = get_login(max_pool_connections=threads)
+        keys = (obj["Key"] for obj in listing.iter_objects(client, bucket_name, prefix))
+
+    else:
+        if not files:
+            typer.echo("No files provided")
             raise typer.Abort()
 
-    # try:
-    keys = [f for f in files]
-    with ThreadPoolExecutor(max_workers=threads) as executor:
-        futures = [executor.submit(_deleter, k, prompt) for k in keys]
-        for f in futures:  # type: ignore
-            f.result()  # type: ignore
-    # except Exception as e:
-    #     return e
+        for f in files:
+            if f[0] == "/":
+                typer.echo("DO NOT DELETE A KEY STARTING WITH /")
+                raise typer.Abort()
+        for f in files:
+            if f[-1] == "/":
+                typer.echo("DO NOT DELETE A KEY ENDING WITH /")
+                raise typer.Abort()
 
+        if prompt:
+            for f in files:
+                if not typer.confirm(f"Are you sure you want to delete -> {f}?"):
+                    typer.echo("Got cold feet?")
+                    raise typer.Exit()
 
-def _upload_file(file_path: str, upload_path: str, upload_permission: str):
-    contents, _, _, _ = get_login()
+        _, _, bucket_name, client = get_login(max_pool_connections=threads)
+        keys = (f for f in files)
+
+    try:
+        failed = _report_deleted(
+            deletion.delete_keys(client, bucket_name, keys, threads=threads)
+        )
+    except ClientError as e:
+        # A whole batch was refused, or the listing under prefix failed
+        typer.secho(f"Error deleting keys -> {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1)
+    if failed:
+        raise typer.Exit(code=1)
+
+
+def _transfer_settings(
+    chunk_size, max_concurrency, multipart_threshold, max_connections, files, threads
+) -> transfer_config.TransferSettings:
+    try:
+        return transfer_config.TransferSettings(
+            chunk_size=chunk_size,
+            max_concurrency=max_concurrency,
+            multipart_threshold=multipart_threshold,
+            max_connections=max_connections,
+            files=files,
+            threads=threads,
+        )
+    except ValueError as e:
+        typer.echo(f"{e}")
+        raise typer.Exit(code=1)
+
+
+def _upload_file(
+    file_path: str,
+    upload_path: str,
+    upload_permission: str,
+    settings: Union[transfer_config.TransferSettings, None] = None,
+    resume: bool = False,
+    key: Union[str, None] = None,
+    tracker: Union[progress.Progress, None] = None,
+) -> bool:
+    contents, _, bucket_name, client = get_login()
 
     file_name = Path(file_path).name
-    key = f"{upload_path}/{file_name}"
+    if key is None:
+        key = f"{upload_path}/{file_name}"
     video_size = os.path.getsize(file_path)
 
-    progbar = tqdm(
-        total=video_size, unit="B", unit_scale=True, unit_divisor=1024, desc=file_name
-    )
-
-    def upload_progress(chunk):
-        progbar.update(chunk)
+    if tracker is None:
+        tracker = progress.silent()
+    upload_progress = tracker.callback()
 
     mimetype, _ = mimetypes.guess_type(file_path)
 
@@ -372,19 +730,41 @@ def _upload_file(file_path: str, upload_path: str, upload_permission: str):
 
     extra_args = {"ContentType": mimetype, "ACL": upload_permission}
 
+    if settings is None:
+        settings = transfer_config.TransferSettings()
+
+    config = settings.config_for(video_size)
+
     # TODO Better error message when this fails | Change for 0.3.2
     try:
-        contents.upload_file(
-            Filename=file_path,
-            Key=key,
-            Callback=upload_progress,
-            ExtraArgs=extra_args,
-        )
+        if resume and video_size >= config.multipart_threshold:
+            resumable.upload_file(
+                client,
+                bucket_name,
+                file_path,
+                key,
+                extra_args,
+                part_size=config.multipart_chunksize,
+                max_concurrency=config.max_concurrency,
+                callback=upload_progress,
+            )
+        else:
+            contents.upload_file(
+                Filename=file_path,
+                Key=key,
+                Callback=upload_progress,
+                ExtraArgs=extra_args,
+                Config=config,
+            )
     except Exception as e:
-        progbar.close()
-        typer.secho(f"{e}", fg=typer.colors.RED, err=True)
+        tracker.object_failed()
+        typer.secho(
+            f"Error uploading -> {file_path}: {e}", fg=typer.colors.RED, err=True
+        )
+        return False
 
-    progbar.close()
+    tracker.object_done()
+    return True
 
 
 # TODO Add a default delimiter!
@@ -402,7 +782,12 @@ def upload(
         None,
         "--upload-from-file",
         "-ff",
-        help="Upload using text file containing paths to files separated by commas (,)",
+        help="Upload using a list written by create-upload-list, in any of its formats. The list is read while uploading, so it can hold millions of files",
+    ),
+    manifest_format: Union[ManifestFormats, None] = typer.Option(
+        None,
+        "--manifest-format",
+        help="Used with --upload-from-file. Format of the list, for lists not written by create-upload-list. Lists without a header are taken as comma separated unless they have a NUL character, or a new line before more text",
     ),
     permissions: str = typer.Option(
         "public-read",
@@ -413,6 +798,69 @@ def upload(
     threads: int = typer.Option(
         3, "--threads", "-t", help="Amount of threads used to upload in parallel"
     ),
+    chunk_size: Union[str, None] = typer.Option(
+        None,
+        "--chunk-size",
+        envvar="S3_TOOL_CHUNK_SIZE",
+        help="Multipart part size, e.g. 64MB. 'auto' picks the part size and per file concurrency from each object's size and the amount of files uploaded at once",
+    ),
+    max_concurrency: Union[int, None] = typer.Option(
+        None,
+        "--max-concurrency",
+        envvar="S3_TOOL_MAX_CONCURRENCY",
+        help="Amount of parts of a single file uploaded in parallel. Defaults to 10",
+    ),
+    multipart_threshold: Union[str, None] = typer.Option(
+        None,
+        "--multipart-threshold",
+        envvar="S3_TOOL_MULTIPART_THRESHOLD",
+        help="Files of this size or bigger, e.g. 64MB, are uploaded in parts. Defaults to 8MB",
+    ),
+    max_connections: int = typer.Option(
+        64,
+        "--max-connections",
+        envvar="S3_TOOL_MAX_CONNECTIONS",
+        help="Used with --chunk-size auto. Total amount of connections shared by every file uploaded at once",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Multipart uploads are recorded in a local journal (S3_TOOL_JOURNAL_DIR), so running the same upload again continues where it stopped",
+    ),
+    engine: Engines = typer.Option(
+        Engines.threads,
+        "--engine",
+        help="'async' keeps up to THREADS requests in flight on a single asyncio event loop. Needs aiobotocore",
+    ),
+    directory: Union[str, None] = typer.Option(
+        None,
+        "--dir",
+        "-d",
+        help="Uploads every file under this folder, keeping their paths relative to it at the end of their keys. Uploads start while the folder is still being walked",
+    ),
+    include: List[str] = typer.Option(
+        None,
+        "--include",
+        help="Used with --dir. Only uploads files whose relative path or name matches one of these globs, e.g. '*.mp4'",
+    ),
+    exclude: List[str] = typer.Option(
+        None,
+        "--exclude",
+        help="Used with --dir. Skips files and folders whose relative path or name matches one of these globs",
+    ),
+    pack: Union[PackFormats, None] = typer.Option(
+        None,
+        "--pack",
+        help="Packs files smaller than the multipart threshold into archives of about PACK_SIZE, each uploaded with an index of its members (ARCHIVE.index.json) that download --pack reads them back from",
+    ),
+    pack_size: str = typer.Option(
+        "64MB", "--pack-size", help="Used with --pack. Size of every archive, e.g. 64MB"
+    ),
+    skip_identical: bool = typer.Option(
+        False,
+        "--skip-identical",
+        help="Skips files whose object already has the same size and MD5/ETag. Objects are looked up with a HEAD request each with --files, and by listing UPLOAD_PATH otherwise. Hashes are computed on every CPU and cached (S3_TOOL_HASH_CACHE) by path, size and modification time",
+    ),
 ):
     """
     Uploads a single file or multiple files. Files need to have their absolute path.
@@ -420,81 +868,684 @@ def upload(
     Optionally, one can choose the amount of threads that should be used.
     """
 
-    if files:
+    if not files and not directory and not upload_from_file:
+        typer.echo("You must choose at least one file to upload")
+        raise typer.Abort()
+
+    if engine == Engines.asyncio and (directory or pack or skip_identical):
+        typer.echo(
+            "--dir, --pack and --skip-identical are not supported by the async engine"
+        )
+        raise typer.Exit(code=1)
+    if pack and skip_identical:
+        typer.echo("Packed files can not be checked with --skip-identical")
+        raise typer.Exit(code=1)
+
+    # (file path, key suffix) of every file, for the modes that stream them
+    found: Iterator[Tuple[str, str]] = iter(())
+
+    if directory:
+        if not Path(directory).is_dir():
+            typer.echo("Your input is not a folder!")
+            raise typer.Abort()
+
+        def unreadable(error: OSError) -> None:
+            typer.secho(
+                f"Could not read {error.filename} -> {error}",
+                fg=typer.colors.RED,
+                err=True,
+            )
+
+        found = walking.walk(
+            directory, include or (), exclude or (), onerror=unreadable
+        )
+
+    elif files:
         for file in files:
             if not Path(file).is_file():
                 typer.echo("Your input is not a file!")
                 raise typer.Abort()
+        names = Counter(Path(file).name for file in files)
+        twice = sorted(name for name, count in names.items() if count > 1)
+        if pack and twice:
+            typer.echo(
+                f"Files with the same name can not be packed: {', '.join(twice)}"
+            )
+            raise typer.Exit(code=1)
+        found = ((file, Path(file).name) for file in files)
 
     elif upload_from_file:
-        with open(upload_from_file, "r") as file_paths:
-            paths = file_paths.read().strip()
-            separated_paths = paths.split(",")
-            files = [p.strip() for p in separated_paths]
+        fmt = manifest_format.value if manifest_format else None
+        listed = (entry.path for entry in manifest.read(upload_from_file, fmt))
+        if engine == Engines.asyncio:
+            # The async engine takes a list
+            files = list(listed)
+            for file in files:
+                if not Path(file).is_file():
+                    typer.echo(f"{file} is not a file!")
+                    raise typer.Abort()
+        else:
+            found = ((path, Path(path).name) for path in listed)
+
+    if engine == Engines.asyncio:
+        _, _, bucket_name, _ = get_login()
+        _run_async(
+            async_engine.upload(
+                _login["login_data"],
+                bucket_name,
+                files,
+                upload_path,
+                permissions,
+                threads,
+            )
+        )
+        return
 
-        for file in files:
-            if not Path(file).is_file():
-                typer.echo(f"{file} is not a file!")
-                raise typer.Abort()
+    if directory or upload_from_file or pack or skip_identical:
+        # Files are found while uploading, so threads are always busy
+        settings = _transfer_settings(
+            chunk_size,
+            max_concurrency,
+            multipart_threshold,
+            max_connections,
+            threads,
+            threads,
+        )
+        get_login(max_pool_connections=settings.pool_size)
+        pack_bytes = 0
+        if pack:
+            try:
+                pack_bytes = transfer_config.parse_size(pack_size)
+            except ValueError as e:
+                typer.echo(f"{e}")
+                raise typer.Exit(code=1)
+
+        with _options().tracker("upload") as tracker:
+            found = _expected(found, tracker)
+            if pack:
+                _upload_packs(
+                    found,
+                    upload_path,
+                    permissions,
+                    settings,
+                    resume,
+                    threads,
+                    pack,
+                    pack_bytes,
+                    tracker,
+                )
+            else:
+                uploads = ((path, f"{upload_path}/{name}") for path, name in found)
+                if skip_identical:
+                    uploads = _skip_identical(
+                        uploads, upload_path, bool(files), tracker
+                    )
+                _upload_stream(
+                    uploads,
+                    upload_path,
+                    permissions,
+                    settings,
+                    resume,
+                    threads,
+                    tracker,
+                )
+        return
+
+    settings = _transfer_settings(
+        chunk_size,
+        max_concurrency,
+        multipart_threshold,
+        max_connections,
+        len(files),
+        threads,
+    )
+    get_login(max_pool_connections=settings.pool_size)
+
+    with _options().tracker(
+        "upload",
+        total_bytes=sum(os.path.getsize(file) for file in files),
+        total_objects=len(files),
+    ) as tracker:
+        tracker.totals_known()
+        try:
+            executor = ThreadPoolExecutor(max_workers=threads)
+            futures = [
+                executor.submit(
+                    _upload_file,
+                    vid,
+                    upload_path,
+                    permissions,
+                    settings,
+                    resume,
+                    tracker=tracker,
+                )
+                for vid in files
+            ]
+            for f in futures:
+                f.result()
+        except Exception as e:
+            typer.secho(f"{e}", fg=typer.colors.RED, err=True)
+
+
+def _expected(
+    found: Iterator[Tuple[str, str]], tracker: progress.Progress
+) -> Iterator[Tuple[str, str]]:
+    """Adds the files of a stream to the totals of tracker as they are read"""
+    for file_path, name in found:
+        try:
+            tracker.expect(os.path.getsize(file_path))
+        except OSError:
+            # Reported once its upload fails
+            tracker.expect(0)
+        yield file_path, name
+    tracker.totals_known()
+
+
+def _upload_stream(
+    found: Iterator[Tuple[str, str]],
+    upload_path: str,
+    permissions: str,
+    settings: transfer_config.TransferSettings,
+    resume: bool,
+    threads: int,
+    tracker: progress.Progress,
+):
+    """
+    Uploads a lazy stream of (file path, key) as it is read. Exits with 1
+    if any file failed.
+    """
+
+    def upload_found(item) -> bool:
+        file_path, key = item
+        if not os.path.isfile(file_path):
+            typer.echo(f"{file_path} is not a file!")
+            return False
+        return _upload_file(
+            file_path,
+            upload_path,
+            permissions,
+            settings,
+            resume,
+            key=key,
+            tracker=tracker,
+        )
+
+    failed = 0
+    for _, uploaded, error in pipeline.stream(
+        upload_found, found, threads, max_queued=threads * 20
+    ):
+        if error is not None:
+            typer.secho(f"{error}", fg=typer.colors.RED, err=True)
+        if error is not None or not uploaded:
+            failed += 1
+
+    if failed:
+        raise typer.Exit(code=1)
 
+
+def _skip_identical(
+    uploads: Iterator[Tuple[str, str]],
+    upload_path: str,
+    heads: bool,
+    tracker: progress.Progress,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Passes on the (file path, key) of uploads whose object is missing or
+    different. Objects are looked up with a HEAD request each when heads,
+    or from a single listing of upload_path otherwise.
+    """
+    _, _, bucket_name, client = get_login()
+
+    def head(key: str) -> Union[Tuple[int, str], None]:
+        try:
+            response = client.head_object(Bucket=bucket_name, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response["ContentLength"], response["ETag"]
+
+    if heads:
+        remote = head
+    else:
+        listed = {
+            obj["Key"]: (obj["Size"], obj.get("ETag"))
+            for obj in listing.iter_objects(client, bucket_name, f"{upload_path}/")
+        }
+        remote = listed.get
+
+    def part_size(key: str, etag: str) -> Union[int, None]:
+        return hashing.object_part_size(client, bucket_name, key, etag)
+
+    skipped = 0
+    for file_path, key, same in hashing.identical(uploads, remote, part_size):
+        if same:
+            tracker.expect(-os.path.getsize(file_path), -1)
+            skipped += 1
+        else:
+            yield file_path, key
+
+    if skipped:
+        typer.echo(f"Skipped {skipped} identical files")
+
+
+def _upload_packs(
+    found: Iterator[Tuple[str, str]],
+    upload_path: str,
+    permissions: str,
+    settings: transfer_config.TransferSettings,
+    resume: bool,
+    threads: int,
+    fmt: str,
+    pack_size: int,
+    tracker: progress.Progress,
+):
+    """
+    Packs a lazy stream of (file path, member name) into archives uploaded
+    as upload_path/pack-TIME-N.tar|zip, each next to the index of its
+    members. Files of the multipart threshold or bigger are uploaded as
+    upload_path/member name instead. Exits with 1 if anything failed.
+    """
+    contents, _, bucket_name, client = get_login()
+    started = datetime.now().strftime("%Y%m%dT%H%M%S")
+    max_member_size = min(pack_size, settings.config_for().multipart_threshold)
+
+    def upload_packed(item) -> Union[str, None]:
+        if isinstance(item, packing.Single):
+            key = f"{upload_path}/{item.name}"
+            uploaded = _upload_file(
+                item.path,
+                upload_path,
+                permissions,
+                settings,
+                resume,
+                key=key,
+                tracker=tracker,
+            )
+            return key if uploaded else None
+
+        key = f"{upload_path}/pack-{started}-{item.number:05d}.{fmt}"
+        # Counted by member, the totals only know the files
+        members_size = sum(size for _, size in item.members.values())
+        contents.upload_fileobj(
+            io.BytesIO(item.body),
+            key,
+            ExtraArgs={"ContentType": packing.CONTENT_TYPES[fmt], "ACL": permissions},
+            Config=settings.config_for(len(item.body)),
+        )
+        # Written last, an index always points to a complete archive
+        client.put_object(
+            Bucket=bucket_name,
+            Key=f"{key}{packing.INDEX_SUFFIX}",
+            Body=packing.index_body(key, fmt, item.members),
+            ContentType="application/json",
+            ACL=permissions,
+        )
+        tracker.add_bytes(members_size)
+        tracker.object_done(len(item.members))
+        return key
+
+    packed = packing.pack(found, fmt, pack_size, max_member_size)
+    failed = 0
     try:
-        executor = ThreadPoolExecutor(max_workers=threads)
-        futures = [
-            executor.submit(_upload_file, vid, upload_path, permissions)
-            for vid in files
-        ]
-        for f in futures:
-            f.result()
-    except Exception as e:
+        # Archives are built one at a time while up to threads are uploaded
+        for item, key, error in pipeline.stream(
+            upload_packed, packed, threads, max_queued=1
+        ):
+            if error is not None:
+                typer.secho(f"{error}", fg=typer.colors.RED, err=True)
+                tracker.object_failed()
+                failed += 1
+            elif key is None:
+                failed += 1
+            elif isinstance(item, packing.Archive):
+                typer.echo(f"Packed {len(item.members)} files into {key}")
+    except ValueError as e:
+        # A member name given twice, the files packed so far are uploaded
         typer.secho(f"{e}", fg=typer.colors.RED, err=True)
+        failed += 1
 
+    if failed:
+        raise typer.Exit(code=1)
+
+
+def _download_members(
+    archive_key: str, members: List[str], download_path: str, threads: int
+):
+    """Downloads members of a packed archive, keeping their relative paths"""
+    _, _, bucket_name, client = get_login()
 
-def _downloader(file_key, download_path, recursive: bool = False):
     try:
-        contents, _, _, _ = get_login()
+        members_index = packing.read_index(client, bucket_name, archive_key)["members"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            typer.echo(f"Pack index not found! -> {archive_key}")
+            raise typer.Exit(code=1)
+        raise
+
+    root = os.path.abspath(download_path)
+
+    def fetch(member: str) -> str:
+        entry = members_index.get(member)
+        if entry is None:
+            raise ValueError(f"Member not found in pack! -> {member}")
+        dest = os.path.abspath(os.path.join(root, *member.split("/")))
+        if not dest.startswith(root + os.sep):
+            raise ValueError(f"Member outside of the download path! -> {member}")
+        data = packing.read_member(
+            client, bucket_name, archive_key, entry["offset"], entry["size"]
+        )
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "wb") as f:
+            f.write(data)
+        return dest
+
+    failed = 0
+    for member, dest, error in pipeline.stream(fetch, members, threads):
+        if error is not None:
+            typer.secho(f"{error}", fg=typer.colors.RED, err=True)
+            failed += 1
+        else:
+            typer.echo(f"{member} -> {dest}")
 
-        file = contents.Object(file_key)
+    if failed:
+        raise typer.Exit(code=1)
+
+
+def _download_destination(file_key: str, download_path: str, recursive: bool) -> str:
+    """Recursive downloads recreate the key's "subfolders" inside download_path"""
+    filename = os.path.basename(file_key)
+    if not recursive:
+        return os.path.join(download_path, f"{filename}")
 
-        # Checks if object exists, else -> throws Exception
-        file.load()
+    recursive_subdirs = os.sep.join(file_key.split("/")[:-1])
+    download_path_with_subdirs = os.path.join(download_path, recursive_subdirs)
+    if not os.path.exists(download_path_with_subdirs):
+        os.makedirs(download_path_with_subdirs, exist_ok=True)
+    return os.path.join(download_path_with_subdirs, f"{filename}")
 
-        filename = os.path.basename(file_key)
-        file_path = file.key.split("/")
-        recursive_subdirs = os.sep.join(file_path[:-1])
-        download_path_with_subdirs = os.path.join(download_path, recursive_subdirs)
 
-        progbar = tqdm(
-            total=file.content_length,
-            unit="B",
-            unit_scale=True,
-            unit_divisor=1024,
-            desc=filename,
+@app.command("abort-uploads")
+def abort_uploads(
+    prefix: str = typer.Option(
+        "", "--prefix", "-p", help="Only aborts uploads of keys under this prefix"
+    ),
+    older_than: int = typer.Option(
+        24,
+        "--older-than",
+        help="Only aborts uploads started at least this many hours ago",
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Lists the stale uploads without aborting them"
+    ),
+):
+    """
+    Aborts incomplete multipart uploads, freeing the storage used by their
+    parts. Resumable uploads that get aborted start over when run again.
+    """
+    _, _, bucket_name, client = get_login()
+
+    found = 0
+    for stale in resumable.iter_stale_uploads(
+        client, bucket_name, prefix, timedelta(hours=older_than)
+    ):
+        found += 1
+        if dry_run:
+            typer.echo(f"{stale['Key']} -> started {stale['Initiated']}")
+            continue
+
+        client.abort_multipart_upload(
+            Bucket=bucket_name, Key=stale["Key"], UploadId=stale["UploadId"]
         )
+        message = "Aborted upload: "
+        aborted = typer.style(f"{stale['Key']}", fg=typer.colors.RED)
+        typer.echo(message + aborted)
 
-        def download_progress(chunk):
-            progbar.update(chunk)
+    if found == 0:
+        typer.echo("No incomplete uploads found!")
 
-        download_dest = os.path.join(download_path, f"{filename}")
 
-        if recursive:
-            if not os.path.exists(download_path_with_subdirs):
-                os.makedirs(download_path_with_subdirs, exist_ok=True)
-            download_dest = os.path.join(download_path_with_subdirs, f"{filename}")
+class _KnownObject(BaseSubscriber):
+    """
+    Gives a download the size and ETag of its object, so s3transfer skips
+    its HEAD request. Recent versions send the ETag as IfMatch with every
+    ranged GET, so parts of two versions of an object never get mixed.
+    """
 
-        contents.download_file(
-            file.key,
-            download_dest,
-            Callback=download_progress,
-        )
+    def __init__(self, size: int, etag: Union[str, None]):
+        self.size = size
+        self.etag = etag
+
+    def on_queued(self, future, **kwargs):
+        future.meta.provide_transfer_size(self.size)
+        if self.etag and hasattr(future.meta, "provide_object_etag"):
+            future.meta.provide_object_etag(self.etag)
+
+
+def _downloader(
+    file_key,
+    download_path,
+    recursive: bool = False,
+    settings: Union[transfer_config.TransferSettings, None] = None,
+    resume: bool = False,
+    download_dest: Union[str, None] = None,
+    size: Union[int, None] = None,
+    etag: Union[str, None] = None,
+    tracker: Union[progress.Progress, None] = None,
+) -> bool:
+    """
+    Downloads a key. size and etag usually come from a listing, when
+    missing they are read with a HEAD request.
+    """
+    if tracker is None:
+        tracker = progress.silent()
+    try:
+        contents, _, bucket_name, client = get_login()
 
-        progbar.close()
+        file = contents.Object(file_key)
+
+        if size is None:
+            # Checks if object exists, else -> throws Exception
+            file.load()
+            size, etag = file.content_length, file.e_tag
+            tracker.expect(size, 0)
+
+        download_progress = tracker.callback()
+
+        if download_dest is None:
+            download_dest = _download_destination(file_key, download_path, recursive)
+
+        if settings is None:
+            settings = transfer_config.TransferSettings()
+        config = settings.config_for(size)
+
+        if resume and size >= config.multipart_threshold:
+            ranged.download_file(
+                client,
+                bucket_name,
+                file_key,
+                download_dest,
+                size,
+                etag,
+                part_size=config.multipart_chunksize,
+                max_concurrency=config.max_concurrency,
+                callback=download_progress,
+                # Loads the object's encryption with a HEAD if it was listed
+                verify=file.server_side_encryption != "aws:kms"
+                and not file.sse_customer_algorithm,
+            )
+        else:
+            with create_transfer_manager(client, config) as manager:
+                manager.download(
+                    bucket_name,
+                    file_key,
+                    download_dest,
+                    subscribers=[
+                        _KnownObject(size, etag),
+                        ProgressCallbackInvoker(download_progress),
+                    ],
+                ).result()
 
     except Exception as e:
+        tracker.object_failed()
         pre_msg = typer.style("Error downloading -> ", fg=typer.colors.RED)
         failed_key = f"{file_key}"
         message = pre_msg + failed_key
         typer.echo(message)
         typer.secho(f"{e}", fg=typer.colors.RED, err=True)
+        return False
+
+    tracker.object_done()
+    return True
+
+
+def _downloaded_etags(skip_existing: Union[SkipModes, None]):
+    """The ETag cache of a download run, only opened to skip existing files"""
+    return hashing.DownloadedETags() if skip_existing else nullcontext()
+
+
+def _already_downloaded(
+    dest: str,
+    obj: dict,
+    mode: SkipModes,
+    etags: Union[hashing.DownloadedETags, None] = None,
+) -> bool:
+    """
+    Checks a local file against an object's size and either its last
+    modification or, in etag mode, the ETag cached in etags when it was
+    downloaded
+    """
+    try:
+        stat = os.stat(dest)
+    except FileNotFoundError:
+        return False
+    if stat.st_size != obj["Size"]:
+        return False
+    if mode == SkipModes.etag:
+        return (
+            etags is not None
+            and bool(obj.get("ETag"))
+            and etags.get(dest) == obj["ETag"]
+        )
+    return stat.st_mtime + sync.MTIME_WINDOW >= obj["LastModified"].timestamp()
+
+
+def _download_key(
+    key: str,
+    download_path: str,
+    settings: transfer_config.TransferSettings,
+    resume: bool,
+    skip_existing: Union[SkipModes, None] = None,
+    listed: Union[dict, None] = None,
+    recursive: bool = False,
+    tracker: Union[progress.Progress, None] = None,
+    etags: Union[hashing.DownloadedETags, None] = None,
+) -> Union[bool, None]:
+    """
+    Downloads a key unless skip_existing finds it was already downloaded,
+    returning None then. listed is the key's object as found in a listing.
+    Without it, the object is looked up with a HEAD request, sent with
+    If-None-Match in etag mode so a 304 means the file is the same. etags
+    is the run's cache of downloaded ETags, see _downloaded_etags.
+    """
+    dest = _download_destination(key, download_path, recursive)
+    if tracker is None:
+        tracker = progress.silent()
+
+    # Done here rather than by the download, which would need the ETag too
+    if skip_existing and listed is None:
+        _, _, bucket_name, client = get_login()
+        head_args = {"Bucket": bucket_name, "Key": key}
+        cached = None
+        if skip_existing == SkipModes.etag and etags is not None:
+            cached = etags.get(dest)
+        if cached:
+            head_args["IfNoneMatch"] = cached
+        try:
+            response = client.head_object(**head_args)
+            listed = {
+                "Size": response["ContentLength"],
+                "ETag": response.get("ETag"),
+                "LastModified": response["LastModified"],
+            }
+            tracker.expect(listed["Size"], 0)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "304":
+                tracker.expect(0, -1)
+                return None
+            # Reported by the download itself
+
+    if skip_existing and listed is not None:
+        if _already_downloaded(dest, listed, skip_existing, etags):
+            tracker.expect(-listed["Size"], -1)
+            return None
+
+    size = etag = None
+    if listed is not None:
+        size, etag = listed["Size"], listed.get("ETag")
+    if not _downloader(
+        key,
+        download_path,
+        settings=settings,
+        resume=resume,
+        download_dest=dest,
+        size=size,
+        etag=etag,
+        tracker=tracker,
+    ):
+        return False
+    if etags is not None and etag:
+        etags.remember(dest, etag)
+    return True
+
+
+def _download_stream(
+    listed: Iterator[dict],
+    download_path: str,
+    settings: transfer_config.TransferSettings,
+    resume: bool,
+    threads: int,
+    tracker: progress.Progress,
+    skip_existing: Union[SkipModes, None] = None,
+    etags: Union[hashing.DownloadedETags, None] = None,
+):
+    """
+    Downloads the objects of a listing while it is still being read,
+    reusing their listed size and ETag instead of a HEAD request each.
+    """
+
+    def download_listed(obj: dict) -> Union[bool, None]:
+        return _download_key(
+            obj["Key"],
+            download_path,
+            settings,
+            resume,
+            skip_existing,
+            listed=obj,
+            recursive=True,
+            tracker=tracker,
+            etags=etags,
+        )
+
+    def objects() -> Iterator[dict]:
+        for obj in listed:
+            # "Folder" placeholder objects have nothing to download
+            if not obj["Key"].endswith("/"):
+                tracker.expect(obj["Size"])
+                yield obj
+        tracker.totals_known()
+
+    skipped = 0
+    for _, downloaded, error in pipeline.stream(
+        download_listed, objects(), threads, max_queued=threads * 20
+    ):
+        if error is not None:
+            typer.secho(f"{error}", fg=typer.colors.RED, err=True)
+        elif downloaded is None:
+            skipped += 1
+
+    if skipped:
+        typer.echo(f"Skipped {skipped} files already downloaded")
 
 
 @app.command()
@@ -519,6 +1570,56 @@ def download(
     threads: int = typer.Option(
         3, "--threads", "-t", help="Amount of threads used to download in parallel"
     ),
+    chunk_size: Union[str, None] = typer.Option(
+        None,
+        "--chunk-size",
+        envvar="S3_TOOL_CHUNK_SIZE",
+        help="Multipart part size, e.g. 64MB. 'auto' picks the part size and per file concurrency from each object's size and the amount of files downloaded at once",
+    ),
+    max_concurrency: Union[int, None] = typer.Option(
+        None,
+        "--max-concurrency",
+        envvar="S3_TOOL_MAX_CONCURRENCY",
+        help="Amount of parts of a single file downloaded in parallel. Defaults to 10",
+    ),
+    multipart_threshold: Union[str, None] = typer.Option(
+        None,
+        "--multipart-threshold",
+        envvar="S3_TOOL_MULTIPART_THRESHOLD",
+        help="Files of this size or bigger, e.g. 64MB, are downloaded in parts. Defaults to 8MB",
+    ),
+    max_connections: int = typer.Option(
+        64,
+        "--max-connections",
+        envvar="S3_TOOL_MAX_CONNECTIONS",
+        help="Used with --chunk-size auto. Total amount of connections shared by every file downloaded at once",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Big files are fetched as byte ranges tracked in a sidecar file, so running the same download again only fetches the missing ranges. Files are checked against their ETag",
+    ),
+    engine: Engines = typer.Option(
+        Engines.threads,
+        "--engine",
+        help="'async' keeps up to THREADS requests in flight on a single asyncio event loop. Needs aiobotocore",
+    ),
+    index_ttl: int = typer.Option(
+        0,
+        "--index-ttl",
+        envvar="S3_TOOL_INDEX_TTL",
+        help="Used with --recursive. Lists keys from a local index (S3_TOOL_INDEX) that only fetches keys added since the last listing, re-listing in full once this many seconds old. 0 disables the index",
+    ),
+    pack: Union[str, None] = typer.Option(
+        None,
+        "--pack",
+        help="Key of an archive uploaded with upload --pack. FILES are then member names, each fetched with a single ranged request",
+    ),
+    skip_existing: Union[SkipModes, None] = typer.Option(
+        None,
+        "--skip-existing",
+        help="Skips objects already downloaded. 'mtime' skips local files of the same size modified after the object. 'etag' skips local files whose object has the same ETag as when they were downloaded, cached (S3_TOOL_HASH_CACHE) by path, size and modification time. Files given with --files are checked with a HEAD request, sent with If-None-Match in etag mode",
+    ),
 ):
     """Downloads a key or series of keys"""
     executor = ThreadPoolExecutor(max_workers=threads)
@@ -530,24 +1631,264 @@ def download(
         typer.echo("You must choose at least one file to download")
         raise typer.Abort()
 
+    if recursive and not recursive.endswith("/"):
+        typer.echo("Please add the delimiter / at the end.")
+        raise typer.Exit(code=1)
+
+    if pack:
+        _download_members(pack, files or [], download_path, threads)
+        return
+
+    if engine == Engines.asyncio:
+        _, _, bucket_name, _ = get_login()
+        _run_async(
+            async_engine.download(
+                _login["login_data"],
+                bucket_name,
+                None if recursive else files,
+                download_path,
+                threads,
+                _download_destination,
+                recursive,
+                _options(),
+            )
+        )
+        return
+
     if recursive:
-        if not recursive.endswith("/"):
-            typer.echo("Please add the delimiter / at the end.")
-            raise typer.Exit(code=1)
+        # Keys are listed while downloading, so threads are always busy
+        settings = _transfer_settings(
+            chunk_size,
+            max_concurrency,
+            multipart_threshold,
+            max_connections,
+            threads,
+            threads,
+        )
+        _, _, bucket_name, client = get_login(max_pool_connections=settings.pool_size)
+        if index_ttl > 0:
+            listed = index.objects(client, bucket_name, recursive, index_ttl)
+        else:
+            listed = listing.iter_objects(client, bucket_name, recursive)
+        with _options().tracker("download") as tracker, _downloaded_etags(
+            skip_existing
+        ) as etags:
+            _download_stream(
+                listed,
+                download_path,
+                settings,
+                resume,
+                threads,
+                tracker,
+                skip_existing,
+                etags,
+            )
+        return
 
-        contents, _, _, _ = get_login()
-        files = [obj.key for obj in contents.objects.filter(Prefix=recursive)]
+    settings = _transfer_settings(
+        chunk_size,
+        max_concurrency,
+        multipart_threshold,
+        max_connections,
+        len(files),  # type: ignore
+        threads,
+    )
+    get_login(max_pool_connections=settings.pool_size)
 
+    # Sizes are added as the objects are looked up
+    with _options().tracker(
+        "download", total_objects=len(files)  # type: ignore
+    ) as tracker, _downloaded_etags(skip_existing) as etags:
         futures = [
-            executor.submit(_downloader, vid, download_path, recursive=True)
-            for vid in files
+            executor.submit(
+                _download_key,
+                vid,
+                download_path,
+                settings,
+                resume,
+                skip_existing,
+                tracker=tracker,
+                etags=etags,
+            )
+            for vid in files  # type: ignore
         ]
+        skipped = sum(1 for f in futures if f.result() is None)
+    if skipped:
+        typer.echo(f"Skipped {skipped} files already downloaded")
 
-    else:
-        futures = [executor.submit(_downloader, vid, download_path) for vid in files]  # type: ignore
 
-    for f in futures:
-        f.result()
+@app.command("sync")
+def sync_folder(
+    local_path: str = typer.Argument(..., help="Local folder"),
+    prefix: str = typer.Argument(
+        "", help="Bucket prefix ending with the delimiter /. Empty for the whole bucket"
+    ),
+    direction: Directions = typer.Option(
+        Directions.up,
+        "--direction",
+        "-d",
+        help="'up' makes the prefix match the local folder, 'down' the local folder match the prefix",
+    ),
+    checksum: bool = typer.Option(
+        False,
+        "--checksum",
+        "-c",
+        help="Compares files of the same size by their MD5/ETag instead of their modification time",
+    ),
+    delete: bool = typer.Option(
+        False,
+        "--delete",
+        help="Deletes files on the destination that are not found on the source",
+    ),
+    dry_run: bool = typer.Option(
+        False,
+        "--dry-run",
+        help="Prints what would be transferred and deleted without doing it",
+    ),
+    permissions: ACLTypes = typer.Option(
+        ACLTypes.public_read.value,
+        "--permissions",
+        "-p",
+        help="Sets the permission for the uploaded files.",
+    ),
+    threads: int = typer.Option(
+        3, "--threads", "-t", help="Amount of threads used to transfer in parallel"
+    ),
+    chunk_size: Union[str, None] = typer.Option(
+        None,
+        "--chunk-size",
+        envvar="S3_TOOL_CHUNK_SIZE",
+        help="Multipart part size, e.g. 64MB. 'auto' picks the part size and per file concurrency from each object's size and the amount of files transferred at once",
+    ),
+    max_concurrency: Union[int, None] = typer.Option(
+        None,
+        "--max-concurrency",
+        envvar="S3_TOOL_MAX_CONCURRENCY",
+        help="Amount of parts of a single file transferred in parallel. Defaults to 10",
+    ),
+    multipart_threshold: Union[str, None] = typer.Option(
+        None,
+        "--multipart-threshold",
+        envvar="S3_TOOL_MULTIPART_THRESHOLD",
+        help="Files of this size or bigger, e.g. 64MB, are transferred in parts. Defaults to 8MB",
+    ),
+    max_connections: int = typer.Option(
+        64,
+        "--max-connections",
+        envvar="S3_TOOL_MAX_CONNECTIONS",
+        help="Used with --chunk-size auto. Total amount of connections shared by every file transferred at once",
+    ),
+):
+    """
+    Syncs a local folder with a prefix, transferring only the files that are
+    new or changed: their size differs or the source was modified later.
+    The folder and the prefix are listed at the same time.
+    """
+    if prefix and not prefix.endswith("/"):
+        typer.echo("Please add the delimiter / at the end.")
+        raise typer.Exit(code=1)
+
+    if direction == Directions.down:
+        os.makedirs(local_path, exist_ok=True)
+    elif not os.path.isdir(local_path):
+        typer.echo(f"{local_path} is not a folder!")
+        raise typer.Exit(code=1)
+
+    _, _, bucket_name, client = get_login()
+
+    local, remote = sync.scan(local_path, client, bucket_name, prefix)
+    same_content = (
+        sync.etag_checker(client, bucket_name, prefix, local_path, remote, threads)
+        if checksum
+        else None
+    )
+    to_upload, to_download, delete_remote, delete_local = sync.plan(
+        local, remote, direction.value, delete, same_content
+    )
+
+    def local_file(name: str) -> str:
+        return os.path.join(local_path, *name.split("/"))
+
+    if not any((to_upload, to_download, delete_remote, delete_local)):
+        typer.echo("Everything is up to date!")
+        return
+
+    if dry_run:
+        for name in to_upload:
+            typer.echo(f"upload: {local_file(name)} -> {prefix}{name}")
+        for name in to_download:
+            typer.echo(f"download: {prefix}{name} -> {local_file(name)}")
+        for name in delete_remote:
+            typer.echo(f"delete: {prefix}{name}")
+        for name in delete_local:
+            typer.echo(f"delete: {local_file(name)}")
+        return
+
+    settings = _transfer_settings(
+        chunk_size,
+        max_concurrency,
+        multipart_threshold,
+        max_connections,
+        len(to_upload) + len(to_download),
+        threads,
+    )
+    get_login(max_pool_connections=settings.pool_size)
+
+    def download_one(name: str) -> bool:
+        dest = local_file(name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if not _downloader(
+            prefix + name,
+            local_path,
+            settings=settings,
+            download_dest=dest,
+            size=remote[name].size,
+            etag=remote[name].etag,
+            tracker=tracker,
+        ):
+            return False
+        # Same modification time as the object, so the next sync skips it
+        os.utime(dest, (remote[name].mtime, remote[name].mtime))
+        return True
+
+    tracker = _options().tracker(
+        "sync",
+        total_bytes=sum(local[name].size for name in to_upload)
+        + sum(remote[name].size for name in to_download),
+        total_objects=len(to_upload) + len(to_download),
+    )
+    tracker.totals_known()
+    with tracker, ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [
+            executor.submit(
+                _upload_file,
+                local_file(name),
+                prefix,
+                permissions.value,
+                settings,
+                key=prefix + name,
+                tracker=tracker,
+            )
+            for name in to_upload
+        ]
+        futures += [executor.submit(download_one, name) for name in to_download]
+        failed = sum(not f.result() for f in futures)
+
+    if delete_remote:
+        failed += _report_deleted(
+            deletion.delete_keys(
+                client, bucket_name, [prefix + name for name in delete_remote], threads
+            )
+        )
+
+    for name in delete_local:
+        os.remove(local_file(name))
+        message = "Deleted file: "
+        deleted = typer.style(f"{local_file(name)}", fg=typer.colors.RED)
+        typer.echo(message + deleted)
+
+    if failed:
+        raise typer.Exit(code=1)
 
 
 # TODO Add option to append output to another file | Change for 0.3.3
@@ -559,6 +1900,19 @@ def create_upload_list(
         os.getcwd(),
         help="Choose an output path. Else, the file will be written on the folder where the command is executed",
     ),
+    recursive: bool = typer.Option(
+        False, "--recursive", "-r", help="Also lists the files in every subfolder"
+    ),
+    fmt: ManifestFormats = typer.Option(
+        ManifestFormats.commas,
+        "--format",
+        help="'lines' writes one path per line and 'nul' separates paths with NUL characters, which works with any path. 'commas' appends to an existing list",
+    ),
+    details: bool = typer.Option(
+        False,
+        "--details",
+        help="Used with --format lines or nul. Writes the size and modification time of every file next to its path",
+    ),
 ):
     """
     Writes a text file of all files in a folder with a given extension that
@@ -566,22 +1920,97 @@ def create_upload_list(
     at once
     """
 
-    p = Path(files_path)
+    if os_platform != "win32" and os_platform != "linux":
+        typer.echo("OS not compatible")
+        return
+    if details and fmt == ManifestFormats.commas:
+        typer.echo("--details needs --format lines or nul")
+        raise typer.Exit(code=1)
 
-    files = [file for file in p.iterdir() if Path(file).suffix == f".{file_extension}"]
+    extension = f".{file_extension}"
 
-    with open(os.path.join(output_path, "upload.txt"), "a") as upload_list:
-        if os_platform == "win32":
-            upload_list.write(",".join(f"{file}" for file in files))
-        elif os_platform == "linux":
-            upload_list.write(",".join(f"{file}" for file in files))
-        else:
-            typer.echo("OS not compatible")
-            typer.Abort()
+    def listed():
+        with os.scandir(files_path) as entries:
+            for entry in entries:
+                if entry.is_file() and Path(entry.name).suffix == extension:
+                    yield entry.path
+
+    if recursive:
+        found = walking.walk(files_path, include=[f"*{extension}"])
+        files = (path for path, _ in found)
+    else:
+        files = listed()
+
+    # Paths are written as they are found, the list is never held in memory
+    mode = "a" if fmt == ManifestFormats.commas else "w"
+    with open(os.path.join(output_path, "upload.txt"), mode) as upload_list:
+        manifest.write(upload_list, files, fmt, details)
 
     return
 
 
+def _move_prefix(
+    prefix: str,
+    destination_path: str,
+    permission: ACLTypes,
+    settings: transfer_config.TransferSettings,
+    threads: int,
+):
+    _, _, bucket_name, client = get_login()
+
+    if not prefix.endswith("/"):
+        typer.echo("Please add the delimiter / at the end.")
+        raise typer.Exit(code=1)
+
+    if destination_path == "":
+        typer.echo("Destination path cannot be empty!")
+        raise typer.Exit(code=1)
+
+    destination = destination_path.rstrip("/") + "/"
+    # Keys copied into the origin prefix would be listed and moved again
+    if destination.startswith(prefix) or prefix.startswith(destination):
+        typer.echo("Origin and destination prefixes can not contain each other")
+        raise typer.Exit(code=1)
+
+    results = moving.move_prefix(
+        client,
+        bucket_name,
+        prefix,
+        destination,
+        permission.value,
+        settings,
+        threads,
+        journal=moving.journal_path(bucket_name, prefix, destination),
+    )
+    if _report_moved(results, None):
+        raise typer.Exit(code=1)
+
+
+def _report_moved(results, total: Union[int, None]) -> int:
+    """Shows the progress of a move and echoes its errors, returning their count"""
+    failed = 0
+    tracker = _options().tracker("move", total_objects=total or 0)
+    if total is not None:
+        tracker.totals_known()
+    with tracker:
+        for orig, error in results:
+            if error is None:
+                tracker.object_done()
+                continue
+            tracker.object_failed()
+            failed += 1
+            code = None
+            if isinstance(error, ClientError):
+                code = error.response["Error"]["Code"]
+            if code in ("404", "NoSuchKey"):
+                typer.echo(f"Origin object not found! -> {orig}")
+            else:
+                typer.secho(
+                    f"Error moving -> {orig}: {error}", fg=typer.colors.RED, err=True
+                )
+    return failed
+
+
 @app.command("move-object")
 def move_object(
     destination_path: str = typer.Argument(
@@ -596,6 +2025,11 @@ def move_object(
         "-rn",
         help="Choose new object name. Destination path will have no effect but has to be input just the same.",
     ),
+    prefix: Union[str, None] = typer.Option(
+        None,
+        "--prefix",
+        help="Moves every key under this prefix, ending with the delimiter /, to the destination path keeping the rest of the key. Running an interrupted move again continues where it stopped",
+    ),
     permission: ACLTypes = typer.Option(
         ACLTypes.public_read.value,
         "--permissions",
@@ -605,13 +2039,55 @@ def move_object(
     threads: int = typer.Option(
         3, "--threads", "-t", help="Amount of threads used to upload in parallel."
     ),
+    chunk_size: Union[str, None] = typer.Option(
+        None,
+        "--chunk-size",
+        envvar="S3_TOOL_CHUNK_SIZE",
+        help="Multipart part size, e.g. 64MB. 'auto' picks the part size and per object concurrency from each object's size and the amount of objects copied at once",
+    ),
+    max_concurrency: Union[int, None] = typer.Option(
+        None,
+        "--max-concurrency",
+        envvar="S3_TOOL_MAX_CONCURRENCY",
+        help="Amount of parts of a single object copied in parallel. Defaults to 10",
+    ),
+    multipart_threshold: Union[str, None] = typer.Option(
+        None,
+        "--multipart-threshold",
+        envvar="S3_TOOL_MULTIPART_THRESHOLD",
+        help="Objects of this size or bigger, e.g. 64MB, are copied in parts. Defaults to 8MB",
+    ),
+    max_connections: int = typer.Option(
+        64,
+        "--max-connections",
+        envvar="S3_TOOL_MAX_CONNECTIONS",
+        help="Used with --chunk-size auto. Total amount of connections shared by every object copied at once",
+    ),
+    engine: Engines = typer.Option(
+        Engines.threads,
+        "--engine",
+        help="'async' keeps up to THREADS requests in flight on a single asyncio event loop. Needs aiobotocore",
+    ),
 ):
     """
     Moves objects from one location to another within the same bucket.
-    Also allow renaming an existing object.
+    Also allow renaming an existing object or moving a whole prefix.
     """
 
-    _, s3, bucket_name, client = get_login()
+    settings = _transfer_settings(
+        chunk_size,
+        max_concurrency,
+        multipart_threshold,
+        max_connections,
+        # A prefix holds an unknown amount of objects, at most threads at once
+        len(origin_files or []) if not prefix else threads,
+        threads,
+    )
+    _, _, bucket_name, client = get_login(max_pool_connections=settings.pool_size)
+
+    if prefix:
+        _move_prefix(prefix, destination_path, permission, settings, threads)
+        return
 
     if destination_path == "" and not rename:
         typer.echo("Destination path cannot be empty!")
@@ -641,74 +2117,222 @@ def move_object(
         else:
             dest = f'{"/".join(conserve_dest)}/{rename}'
 
-        _move_obj(permission, s3, client, bucket_name, original_obj, dest, rename=True)
-        _deleter(original_obj, prompt=False, feedback=False)
-
-        return
-
-    for f in origin_files:
-        splitted_file_name = f.split("/")
-
-        file_dict[f] = f"{destination_path}/{splitted_file_name[-1]}"
+        moves = [(original_obj, dest, None)]
 
-    try:
-        executor = ThreadPoolExecutor(max_workers=threads)
-        futures = [
-            executor.submit(_move_obj, permission, s3, client, bucket_name, orig, dest)
-            for orig, dest in file_dict.items()
-        ]
-        for f in futures:  # type: ignore
-            f.result()  # type: ignore
-
-    except Exception as e:
-        if (
-            str(e)
-            == "An error occurred (404) when calling the CopyObject operation: Not Found"
-        ):
-            typer.echo("Origin object not found!")
-        else:
-            typer.echo(
-                "An error occurred! Please check if the origin object path is correct"
+    else:
+        for f in origin_files:
+            splitted_file_name = f.split("/")
+
+            file_dict[f] = f"{destination_path}/{splitted_file_name[-1]}"
+
+        if engine == Engines.asyncio:
+            _run_async(
+                async_engine.move(
+                    _login["login_data"],
+                    bucket_name,
+                    file_dict,
+                    permission.value,
+                    threads,
+                    _options(),
+                )
             )
+            return
 
-        raise typer.Exit()
-    try:
-        # Delete origin_file
-        executor = ThreadPoolExecutor(max_workers=threads)
-        futures = [
-            executor.submit(_deleter, k, False, feedback=False) for k in origin_files
-        ]
-        for f in futures:  # type: ignore
-            f.result()  # type: ignore
-
-    except Exception:
-        raise typer.Exit()
-
-
-def _move_obj(permission, s3, client, bucket_name, orig, dest, rename: bool = False):
-    obj_name = orig.split("/")[-1]
+        moves = [(orig, dest, None) for orig, dest in file_dict.items()]
 
-    response = client.get_object(Bucket=bucket_name, Key=orig)
-    obj_size = response.get("ContentLength")
-    content_type = response.get("ContentType")
-
-    progbar = tqdm(
-        total=obj_size, unit="B", unit_scale=True, unit_divisor=1024, desc=obj_name
+    failed = _report_moved(
+        moving.move_objects(
+            client, bucket_name, moves, permission.value, settings, threads
+        ),
+        len(moves),
     )
+    if failed:
+        raise typer.Exit(code=1)
 
-    def upload_progress(chunk):
-        progbar.update(chunk)
 
-    copy_source = {"Bucket": bucket_name, "Key": orig}
-    bucket = s3.Bucket(bucket_name)
-    bucket.copy(
-        copy_source,
-        dest,
-        Callback=upload_progress,
-        ExtraArgs={"ContentType": content_type, "ACL": permission.value},
-    )
+@app.command()
+def bench(
+    objects: int = typer.Option(
+        100, "--objects", "-n", help="Amount of objects every workload works on"
+    ),
+    size: str = typer.Option(
+        "64KB",
+        "--size",
+        help="Size of every object, e.g. 64KB or 16MB. Objects of 8MB or more are sent in parts",
+    ),
+    threads: int = typer.Option(
+        8, "--threads", "-t", help="Amount of threads used by every workload"
+    ),
+    workloads: List[Workloads] = typer.Option(
+        None,
+        "--workload",
+        "-w",
+        help="Workload to run, can be used more than once. Defaults to all of them, run in the order upload, list, download, change-permissions, move, delete. Objects needed by the chosen workloads are uploaded first without being measured",
+    ),
+    output: Union[str, None] = typer.Option(
+        None,
+        "--output",
+        "-o",
+        help="Also writes the results as JSON to this file, to compare releases with benchmarks/compare.py",
+    ),
+):
+    """
+    Measures the commands against a local, in-process S3 server (moto's),
+    reporting their ops/s, MB/s and request latency
+    """
+    try:
+        object_size = transfer_config.parse_size(size)
+        server = benchmark.LocalServer()
+    except (ValueError, ImportError) as e:
+        typer.secho(f"{e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(code=1)
 
-    return
+    chosen = [w.value for w in workloads] if workloads else benchmark.WORKLOADS
+    # Commands run in their own context, recording metrics without a bar
+    options = _options()._replace(record_metrics=True, progress_mode="none")
+    results = []
+    failed = []
+
+    def measure(name: str, func, object_size: int = 0) -> None:
+        def quietly() -> None:
+            # Commands echo every key they touch, which would be measured too
+            with open(os.devnull, "w") as devnull:
+                with redirect_stdout(devnull), redirect_stderr(devnull):
+                    try:
+                        func()
+                    except (typer.Exit, typer.Abort) as e:
+                        if getattr(e, "exit_code", 1):
+                            failed.append(name)
+
+        if name in chosen:
+            results.append(benchmark.measure(name, quietly, objects, object_size))
+        else:
+            quietly()
+
+    bench_context = click.Context(click.Command("bench"), obj=options)
+    with bench_context, server, tempfile.TemporaryDirectory() as tmp:
+        upload_dir = os.path.join(tmp, "upload")
+        benchmark.make_files(upload_dir, objects, object_size)
+        with _login_lock:
+            _login.clear()
+            _login["login_data"] = benchmark.login_data(server)
+        try:
+            _, _, _, client = get_login(max_pool_connections=threads)
+            benchmark.create_bucket(client)
+            # Every workload works on the objects left by the one before
+            prefix = "bench/"
+
+            measure(
+                "upload",
+                lambda: upload(
+                    upload_path=prefix.rstrip("/"),
+                    files=None,
+                    upload_from_file=None,
+                    manifest_format=None,
+                    permissions="public-read",
+                    threads=threads,
+                    chunk_size=None,
+                    max_concurrency=None,
+                    multipart_threshold=None,
+                    max_connections=64,
+                    resume=False,
+                    engine=Engines.threads,
+                    directory=upload_dir,
+                    include=[],
+                    exclude=[],
+                    pack=None,
+                    pack_size="64MB",
+                    skip_identical=False,
+                ),
+                object_size,
+            )
+            if "list" in chosen:
+                measure(
+                    "list",
+                    lambda: list_keys(
+                        prefix=prefix,
+                        delimiter="",
+                        max_keys=1000,
+                        http_prefix=False,
+                        all=False,
+                        limit=0,
+                        key_methods=ObjectMethods.key,
+                        shards=0,
+                        index_ttl=0,
+                    ),
+                )
+            if "download" in chosen:
+                measure(
+                    "download",
+                    lambda: download(
+                        download_path=os.path.join(tmp, "download"),
+                        files=None,
+                        recursive=prefix,
+                        threads=threads,
+                        chunk_size=None,
+                        max_concurrency=None,
+                        multipart_threshold=None,
+                        max_connections=64,
+                        resume=False,
+                        engine=Engines.threads,
+                        index_ttl=0,
+                        pack=None,
+                        skip_existing=None,
+                    ),
+                    object_size,
+                )
+            if "change-permissions" in chosen:
+                measure(
+                    "change-permissions",
+                    lambda: change_permissions(
+                        [prefix],
+                        prefix_threads=1,
+                        changer_threads=threads,
+                        permissions=ACLTypes.private,
+                        engine=Engines.threads,
+                        index_ttl=0,
+                        diff=False,
+                    ),
+                )
+            if "move" in chosen:
+                measure(
+                    "move",
+                    lambda: move_object(
+                        destination_path="bench-moved",
+                        origin_files=None,
+                        rename=None,
+                        prefix=prefix,
+                        permission=ACLTypes.public_read,
+                        threads=threads,
+                        chunk_size=None,
+                        max_concurrency=None,
+                        multipart_threshold=None,
+                        max_connections=64,
+                        engine=Engines.threads,
+                    ),
+                    object_size,
+                )
+                prefix = "bench-moved/"
+            if "delete" in chosen:
+                measure(
+                    "delete",
+                    lambda: delete_key(
+                        files=None, prompt=False, threads=threads, prefix=prefix
+                    ),
+                )
+        finally:
+            with _login_lock:
+                _login.clear()
+
+    typer.echo(benchmark.table(results))
+    if output:
+        settings = {"objects": objects, "size": object_size, "threads": threads}
+        with open(output, "w") as f:
+            f.write(benchmark.as_json(results, settings) + "\n")
+    for name in failed:
+        typer.secho(f"Workload failed -> {name}", fg=typer.colors.RED, err=True)
+    if failed:
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
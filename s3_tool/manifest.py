@@ -0,0 +1,136 @@
+import os
+from typing import IO, Iterable, Iterator, NamedTuple, Union
+
+# Separator between the paths of each format. commas is the original
+# format, kept for manifests written by older versions
+SEPARATORS = {"commas": ",", "lines": "\n", "nul": "\0"}
+
+# First record of lines and nul manifests, so their format is never guessed
+# from their contents. The separator right after it tells which one it is
+FORMAT_HEADER = "# s3-tool manifest"
+
+# Record after FORMAT_HEADER of a manifest with size and mtime columns. The path goes
+# last, so it may contain tabs
+DETAILS_HEADER = "# size\tmtime\tpath"
+
+# Bytes read from a manifest at a time
+READ_SIZE = 64 * 1024
+
+# A manifest without a NUL or new line in its first characters is comma
+# separated, no path is anywhere near this long
+SNIFF_SIZE = 64 * 1024
+
+
+class Entry(NamedTuple):
+    path: str
+    size: Union[int, None] = None
+    mtime: Union[float, None] = None
+
+
+def write(
+    out: IO[str], paths: Iterable[str], fmt: str = "lines", details: bool = False
+) -> int:
+    """
+    Writes paths to out as they come, returning how many were written.
+    With details, every path is preceded by its size and modification time,
+    tab separated. commas manifests can not have details, nor a header, as
+    they are appended to.
+    """
+    separator = SEPARATORS[fmt]
+    if details and fmt == "commas":
+        raise ValueError("Only lines and nul manifests can have size and mtime")
+    if fmt != "commas":
+        out.write(f"{FORMAT_HEADER}{separator}")
+    if details:
+        out.write(f"{DETAILS_HEADER}{separator}")
+
+    written = 0
+    for path in paths:
+        if details:
+            stat = os.stat(path)
+            record = f"{stat.st_size}\t{stat.st_mtime}\t{path}"
+        else:
+            record = path
+        if fmt == "commas":
+            # Separators go between paths, so appending to a manifest adds
+            # to its last path, as it always did
+            out.write(f"{separator}{record}" if written else record)
+        else:
+            out.write(f"{record}{separator}")
+        written += 1
+    return written
+
+
+def _records(f: IO[str], separator: str, first: str) -> Iterator[str]:
+    rest = first
+    while True:
+        *records, rest = rest.split(separator)
+        yield from records
+        chunk = f.read(READ_SIZE)
+        if not chunk:
+            break
+        rest += chunk
+    yield rest
+
+
+def _sniff(first: str) -> str:
+    """
+    Format of a manifest without a header, from its start: NUL separated if
+    it has a NUL character, one path per line if it has a new line before
+    more text, commas otherwise. A comma separated manifest may end with a
+    new line, as editors add one.
+    """
+    if "\0" in first:
+        return "nul"
+    if "\n" in first.rstrip():
+        return "lines"
+    return "commas"
+
+
+def read(path: str, fmt: Union[str, None] = None) -> Iterator[Entry]:
+    """
+    Reads a manifest lazily, a chunk at a time. Its format is fmt when
+    given, the one its header names otherwise. Manifests written by hand or
+    by older versions have no header, and their format is guessed (see
+    _sniff), which can not tell a single path with a comma in a lines
+    manifest from a commas one.
+    """
+    with open(path, "r", newline="") as f:
+        first = ""
+        while (
+            len(first) < SNIFF_SIZE and "\0" not in first and "\n" not in first.rstrip()
+        ):
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                break
+            first += chunk
+        if fmt is None:
+            after = first[len(FORMAT_HEADER) :]
+            if not first.startswith(FORMAT_HEADER):
+                fmt = _sniff(first)
+            elif after.startswith("\0"):
+                fmt = "nul"
+            elif after.startswith(("\n", "\r\n")):
+                fmt = "lines"
+            else:
+                fmt = _sniff(first)
+        separator = SEPARATORS[fmt]
+
+        details = False
+        for record in _records(f, separator, first):
+            if separator == ",":
+                text = record.strip()
+            elif separator == "\n":
+                text = record.rstrip("\r")
+            else:
+                text = record
+            if not text or text == FORMAT_HEADER:
+                continue
+            if text == DETAILS_HEADER:
+                details = True
+                continue
+            if details:
+                size, mtime, file_path = text.split("\t", 2)
+                yield Entry(file_path, int(size), float(mtime))
+            else:
+                yield Entry(text)
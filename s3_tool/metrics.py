@@ -0,0 +1,302 @@
+import bisect
+import json
+import sys
+import threading
+import time
+from typing import IO, Dict, List, Union
+
+from botocore.utils import determine_content_length
+
+METRICS_FORMATS = ("json", "prometheus")
+
+# Upper bounds, in seconds, of the latency buckets: a quarter of a power of
+# two apart from 0.5ms to about 2 minutes, so percentiles read from them are
+# within 10% of the real ones
+BUCKETS = tuple(0.0005 * 2 ** (i / 4) for i in range(72))
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Where each request's start time and bytes sent are kept in its context
+_CONTEXT_KEY = "s3_tool_metrics"
+
+_operations: Dict[str, "Operation"] = {}
+_lock = threading.Lock()
+
+
+class Operation:
+    """Counts and latency histogram of a single S3 operation"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+        # Requests per bucket, the last one for anything slower than BUCKETS
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def record(
+        self, seconds: float, sent: int, received: int, retries: int, error: bool
+    ) -> None:
+        self.requests += 1
+        self.errors += error
+        self.retries += retries
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.seconds += seconds
+        self.slowest = max(self.slowest, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def add(self, other: "Operation") -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.retries += other.retries
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.seconds += other.seconds
+        self.slowest = max(self.slowest, other.slowest)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Estimated from the histogram, interpolating within the bucket the
+        request of that rank falls in
+        """
+        if not self.requests:
+            return 0.0
+        rank = fraction * self.requests
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.slowest
+                estimate = low + (high - low) * (rank - seen) / count
+                return min(estimate, self.slowest)
+            seen += count
+        return self.slowest
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_seconds": {
+                "mean": round(self.seconds / self.requests, 6)
+                if self.requests
+                else 0.0,
+                **{
+                    f"p{round(p * 100)}": round(self.percentile(p), 6)
+                    for p in PERCENTILES
+                },
+                "max": round(self.slowest, 6),
+            },
+            # Only the buckets requests fell in, by upper bound
+            "histogram": {
+                _bound(i): count for i, count in enumerate(self.buckets) if count
+            },
+        }
+
+
+def _bound(i: int) -> str:
+    return f"{BUCKETS[i]:.6g}" if i < len(BUCKETS) else "+Inf"
+
+
+def _sent(request) -> int:
+    # Bodies sent with aws-chunked encoding only give their size this way
+    headers = request.headers
+    length = headers.get("X-Amz-Decoded-Content-Length") or headers.get(
+        "Content-Length"
+    )
+    if length is not None:
+        return int(length)
+    if request.body is None:
+        return 0
+    return determine_content_length(request.body) or 0
+
+
+def _before_call(context: dict, **kwargs) -> None:
+    context[_CONTEXT_KEY] = {"started": time.perf_counter(), "sent": 0}
+
+
+def _request_created(request, **kwargs) -> None:
+    # Created again for every attempt, so only the last one is counted
+    state = request.context.get(_CONTEXT_KEY)
+    if state is not None:
+        state["sent"] = _sent(request)
+
+
+def _finish(
+    event_name: str, context: dict, received: int = 0, error: bool = False
+) -> None:
+    state = context.get(_CONTEXT_KEY)
+    if state is None:
+        return
+    seconds = time.perf_counter() - state["started"]
+    retries = max(0, context.get("retries", {}).get("attempt", 1) - 1)
+    name = event_name.rsplit(".", 1)[-1]
+    with _lock:
+        operation = _operations.get(name)
+        if operation is None:
+            operation = _operations[name] = Operation()
+        operation.record(seconds, state["sent"], received, retries, error)
+
+
+def _received(http_response, model, content: Union[bytes, None]) -> int:
+    if model.has_streaming_output:
+        # Only read later on by the caller, its size is in the headers
+        return int(http_response.headers.get("Content-Length") or 0)
+    return len(content or b"")
+
+
+def _after_call(event_name: str, http_response, model, context: dict, **kwargs) -> None:
+    content = None if model.has_streaming_output else http_response.content
+    received = _received(http_response, model, content)
+    _finish(event_name, context, received, error=http_response.status_code >= 400)
+
+
+async def _after_call_async(
+    event_name: str, http_response, model, context: dict, **kwargs
+) -> None:
+    # aiobotocore responses give their content as an awaitable
+    content = None if model.has_streaming_output else await http_response.content
+    received = _received(http_response, model, content)
+    _finish(event_name, context, received, error=http_response.status_code >= 400)
+
+
+def _after_call_error(event_name: str, context: dict, **kwargs) -> None:
+    _finish(event_name, context, error=True)
+
+
+def attach(client) -> None:
+    """
+    Records every request client makes, once its response (or error) is
+    back: its latency, retries included, the bytes sent and received and
+    how many times it was retried.
+    """
+    client.meta.events.register("before-call.s3", _before_call)
+    client.meta.events.register("request-created.s3", _request_created)
+    client.meta.events.register("after-call.s3", _after_call)
+    client.meta.events.register("after-call-error.s3", _after_call_error)
+
+
+def attach_async(client) -> None:
+    """attach for aiobotocore clients"""
+    client.meta.events.register("before-call.s3", _before_call)
+    client.meta.events.register("request-created.s3", _request_created)
+    client.meta.events.register("after-call.s3", _after_call_async)
+    client.meta.events.register("after-call-error.s3", _after_call_error)
+
+
+def operations() -> Dict[str, Operation]:
+    with _lock:
+        return dict(_operations)
+
+
+def reset() -> None:
+    with _lock:
+        _operations.clear()
+
+
+def as_json(command: str = "", started: Union[float, None] = None) -> str:
+    """started is the time.monotonic() the command started at"""
+    recorded = operations()
+    return json.dumps(
+        {
+            "command": command,
+            "elapsed_seconds": round(_elapsed(started), 3),
+            "operations": {name: recorded[name].as_dict() for name in sorted(recorded)},
+        },
+        indent=2,
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _elapsed(started: Union[float, None]) -> float:
+    return time.monotonic() - started if started else 0.0
+
+
+def as_prometheus(command: str = "", started: Union[float, None] = None) -> str:
+    """Prometheus text exposition format, one series per operation"""
+    recorded = operations()
+    names = sorted(recorded)
+    elapsed = _elapsed(started)
+    command = _escape(command)
+
+    def labels(name: str, **extra: str) -> str:
+        pairs = {"command": command, "operation": _escape(name), **extra}
+        return ",".join(f'{key}="{value}"' for key, value in pairs.items())
+
+    lines: List[str] = []
+    for metric, attribute, help_text in (
+        ("s3_tool_requests_total", "requests", "Requests completed"),
+        ("s3_tool_request_errors_total", "errors", "Requests that failed"),
+        ("s3_tool_retries_total", "retries", "Retried attempts"),
+        ("s3_tool_sent_bytes_total", "bytes_sent", "Request body bytes sent"),
+        (
+            "s3_tool_received_bytes_total",
+            "bytes_received",
+            "Response body bytes received",
+        ),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for name in names:
+            value = getattr(recorded[name], attribute)
+            lines.append(f"{metric}{{{labels(name)}}} {value}")
+
+    metric = "s3_tool_request_duration_seconds"
+    lines.append(f"# HELP {metric} Request latency, retries included")
+    lines.append(f"# TYPE {metric} histogram")
+    for name in names:
+        operation = recorded[name]
+        cumulative = 0
+        for i, count in enumerate(operation.buckets):
+            cumulative += count
+            # Empty buckets are left out to keep the output short, the
+            # counts are cumulative so none are lost
+            if count or i == len(BUCKETS):
+                le = labels(name, le=_bound(i))
+                lines.append(f"{metric}_bucket{{{le}}} {cumulative}")
+        lines.append(f"{metric}_sum{{{labels(name)}}} {operation.seconds:.6f}")
+        lines.append(f"{metric}_count{{{labels(name)}}} {operation.requests}")
+
+    metric = "s3_tool_elapsed_seconds"
+    lines.append(f"# HELP {metric} Run time of the command")
+    lines.append(f"# TYPE {metric} gauge")
+    lines.append(f'{metric}{{command="{command}"}} {elapsed:.3f}')
+    return "\n".join(lines) + "\n"
+
+
+def write(
+    path: Union[str, None],
+    fmt: str = "json",
+    command: str = "",
+    started: Union[float, None] = None,
+    out: Union[IO[str], None] = None,
+) -> None:
+    """
+    Writes the metrics recorded so far to path, - for stderr, or to out.
+    Nothing is written without a path.
+    """
+    if fmt not in METRICS_FORMATS:
+        raise ValueError(f"Metrics format must be one of {', '.join(METRICS_FORMATS)}")
+    if path is None:
+        return
+    if fmt == "prometheus":
+        text = as_prometheus(command, started)
+    else:
+        text = as_json(command, started) + "\n"
+    if out is not None:
+        out.write(text)
+    elif path == "-":
+        sys.stderr.write(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text)
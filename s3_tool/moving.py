@@ -0,0 +1,278 @@
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+from s3_tool import deletion, listing, resumable
+from s3_tool.transfer_config import GB, MAX_PARTS, TransferSettings
+
+# Largest object a single CopyObject request can copy
+MAX_COPY_SIZE = 5 * GB
+
+# CopyObject keeps these by itself, a multipart copy has to set them again
+COPIED_HEADERS = (
+    "CacheControl",
+    "ContentDisposition",
+    "ContentEncoding",
+    "ContentLanguage",
+    "ContentType",
+    "Metadata",
+)
+
+
+def _multipart_copy(
+    client,
+    bucket: str,
+    source: str,
+    dest: str,
+    acl: str,
+    head: dict,
+    part_size: int,
+    max_concurrency: int,
+) -> None:
+    size = head["ContentLength"]
+    part_size = max(part_size, math.ceil(size / MAX_PARTS))
+    extra_args = {h: head[h] for h in COPIED_HEADERS if head.get(h)}
+    upload_id = client.create_multipart_upload(
+        Bucket=bucket, Key=dest, ACL=acl, **extra_args
+    )["UploadId"]
+    copy_source = {"Bucket": bucket, "Key": source}
+
+    def copy_part(number: int) -> dict:
+        start = (number - 1) * part_size
+        end = min(start + part_size, size) - 1
+        response = client.upload_part_copy(
+            Bucket=bucket,
+            Key=dest,
+            UploadId=upload_id,
+            PartNumber=number,
+            CopySource=copy_source,
+            CopySourceRange=f"bytes={start}-{end}",
+            # Every part has to come from the same version of the source
+            CopySourceIfMatch=head["ETag"],
+        )
+        return {"PartNumber": number, "ETag": response["CopyPartResult"]["ETag"]}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            parts = list(
+                executor.map(copy_part, range(1, math.ceil(size / part_size) + 1))
+            )
+        client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=dest,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        client.abort_multipart_upload(Bucket=bucket, Key=dest, UploadId=upload_id)
+        raise
+
+
+def copy_object(
+    client,
+    bucket: str,
+    source: str,
+    dest: str,
+    acl: str,
+    settings: Union[TransferSettings, None] = None,
+    size: Union[int, None] = None,
+) -> int:
+    """
+    Copies an object server side, without its body going through this
+    machine, and returns its size.
+
+    size usually comes from a listing; when missing it is read with a
+    HEAD request. Objects under the multipart threshold are copied with a
+    single CopyObject keeping their metadata (MetadataDirective=COPY),
+    bigger ones with parallel UploadPartCopy requests.
+    """
+    if settings is None:
+        settings = TransferSettings()
+
+    head = None
+    if size is None:
+        head = client.head_object(Bucket=bucket, Key=source)
+        size = head["ContentLength"]
+
+    config = settings.config_for(size)
+    if size <= MAX_COPY_SIZE and (size < config.multipart_threshold or size == 0):
+        client.copy_object(
+            Bucket=bucket,
+            Key=dest,
+            CopySource={"Bucket": bucket, "Key": source},
+            MetadataDirective="COPY",
+            ACL=acl,
+        )
+        return size
+
+    if head is None:
+        head = client.head_object(Bucket=bucket, Key=source)
+    _multipart_copy(
+        client,
+        bucket,
+        source,
+        dest,
+        acl,
+        head,
+        config.multipart_chunksize,
+        config.max_concurrency,
+    )
+    return size
+
+
+def move_objects(
+    client,
+    bucket: str,
+    moves: Iterable[Tuple[str, str, Union[int, None]]],
+    acl: str,
+    settings: Union[TransferSettings, None] = None,
+    threads: int = 3,
+    batch_size: int = deletion.MAX_BATCH_SIZE,
+    on_copied: Union[Callable[[str], None], None] = None,
+) -> Iterator[Tuple[str, Union[Exception, None]]]:
+    """
+    Moves a stream of (origin, destination, size) server side, size being
+    None when unknown. Yields (origin, None) once an origin was copied and
+    deleted, or (origin, error) when either failed.
+
+    Copies run on threads and pull from moves only when one is free, so a
+    paginator can be fed straight in. Copied origins are passed to
+    on_copied and deleted in DeleteObjects batches as the batches fill up.
+    """
+    copied: List[str] = []
+
+    def finished(futures) -> Iterator[Tuple[str, Union[Exception, None]]]:
+        for future in futures:
+            origin = pending.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                yield origin, e
+                continue
+            if on_copied:
+                on_copied(origin)
+            copied.append(origin)
+            if len(copied) >= batch_size:
+                yield from _delete_moved(client, bucket, copied[:])
+                copied.clear()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = {}
+        for origin, dest, size in moves:
+            if origin == dest:
+                # Deleting the origin would delete the only copy
+                yield origin, ValueError("Origin and destination are the same")
+                continue
+            future = executor.submit(
+                copy_object, client, bucket, origin, dest, acl, settings, size
+            )
+            pending[future] = origin
+            if len(pending) >= threads:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+
+        yield from finished(list(pending))
+
+    if copied:
+        yield from _delete_moved(client, bucket, copied)
+
+
+def _delete_moved(
+    client, bucket: str, keys: List[str]
+) -> Iterator[Tuple[str, Union[Exception, None]]]:
+    try:
+        deleted, errors = deletion.delete_batch(client, bucket, keys)
+    except Exception as e:
+        for key in keys:
+            yield key, e
+        return
+    for key in deleted:
+        yield key, None
+    for error in errors:
+        yield error["Key"], Exception(f"{error.get('Code')} {error.get('Message')}")
+
+
+def journal_path(bucket: str, prefix: str, destination: str) -> str:
+    """Every (bucket, origin prefix, destination prefix) gets its own journal"""
+    name = hashlib.sha1(f"{bucket}\n{prefix}\n{destination}".encode()).hexdigest()
+    return os.path.join(resumable.journal_dir(), f"move-{name}.json")
+
+
+def read_journal(path: str) -> Dict[str, str]:
+    """The ETag of every origin a previous run copied, by key"""
+    copied = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                # A line cut short by a crash is simply ignored
+                if line.endswith("\n"):
+                    entry = json.loads(line)
+                    copied[entry["key"]] = entry["etag"]
+    except OSError:
+        pass
+    return copied
+
+
+def move_prefix(
+    client,
+    bucket: str,
+    prefix: str,
+    destination: str,
+    acl: str,
+    settings: Union[TransferSettings, None] = None,
+    threads: int = 3,
+    journal: Union[str, None] = None,
+) -> Iterator[Tuple[str, Union[Exception, None]]]:
+    """
+    Moves every key under prefix to destination, replacing one prefix with
+    the other, while the keys are still being listed. Yields the same
+    results as move_objects.
+
+    Every copied origin is appended to the journal with its ETag. When an
+    interrupted move is run again, origins already copied with the same
+    ETag are only deleted. The journal is removed once nothing failed.
+    """
+    copied = read_journal(journal) if journal else {}
+    already_copied: List[str] = []
+    etags: Dict[str, str] = {}
+
+    def moves():
+        for obj in listing.iter_objects(client, bucket, prefix):
+            key = obj["Key"]
+            if key in copied and copied[key] == obj.get("ETag"):
+                already_copied.append(key)
+                continue
+            etags[key] = obj.get("ETag")
+            yield key, destination + key[len(prefix) :], obj["Size"]
+
+    journal_file = None
+    if journal:
+        os.makedirs(os.path.dirname(journal), exist_ok=True)
+        journal_file = open(journal, "a")
+
+    def record(key: str) -> None:
+        if journal_file:
+            journal_file.write(json.dumps({"key": key, "etag": etags.pop(key)}) + "\n")
+            journal_file.flush()
+
+    failed = False
+    try:
+        for origin, error in move_objects(
+            client, bucket, moves(), acl, settings, threads, on_copied=record
+        ):
+            failed = failed or error is not None
+            yield origin, error
+
+        for batch in deletion.iter_batches(already_copied):
+            for origin, error in _delete_moved(client, bucket, batch):
+                failed = failed or error is not None
+                yield origin, error
+    finally:
+        if journal_file:
+            journal_file.close()
+
+    if journal and not failed:
+        os.remove(journal)
@@ -0,0 +1,39 @@
+from typing import NamedTuple, Union
+
+from s3_tool.progress import Progress
+
+
+class Options(NamedTuple):
+    """
+    Options of the main callback, which every command of an invocation
+    follows. Built once by the callback and kept as the click context's obj;
+    commands called on their own, as the tests do, get the defaults.
+    """
+
+    max_requests: int = 0
+    retry_mode: str = "standard"
+    max_attempts: int = 3
+    max_rate: float = 0.0
+    progress_mode: str = "auto"
+    progress_interval: float = 10.0
+    metrics_path: Union[str, None] = None
+    metrics_format: str = "json"
+    # Instruments clients without writing anything at exit, for bench
+    record_metrics: bool = False
+    command: str = ""
+    # time.monotonic() when the command started, for the metrics
+    started: float = 0.0
+
+    @property
+    def metrics_enabled(self) -> bool:
+        return self.record_metrics or self.metrics_path is not None
+
+    def tracker(self, desc: str, total_bytes: int = 0, total_objects: int = 0):
+        """A Progress reporting in the --progress mode and interval"""
+        return Progress(
+            desc,
+            total_bytes=total_bytes,
+            total_objects=total_objects,
+            mode=self.progress_mode,
+            interval=self.progress_interval,
+        )
@@ -0,0 +1,154 @@
+import io
+import json
+import math
+import os
+import struct
+import tarfile
+import zipfile
+from typing import Dict, Iterable, Iterator, NamedTuple, Set, Tuple, Union
+
+from s3_tool.transfer_config import MB
+
+PACK_FORMATS = ("tar", "zip")
+
+CONTENT_TYPES = {"tar": "application/x-tar", "zip": "application/zip"}
+
+# Added to an archive's key for the key of its index
+INDEX_SUFFIX = ".index.json"
+
+DEFAULT_PACK_SIZE = 64 * MB
+
+
+class Single(NamedTuple):
+    """A file too big to be packed, uploaded on its own"""
+
+    path: str
+    name: str
+
+
+class Archive(NamedTuple):
+    number: int
+    body: bytes
+    # Byte offset and size of every member's data within body, by name
+    members: Dict[str, Tuple[int, int]]
+
+
+class _TarWriter:
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.tar = tarfile.open(
+            fileobj=self.buffer, mode="w", format=tarfile.PAX_FORMAT
+        )
+
+    def add(self, path: str, name: str) -> Tuple[int, int]:
+        info = self.tar.gettarinfo(path, arcname=name)
+        with open(path, "rb") as f:
+            self.tar.addfile(info, f)
+        # The data is the last thing written, padded to a whole block
+        padded = math.ceil(info.size / tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        return self.tar.offset - padded, info.size
+
+    def size(self) -> int:
+        return self.buffer.tell()
+
+    def close(self) -> bytes:
+        self.tar.close()
+        return self.buffer.getvalue()
+
+
+class _ZipWriter:
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.zip = zipfile.ZipFile(
+            self.buffer, mode="w", compression=zipfile.ZIP_STORED
+        )
+
+    def add(self, path: str, name: str) -> Tuple[int, int]:
+        self.zip.write(path, arcname=name)
+        info = self.zip.infolist()[-1]
+        # The data follows the local header, whose name and extra field
+        # lengths are read back as zipfile may have changed them
+        with self.buffer.getbuffer() as written:
+            name_length, extra_length = struct.unpack_from(
+                "<HH", written, info.header_offset + 26
+            )
+        return info.header_offset + 30 + name_length + extra_length, info.file_size
+
+    def size(self) -> int:
+        return self.buffer.tell()
+
+    def close(self) -> bytes:
+        self.zip.close()
+        return self.buffer.getvalue()
+
+
+def pack(
+    files: Iterable[Tuple[str, str]],
+    fmt: str = "tar",
+    pack_size: int = DEFAULT_PACK_SIZE,
+    max_member_size: Union[int, None] = None,
+) -> Iterator[Union[Archive, Single]]:
+    """
+    Packs a stream of (path, member name) into uncompressed archives of
+    about pack_size bytes, built in memory and yielded as they fill up.
+    Files of max_member_size bytes or more are yielded as Single instead,
+    without being read. Raises ValueError on a member name already given,
+    which would hide the first file of that name.
+    """
+    if fmt not in PACK_FORMATS:
+        raise ValueError(f"Pack format must be one of {', '.join(PACK_FORMATS)}")
+    if max_member_size is None:
+        max_member_size = pack_size
+
+    writer = None
+    members: Dict[str, Tuple[int, int]] = {}
+    number = 0
+    names: Set[str] = set()
+    for path, name in files:
+        if name in names:
+            raise ValueError(
+                f"Two files would be packed as {name}, {path} is the second"
+            )
+        names.add(name)
+        if os.path.getsize(path) >= max_member_size:
+            yield Single(path, name)
+            continue
+        if writer is None:
+            writer = _TarWriter() if fmt == "tar" else _ZipWriter()
+        members[name] = writer.add(path, name)
+        if writer.size() >= pack_size:
+            yield Archive(number, writer.close(), members)
+            writer, members = None, {}
+            number += 1
+
+    if writer is not None:
+        yield Archive(number, writer.close(), members)
+
+
+def index_body(archive_key: str, fmt: str, members: Dict[str, Tuple[int, int]]) -> str:
+    return json.dumps(
+        {
+            "archive": archive_key,
+            "format": fmt,
+            "members": {
+                name: {"offset": offset, "size": size}
+                for name, (offset, size) in members.items()
+            },
+        }
+    )
+
+
+def read_index(client, bucket: str, archive_key: str) -> dict:
+    """The index uploaded next to an archive"""
+    response = client.get_object(Bucket=bucket, Key=f"{archive_key}{INDEX_SUFFIX}")
+    return json.loads(response["Body"].read())
+
+
+def read_member(client, bucket: str, archive_key: str, offset: int, size: int) -> bytes:
+    """Fetches a single member's data with a ranged GET of its archive"""
+    if size == 0:
+        return b""
+    response = client.get_object(
+        Bucket=bucket, Key=archive_key, Range=f"bytes={offset}-{offset + size - 1}"
+    )
+    return response["Body"].read()
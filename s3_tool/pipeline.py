@@ -0,0 +1,91 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple, Union
+
+# Tells a worker there are no items left, and the reader that a worker is done
+_DONE = object()
+
+
+def put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocks until item fits in q, giving up once stop is set"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def stream(
+    func: Callable,
+    items: Iterable,
+    threads: int,
+    max_queued: int = 1000,
+) -> Iterator[Tuple[object, object, Union[Exception, None]]]:
+    """
+    Runs func over a lazy stream of items on threads, yielding
+    (item, result, None), or (item, None, error) when func raised, in the
+    order they complete.
+
+    One thread pulls items into a queue of at most max_queued items that
+    the workers drain, so a listing keeps being read while its first pages
+    are worked on and memory stays bounded however long the stream is. An
+    error raised by the stream itself is raised once the queued items are
+    done.
+    """
+    todo: queue.Queue = queue.Queue(maxsize=max_queued)
+    done: queue.Queue = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+    stream_error = []
+
+    def produce():
+        try:
+            for item in items:
+                if not put(todo, item, stop):
+                    return
+        except Exception as e:
+            stream_error.append(e)
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+            for _ in range(threads):
+                put(todo, _DONE, stop)
+
+    def work():
+        while not stop.is_set():
+            try:
+                item = todo.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            try:
+                entry = (item, func(item), None)
+            except Exception as e:
+                entry = (item, None, e)
+            if not put(done, entry, stop):
+                return
+        put(done, _DONE, stop)
+
+    executor = ThreadPoolExecutor(max_workers=threads + 1)
+    try:
+        executor.submit(produce)
+        for _ in range(threads):
+            executor.submit(work)
+
+        finished = 0
+        while finished < threads:
+            entry = done.get()
+            if entry is _DONE:
+                finished += 1
+                continue
+            yield entry
+
+        if stream_error:
+            raise stream_error[0]
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
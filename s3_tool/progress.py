@@ -0,0 +1,221 @@
+import json
+import sys
+import threading
+import time
+from typing import Callable, List, Union
+
+from tqdm import tqdm
+
+PROGRESS_MODES = ("auto", "bar", "summary", "json", "none")
+
+# Seconds between redraws of the bar
+BAR_INTERVAL = 0.2
+
+
+def format_bytes(amount: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if amount < 1024:
+            return f"{amount:.1f} {unit}"
+        amount /= 1024
+    return f"{amount:.1f} TB"
+
+
+def format_seconds(seconds: Union[float, None]) -> str:
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class _Counts:
+    """Counts of a single thread, only ever written by that thread"""
+
+    __slots__ = ("bytes", "objects", "failed")
+
+    def __init__(self):
+        self.bytes = 0
+        self.objects = 0
+        self.failed = 0
+
+
+class Progress:
+    """
+    Aggregate progress of a whole command: bytes and objects transferred
+    out of the expected totals, throughput and ETA.
+
+    Every thread updates counts of its own, without locks, and a single
+    thread sums them up and draws them every so often, so threads never
+    wait on each other or on the terminal.
+
+    Totals can grow while the transfer runs, for commands that find their
+    files as they go, so the ETA is only given once totals_known is called.
+
+    mode is how it is shown: a single bar, a summary line or a JSON object
+    every interval seconds, or nothing. auto shows the bar on a terminal and
+    the summary otherwise.
+    """
+
+    def __init__(
+        self,
+        desc: str,
+        total_bytes: int = 0,
+        total_objects: int = 0,
+        mode: str = "auto",
+        interval: float = 10.0,
+        stream=None,
+    ):
+        self.desc = desc
+        self.total_bytes = total_bytes
+        self.total_objects = total_objects
+        self.known = False
+        self.stream = stream or sys.stderr
+        if mode not in PROGRESS_MODES:
+            raise ValueError(
+                f"Progress mode must be one of {', '.join(PROGRESS_MODES)}"
+            )
+        if mode == "auto":
+            isatty = getattr(self.stream, "isatty", None)
+            mode = "bar" if isatty and isatty() else "summary"
+        self.mode = mode
+        self.interval = BAR_INTERVAL if mode == "bar" else max(0.1, interval)
+
+        self._local = threading.local()
+        self._counts: List[_Counts] = []
+        self._counts_lock = threading.Lock()
+        self._totals_lock = threading.Lock()
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._bar: Union[tqdm, None] = None
+        self._thread: Union[threading.Thread, None] = None
+
+    def _own(self) -> _Counts:
+        counts = getattr(self._local, "counts", None)
+        if counts is None:
+            counts = self._local.counts = _Counts()
+            # Only taken the first time a thread reports
+            with self._counts_lock:
+                self._counts.append(counts)
+        return counts
+
+    def add_bytes(self, amount: int) -> None:
+        self._own().bytes += amount
+
+    def callback(self) -> Callable[[int], None]:
+        """Callback for boto3 transfers, called with every chunk sent"""
+        return self.add_bytes
+
+    def object_done(self, count: int = 1) -> None:
+        self._own().objects += count
+
+    def object_failed(self) -> None:
+        self._own().failed += 1
+
+    def expect(self, size: int = 0, objects: int = 1) -> None:
+        """
+        Adds an object found along the way to the totals, or takes it out
+        with negative amounts when it turns out it is not transferred
+        """
+        with self._totals_lock:
+            self.total_bytes += size
+            self.total_objects += objects
+
+    def totals_known(self) -> None:
+        self.known = True
+
+    def snapshot(self) -> dict:
+        with self._counts_lock:
+            counts = list(self._counts)
+        done = sum(c.bytes for c in counts)
+        objects = sum(c.objects for c in counts)
+        elapsed = time.monotonic() - self._started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.known and self.total_bytes and rate > 0:
+            eta = max(0.0, (self.total_bytes - done) / rate)
+        elif self.known and objects and elapsed > 0:
+            # Commands that only count objects, such as moves
+            eta = max(0.0, (self.total_objects - objects) * elapsed / objects)
+        return {
+            "command": self.desc,
+            "bytes": done,
+            "total_bytes": self.total_bytes,
+            "objects": objects,
+            "total_objects": self.total_objects,
+            "failed": sum(c.failed for c in counts),
+            "bytes_per_second": round(rate, 1),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": None if eta is None else round(eta, 1),
+        }
+
+    def summary(self, snapshot: Union[dict, None] = None) -> str:
+        s = snapshot or self.snapshot()
+        total = format_bytes(s["total_bytes"]) if self.known else "?"
+        total_objects = f"{s['total_objects']}{'' if self.known else '+'}"
+        line = (
+            f"{self.desc}: {format_bytes(s['bytes'])}/{total}"
+            f" | {s['objects']}/{total_objects} objects"
+            f" | {format_bytes(s['bytes_per_second'])}/s"
+            f" | ETA {format_seconds(s['eta_seconds'])}"
+        )
+        if s["failed"]:
+            line += f" | {s['failed']} failed"
+        return line
+
+    def render(self, final: bool = False) -> None:
+        if self.mode == "none":
+            return
+        snapshot = self.snapshot()
+        if self.mode == "json":
+            snapshot["done"] = final
+            self.stream.write(json.dumps(snapshot) + "\n")
+        elif self.mode == "summary":
+            self.stream.write(self.summary(snapshot) + "\n")
+        elif self._bar is not None:
+            self._bar.total = snapshot["total_bytes"] if self.known else None
+            self._bar.n = snapshot["bytes"]
+            total_objects = snapshot["total_objects"]
+            postfix = f"{snapshot['objects']}/{total_objects} objects"
+            if snapshot["failed"]:
+                postfix += f", {snapshot['failed']} failed"
+            self._bar.set_postfix_str(postfix, refresh=False)
+            self._bar.refresh()
+        self.stream.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.render()
+
+    def start(self) -> "Progress":
+        if self.mode == "bar":
+            self._bar = tqdm(
+                desc=self.desc,
+                unit="B",
+                unit_scale=True,
+                unit_divisor=1024,
+                file=self.stream,
+            )
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.render(final=True)
+        if self._bar is not None:
+            self._bar.close()
+
+    def __enter__(self) -> "Progress":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def silent() -> Progress:
+    """A progress that is never shown, for transfers made outside of a command"""
+    return Progress("", mode="none")
@@ -0,0 +1,115 @@
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Set, Union
+
+from s3_tool import hashing
+
+# Downloads are written here and renamed to their destination once complete
+PARTIAL_SUFFIX = ".s3-tool-partial"
+# Sidecar holding the object's ETag, size and part size and the finished ranges
+SIDECAR_SUFFIX = ".s3-tool-ranges"
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def _read_sidecar(path: str) -> Union[tuple, None]:
+    try:
+        with open(path) as f:
+            header = json.loads(f.readline())
+            done = set()
+            for line in f:
+                # A line cut short by a crash is simply ignored
+                if line.endswith("\n"):
+                    done.add(json.loads(line)["range"])
+            return header, done
+    except (OSError, ValueError):
+        return None
+
+
+def download_file(
+    client,
+    bucket: str,
+    key: str,
+    dest: str,
+    size: int,
+    etag: str,
+    part_size: int,
+    max_concurrency: int = 10,
+    callback: Union[Callable[[int], None], None] = None,
+    verify: bool = True,
+) -> None:
+    """
+    Downloads an object as parallel byte-range GETs, each written in place
+    into a file preallocated to the object's size.
+
+    Finished ranges are appended to a sidecar file next to the destination,
+    so running the same download again only fetches the missing ranges.
+    Every GET is sent with If-Match, so an object that changed in between
+    fails instead of mixing two versions; an ETag that changed since the
+    sidecar was written starts the download over. Once complete, the file
+    is checked against the ETag and moved into place. verify should be off
+    for SSE-KMS or SSE-C objects, whose ETags are not MD5 based.
+    """
+    partial = dest + PARTIAL_SUFFIX
+    sidecar = dest + SIDECAR_SUFFIX
+    header = {"key": key, "etag": etag, "size": size, "part_size": part_size}
+
+    done: Set[int] = set()
+    previous = _read_sidecar(sidecar)
+    if previous and previous[0] == header and os.path.exists(partial):
+        done = previous[1]
+    else:
+        with open(sidecar, "w") as f:
+            f.write(json.dumps(header) + "\n")
+        with open(partial, "wb") as f:
+            # Sparse on most filesystems, ranges fill it in any order
+            f.truncate(size)
+
+    total_ranges = max(1, math.ceil(size / part_size))
+    if callback:
+        callback(sum(min(part_size, size - n * part_size) for n in done))
+
+    lock = threading.Lock()
+    sidecar_file = open(sidecar, "a")
+
+    def fetch_range(number: int) -> None:
+        start = number * part_size
+        end = min(start + part_size, size) - 1
+        response = client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag
+        )
+        with open(partial, "r+b") as f:
+            f.seek(start)
+            for chunk in response["Body"].iter_chunks(hashing.READ_SIZE):
+                f.write(chunk)
+                if callback:
+                    callback(len(chunk))
+        with lock:
+            sidecar_file.write(json.dumps({"range": number}) + "\n")
+            sidecar_file.flush()
+
+    missing = [n for n in range(total_ranges) if n not in done]
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        if size:
+            for future in [executor.submit(fetch_range, n) for n in missing]:
+                future.result()
+    finally:
+        # Ranges not started yet are dropped, a rerun fetches them
+        executor.shutdown(wait=True, cancel_futures=True)
+        sidecar_file.close()
+
+    if verify and not hashing.matches_etag(
+        partial, etag, hashing.object_part_size(client, bucket, key, etag)
+    ):
+        os.remove(partial)
+        os.remove(sidecar)
+        raise ChecksumMismatch(f"{key} does not match its ETag {etag}")
+
+    os.replace(partial, dest)
+    os.remove(sidecar)
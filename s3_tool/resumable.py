@@ -0,0 +1,193 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Union
+
+from botocore.exceptions import ClientError
+
+from s3_tool.transfer_config import MAX_PARTS
+
+
+def journal_dir() -> str:
+    return os.getenv(
+        "S3_TOOL_JOURNAL_DIR", os.path.join(Path.home(), ".s3_tool", "journal")
+    )
+
+
+def journal_path(bucket: str, key: str, file_path: str) -> str:
+    """Every (bucket, key, local file) gets its own journal file"""
+    name = hashlib.sha1(
+        f"{bucket}\n{key}\n{os.path.abspath(file_path)}".encode()
+    ).hexdigest()
+    return os.path.join(journal_dir(), f"{name}.json")
+
+
+def _create_journal(path: str, journal: dict) -> None:
+    """The first line of a journal describes the upload, parts get appended after it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(json.dumps(journal) + "\n")
+    os.replace(tmp, path)
+
+
+def _read_journal(path: str) -> Union[dict, None]:
+    try:
+        with open(path) as f:
+            journal = json.loads(f.readline())
+            journal["parts"] = {}
+            for line in f:
+                # A line cut short by a crash is simply ignored
+                if line.endswith("\n"):
+                    part = json.loads(line)
+                    journal["parts"][part["PartNumber"]] = part["ETag"]
+            return journal
+    except (OSError, ValueError):
+        return None
+
+
+def _uploaded_parts(client, bucket: str, key: str, upload_id: str) -> Dict[int, dict]:
+    paginator = client.get_paginator("list_parts")
+    parts = {}
+    for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+        for part in page.get("Parts", []):
+            parts[part["PartNumber"]] = part
+    return parts
+
+
+def upload_file(
+    client,
+    bucket: str,
+    file_path: str,
+    key: str,
+    extra_args: dict,
+    part_size: int,
+    max_concurrency: int = 10,
+    callback: Union[Callable[[int], None], None] = None,
+) -> None:
+    """
+    Multipart upload that can pick up where an interrupted run stopped.
+
+    The UploadId and the ETag of every finished part are appended to a
+    journal file. On a rerun for the same file and key, the journal's upload is
+    reused and list_parts tells which parts S3 already has, so only the
+    missing ones are sent. The journal is removed once the upload completes.
+    A file that changed since the journal was written starts over.
+    """
+    stat = os.stat(file_path)
+    size = stat.st_size
+    # S3 takes at most MAX_PARTS parts, bigger files need bigger parts. Done
+    # before reading the journal so a rerun plans the same parts
+    part_size = max(part_size, math.ceil(size / MAX_PARTS))
+    path = journal_path(bucket, key, file_path)
+    journal = _read_journal(path)
+
+    done: Dict[int, dict] = {}
+    if (
+        journal
+        and journal["size"] == size
+        and journal["mtime"] == stat.st_mtime
+        and journal["part_size"] == part_size
+    ):
+        try:
+            done = _uploaded_parts(client, bucket, key, journal["upload_id"])
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NoSuchUpload":
+                raise
+            journal = None
+    elif journal:
+        # The file changed, its old parts are of no use
+        try:
+            client.abort_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=journal["upload_id"]
+            )
+        except ClientError:
+            pass
+        journal = None
+
+    if journal is None:
+        response = client.create_multipart_upload(Bucket=bucket, Key=key, **extra_args)
+        journal = {
+            "bucket": bucket,
+            "key": key,
+            "file": os.path.abspath(file_path),
+            "size": size,
+            "mtime": stat.st_mtime,
+            "part_size": part_size,
+            "upload_id": response["UploadId"],
+        }
+        _create_journal(path, journal)
+
+    total_parts = max(1, math.ceil(size / part_size))
+
+    def expected_size(number: int) -> int:
+        return min(part_size, size - (number - 1) * part_size)
+
+    # A part only counts as done if S3 has all of it
+    etags = {
+        number: part["ETag"]
+        for number, part in done.items()
+        if number <= total_parts and part["Size"] == expected_size(number)
+    }
+    if callback:
+        callback(sum(expected_size(n) for n in etags))
+
+    lock = threading.Lock()
+    journal_file = open(path, "a")
+
+    def send_part(number: int) -> None:
+        with open(file_path, "rb") as f:
+            f.seek((number - 1) * part_size)
+            body = f.read(expected_size(number))
+        response = client.upload_part(
+            Bucket=bucket,
+            Key=key,
+            UploadId=journal["upload_id"],
+            PartNumber=number,
+            Body=body,
+        )
+        with lock:
+            etags[number] = response["ETag"]
+            journal_file.write(
+                json.dumps({"PartNumber": number, "ETag": response["ETag"]}) + "\n"
+            )
+            journal_file.flush()
+        if callback:
+            callback(len(body))
+
+    missing = [n for n in range(1, total_parts + 1) if n not in etags]
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        for future in [executor.submit(send_part, n) for n in missing]:
+            future.result()
+    finally:
+        # Parts not started yet are dropped, a rerun sends them
+        executor.shutdown(wait=True, cancel_futures=True)
+        journal_file.close()
+
+    client.complete_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        UploadId=journal["upload_id"],
+        MultipartUpload={
+            "Parts": [{"ETag": etags[n], "PartNumber": n} for n in sorted(etags)]
+        },
+    )
+    os.remove(path)
+
+
+def iter_stale_uploads(
+    client, bucket: str, prefix: str = "", older_than: timedelta = timedelta(0)
+) -> Iterator[dict]:
+    """Yields incomplete multipart uploads under a prefix started before older_than ago"""
+    cutoff = datetime.now(timezone.utc) - older_than
+    paginator = client.get_paginator("list_multipart_uploads")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"] <= cutoff:
+                yield upload
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Union
+
+from s3_tool import hashing, listing
+
+# LastModified only has second precision, so modification times this close
+# to each other are taken as equal
+MTIME_WINDOW = 1.0
+
+
+class Entry(NamedTuple):
+    size: int
+    mtime: float
+    etag: Union[str, None] = None
+
+
+class Plan(NamedTuple):
+    upload: List[str]
+    download: List[str]
+    delete_remote: List[str]
+    delete_local: List[str]
+
+
+def scan_local(root: str) -> Dict[str, Entry]:
+    """Every file under root, keyed by its path relative to root with / separators"""
+    found: Dict[str, Entry] = {}
+    pending = [(root, "")]
+    while pending:
+        directory, relative = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name = f"{relative}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, f"{name}/"))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    found[name] = Entry(stat.st_size, stat.st_mtime)
+    return found
+
+
+def scan_remote(client, bucket: str, prefix: str) -> Dict[str, Entry]:
+    """Every object under prefix, keyed by its key relative to the prefix"""
+    found: Dict[str, Entry] = {}
+    for obj in listing.iter_objects(client, bucket, prefix):
+        name = obj["Key"][len(prefix) :]
+        # Skip "folder" placeholder objects
+        if name and not name.endswith("/"):
+            found[name] = Entry(
+                obj["Size"], obj["LastModified"].timestamp(), obj.get("ETag")
+            )
+    return found
+
+
+def scan(root: str, client, bucket: str, prefix: str):
+    """Scans the local folder and lists the bucket prefix at the same time"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        local = executor.submit(scan_local, root)
+        remote = executor.submit(scan_remote, client, bucket, prefix)
+        return local.result(), remote.result()
+
+
+def plan(
+    local: Dict[str, Entry],
+    remote: Dict[str, Entry],
+    direction: str = "up",
+    delete: bool = False,
+    same_content: Union[Callable[[List[str]], Dict[str, bool]], None] = None,
+) -> Plan:
+    """
+    Decides what has to be transferred for the destination to match the
+    source, "up" being local to bucket and "down" bucket to local.
+
+    Files missing on the destination or with a different size are always
+    sent. Otherwise, when same_content is given, it is called once with
+    every same sized name and the files it reports as different are sent.
+    Without it, files modified on the source after the destination are
+    sent. With delete, files only found on the destination are removed.
+    """
+    source, destination = (local, remote) if direction == "up" else (remote, local)
+    same_size: List[str] = []
+    send: List[str] = []
+
+    for name, entry in source.items():
+        other = destination.get(name)
+        if other is None or entry.size != other.size:
+            send.append(name)
+        elif same_content is not None:
+            same_size.append(name)
+        elif entry.mtime > other.mtime + MTIME_WINDOW:
+            send.append(name)
+
+    if same_content is not None and same_size:
+        send.extend(name for name, same in same_content(same_size).items() if not same)
+
+    extraneous = (
+        sorted(name for name in destination if name not in source) if delete else []
+    )
+
+    if direction == "up":
+        return Plan(sorted(send), [], extraneous, [])
+    return Plan([], sorted(send), [], extraneous)
+
+
+def etag_checker(client, bucket: str, prefix: str, root: str, remote, threads: int = 4):
+    """
+    Builds the same_content function plan takes, hashing the local files
+    on threads and comparing them with the listed ETags.
+    """
+
+    def check(name: str):
+        etag = remote[name].etag
+        part_size = hashing.object_part_size(client, bucket, prefix + name, etag or "")
+        return name, hashing.matches_etag(os.path.join(root, name), etag, part_size)
+
+    def same_content(names: List[str]) -> Dict[str, bool]:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return dict(executor.map(check, names))
+
+    return same_content
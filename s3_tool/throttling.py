@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from typing import Union
+
+# Error codes S3 and S3 compatible endpoints answer with when overloaded
+THROTTLE_CODES = frozenset(
+    {
+        "SlowDown",
+        "Throttling",
+        "ThrottlingException",
+        "RequestLimitExceeded",
+        "RequestThrottled",
+        "TooManyRequests",
+        "TooManyRequestsException",
+    }
+)
+
+RETRY_MODES = ("legacy", "standard", "adaptive")
+
+_events: Counter = Counter()
+_events_lock = threading.Lock()
+
+
+def retries(retry_mode: str = "standard", max_attempts: int = 3) -> dict:
+    """The retries argument of botocore's Config"""
+    if retry_mode not in RETRY_MODES:
+        raise ValueError(f"Retry mode must be one of {', '.join(RETRY_MODES)}")
+    return {"mode": retry_mode, "total_max_attempts": max(1, max_attempts)}
+
+
+def is_throttled(parsed_response: Union[dict, None]) -> bool:
+    if not parsed_response:
+        return False
+    code = parsed_response.get("Error", {}).get("Code")
+    status = parsed_response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in THROTTLE_CODES or status == 503
+
+
+class TokenBucket:
+    """Lets at most rate requests per second through, with bursts of up to rate"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Takes a token and returns how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # Taking the token ahead of time keeps the waiting threads in line
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def acquire(self) -> None:
+        wait = self._take()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._take()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def _before_send(self, **kwargs) -> None:
+        self.acquire()
+
+    async def _before_send_async(self, **kwargs) -> None:
+        await self.acquire_async()
+
+
+def _record(event_name: str = "", parsed_response=None, **kwargs) -> None:
+    if is_throttled(parsed_response):
+        operation = event_name.rsplit(".", 1)[-1]
+        with _events_lock:
+            _events[operation] += 1
+
+
+def attach(client, max_rate: float = 0) -> None:
+    """
+    Counts client's throttled responses and caps its request rate to
+    max_rate requests per second, 0 for no limit
+    """
+    client.meta.events.register("response-received.s3", _record)
+    if max_rate > 0:
+        client.meta.events.register(
+            "before-send.s3", TokenBucket(max_rate)._before_send
+        )
+
+
+def attach_async(client, max_rate: float = 0) -> None:
+    """
+    attach for aiobotocore clients, whose requests wait for the rate limit
+    without blocking the event loop
+    """
+    client.meta.events.register("response-received.s3", _record)
+    if max_rate > 0:
+        client.meta.events.register(
+            "before-send.s3", TokenBucket(max_rate)._before_send_async
+        )
+
+
+def events() -> Counter:
+    """Throttled responses seen so far, by operation"""
+    with _events_lock:
+        return Counter(_events)
+
+
+def reset() -> None:
+    with _events_lock:
+        _events.clear()
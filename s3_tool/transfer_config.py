@@ -0,0 +1,97 @@
+import math
+import re
+from typing import Union
+
+from boto3.s3.transfer import TransferConfig
+
+KB = 1024
+MB = 1024**2
+GB = 1024**3
+
+# S3 multipart limits
+MIN_PART_SIZE = 5 * MB
+MAX_PART_SIZE = 5 * GB
+MAX_PARTS = 10000
+
+# Bounds used by the auto mode when picking a part size
+AUTO_MIN_PART_SIZE = 8 * MB
+AUTO_MAX_PART_SIZE = 512 * MB
+
+_UNITS = {"": 1, "B": 1, "K": KB, "KB": KB, "M": MB, "MB": MB, "G": GB, "GB": GB}
+
+
+def parse_size(value: Union[str, int]) -> int:
+    """Parses sizes such as 1048576, 512KB, 64MB or 1G into bytes"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*", str(value))
+    if not match or match.group(2).upper() not in _UNITS:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+class TransferSettings:
+    """
+    Per command multipart settings. chunk_size can be set to "auto", in which
+    case the part size and per file concurrency are picked from each object's
+    size and the amount of files transferred at the same time, so that all
+    transfers together stay under max_connections.
+    """
+
+    def __init__(
+        self,
+        chunk_size: Union[str, None] = None,
+        max_concurrency: Union[int, None] = None,
+        multipart_threshold: Union[str, None] = None,
+        max_connections: int = 64,
+        files: int = 1,
+        threads: int = 1,
+    ):
+        self.auto = str(chunk_size).lower() == "auto"
+        self.chunk_size = (
+            parse_size(chunk_size) if chunk_size and not self.auto else None
+        )
+        self.max_concurrency = max_concurrency
+        self.multipart_threshold = (
+            parse_size(multipart_threshold) if multipart_threshold else None
+        )
+        self.max_connections = max_connections
+        self.parallel_files = max(1, min(files, threads))
+
+        if self.chunk_size is not None and self.chunk_size < MIN_PART_SIZE:
+            raise ValueError("The chunk size can not be smaller than 5MB")
+
+    @property
+    def per_file_concurrency(self) -> int:
+        if self.max_concurrency:
+            return self.max_concurrency
+        if self.auto:
+            return max(1, self.max_connections // self.parallel_files)
+        return TransferConfig().max_concurrency
+
+    @property
+    def pool_size(self) -> int:
+        """Connections needed when every file in flight uses its full concurrency"""
+        return self.parallel_files * self.per_file_concurrency
+
+    def config_for(self, size: int = 0) -> TransferConfig:
+        if not self.auto:
+            kwargs = {"max_concurrency": self.per_file_concurrency}
+            if self.chunk_size:
+                kwargs["multipart_chunksize"] = self.chunk_size
+            if self.multipart_threshold:
+                kwargs["multipart_threshold"] = self.multipart_threshold
+            return TransferConfig(**kwargs)
+
+        concurrency = self.per_file_concurrency
+        # Several rounds of parts per connection, without tiny parts or
+        # going over the 10000 parts S3 allows
+        part_size = math.ceil(size / (concurrency * 8) / MB) * MB
+        part_size = min(max(part_size, AUTO_MIN_PART_SIZE), AUTO_MAX_PART_SIZE)
+        part_size = max(part_size, math.ceil(size / MAX_PARTS / MB) * MB)
+        part_size = min(part_size, MAX_PART_SIZE)
+        parts = max(1, math.ceil(size / part_size))
+
+        return TransferConfig(
+            multipart_chunksize=part_size,
+            multipart_threshold=self.multipart_threshold or part_size,
+            max_concurrency=min(concurrency, parts),
+        )
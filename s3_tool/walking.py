@@ -0,0 +1,101 @@
+import fnmatch
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Sequence, Tuple, Union
+
+from s3_tool.pipeline import put
+
+# Folders scanned at the same time
+WALK_THREADS = 8
+
+# Tells the reader every folder was scanned
+_DONE = object()
+
+
+def matches(name: str, patterns: Sequence[str]) -> bool:
+    """
+    Checks a path relative to the walked folder, with / separators, against
+    globs. A glob matches either the whole path or the last part of it, so
+    '*.mp4' matches at any depth and 'videos/*' only under videos.
+    """
+    base = name.rsplit("/", 1)[-1]
+    return any(
+        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(base, pattern)
+        for pattern in patterns
+    )
+
+
+def walk(
+    root: str,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    threads: int = WALK_THREADS,
+    max_queued: int = 10000,
+    onerror: Union[Callable[[OSError], None], None] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (path, relative path) for every file under root, relative paths
+    using / separators, as the folders are being scanned.
+
+    Folders are scanned in parallel on threads and found files wait in a
+    queue of at most max_queued files, so whatever consumes them starts
+    right away and the walk never gets too far ahead of it. Files are
+    yielded in no particular order.
+
+    Only files matching one of the include globs are yielded, if any are
+    given. Files and folders matching an exclude glob are skipped, the
+    folders without being scanned. Folders that can not be read are passed
+    to onerror and skipped, like os.walk does. Symlinked folders are not
+    followed.
+    """
+    found: queue.Queue = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [0]
+    executor = ThreadPoolExecutor(max_workers=threads)
+
+    def submit(directory: str, relative: str) -> None:
+        with lock:
+            pending[0] += 1
+        try:
+            executor.submit(scan, directory, relative)
+        except RuntimeError:
+            # The walk was stopped and the pool already shut down
+            pass
+
+    def scan(directory: str, relative: str) -> None:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if stop.is_set():
+                        return
+                    name = f"{relative}{entry.name}"
+                    if matches(name, exclude):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        submit(entry.path, f"{name}/")
+                    elif entry.is_file() and (not include or matches(name, include)):
+                        if not put(found, (entry.path, name), stop):
+                            return
+        except OSError as e:
+            if onerror:
+                onerror(e)
+        finally:
+            with lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                put(found, _DONE, stop)
+
+    try:
+        submit(root, "")
+        while True:
+            item = found.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import os
+import socket
+from pathlib import Path
+from unittest import mock
+
+import boto3
+import click
+import pytest
+from moto.server import ThreadedMotoServer
+
+from s3_tool import async_engine, metrics, throttling
+from s3_tool.choices.access_types import ACLTypes
+from s3_tool.choices.engines import Engines
+from s3_tool.main import change_permissions, download, move_object, upload
+from s3_tool.options import Options
+
+pytest.importorskip("aiobotocore")
+
+
+@pytest.fixture(scope="module")
+def moto_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+def invoked(**options):
+    """The context the main callback sets up, with options instead of the defaults"""
+    return click.Context(click.Command("s3-tool"), obj=Options(**options))
+
+
+def login_data(endpoint_url):
+    """What get_login caches, see async_engine.create_client"""
+    return {
+        "endpoint_url": endpoint_url,
+        "aws_access_key_id": "testing",
+        "aws_secret_access_key": "testing",
+        "bucket": "testing_bucket",
+    }
+
+
+@pytest.fixture
+def server_bucket(moto_server):
+    """Same keys as test_login_data.bucket_contents, on a local moto server"""
+    conn = boto3.resource(
+        "s3",
+        endpoint_url=moto_server,
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="us-east-1",
+    )
+    bucket_name = "testing_bucket"
+    bucket = conn.create_bucket(Bucket=bucket_name)
+    for key in [
+        "empty.txt",
+        "source/empty.txt",
+        "source/empty2.txt",
+        "source/subdir/empty3.txt",
+        "source/subdir/empty4.txt",
+    ]:
+        bucket.put_object(
+            Key=key, Body=key, ACL="public-read", ContentType="text/plain"
+        )
+
+    with mock.patch("s3_tool.main.get_login") as mock_login, mock.patch.dict(
+        "s3_tool.main._login", {"login_data": login_data(moto_server)}
+    ):
+        mock_login.return_value = bucket, conn, bucket_name, conn.meta.client
+        yield bucket
+
+    bucket.objects.all().delete()
+    bucket.delete()
+
+
+def test_async_upload(server_bucket, tmp_path):
+    files = []
+    for i in range(20):
+        p = tmp_path / f"file {i}.txt"
+        p.write_text(f"{i}")
+        files.append(str(p))
+
+    upload(
+        files=files,
+        upload_path="async_upload",
+        permissions="public-read",
+        threads=8,
+        engine=Engines.asyncio,
+        directory=None,
+        pack=None,
+        skip_identical=False,
+    )
+
+    uploaded = server_bucket.Object("async_upload/file 7.txt").get()
+    assert uploaded["Body"].read() == b"7"
+    assert uploaded["ContentType"] == "text/plain"
+    assert len(list(server_bucket.objects.filter(Prefix="async_upload/"))) == 20
+
+
+def test_async_download_recursive(server_bucket, tmp_path):
+    download(
+        download_path=str(tmp_path),
+        files=None,
+        recursive="source/",
+        threads=4,
+        engine=Engines.asyncio,
+        pack=None,
+        skip_existing=None,
+    )
+
+    expected = Path(os.path.join(tmp_path, "source", "subdir", "empty4.txt"))
+    assert expected.read_text() == "source/subdir/empty4.txt"
+    assert len(list(tmp_path.glob("**/*.txt"))) == 4
+
+
+def test_async_engine_records_metrics(server_bucket, tmp_path):
+    metrics.reset()
+    try:
+        with invoked(metrics_path=str(tmp_path / "metrics.json")):
+            download(
+                download_path=str(tmp_path),
+                files=None,
+                recursive="source/",
+                threads=4,
+                engine=Engines.asyncio,
+                pack=None,
+                skip_existing=None,
+            )
+        recorded = metrics.operations()
+    finally:
+        metrics.reset()
+
+    assert recorded["ListObjectsV2"].requests == 1
+    assert recorded["ListObjectsV2"].bytes_received > 0
+    assert recorded["GetObject"].requests == 4
+    assert recorded["GetObject"].errors == 0
+    assert recorded["GetObject"].bytes_received == sum(
+        len(key) for key in ["source/empty.txt", "source/empty2.txt"]
+    ) + 2 * len("source/subdir/empty3.txt")
+
+
+def test_async_download_missing_key(server_bucket, tmp_path, capsys):
+    with pytest.raises(Exception):
+        download(
+            download_path=str(tmp_path),
+            files=["source/empty.txt", "missing.txt"],
+            recursive=None,
+            threads=4,
+            engine=Engines.asyncio,
+            pack=None,
+            skip_existing=None,
+        )
+
+    assert (tmp_path / "empty.txt").exists()
+    assert "missing.txt" in capsys.readouterr().out
+
+
+def test_async_move(server_bucket):
+    move_object(
+        origin_files=["source/empty.txt", "source/empty2.txt"],
+        destination_path="moved",
+        rename=None,
+        permission=ACLTypes.public_read,
+        threads=4,
+        engine=Engines.asyncio,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
+    )
+
+    keys = [o.key for o in server_bucket.objects.all()]
+    assert "moved/empty.txt" in keys
+    assert "moved/empty2.txt" in keys
+    assert "source/empty.txt" not in keys
+    assert "source/empty2.txt" not in keys
+
+
+def test_async_change_permissions(server_bucket, capsys):
+    with invoked(progress_mode="json"):
+        change_permissions(
+            args=["source/subdir/"],
+            prefix_threads=1,
+            changer_threads=4,
+            permissions=ACLTypes.private,
+            engine=Engines.asyncio,
+        )
+
+    final = json.loads(capsys.readouterr().err.splitlines()[-1])
+    assert final["command"] == "change-permissions"
+    assert final["objects"] == final["total_objects"] == 2
+    assert final["done"]
+
+    grants = server_bucket.Object("source/subdir/empty3.txt").Acl().grants
+    assert all("AllUsers" not in str(g["Grantee"]) for g in grants)
+    public = server_bucket.Object("source/empty.txt").Acl().grants
+    assert any("AllUsers" in str(g["Grantee"]) for g in public)
+
+
+@pytest.fixture
+def settings():
+    throttling.reset()
+    yield
+    throttling.reset()
+
+
+def test_async_client_follows_throttling_settings(server_bucket, moto_server, settings):
+    options = Options(
+        max_requests=2, retry_mode="adaptive", max_attempts=5, max_rate=1000
+    )
+
+    async def check():
+        login = login_data(moto_server)
+        limit = async_engine.in_flight(8, options.max_requests)
+        async with async_engine.create_client(login, limit, options) as aclient:
+            async_engine.attach(aclient, options)
+            assert aclient.meta.config.retries == {
+                "mode": "adaptive",
+                "total_max_attempts": 5,
+            }
+            assert aclient.meta.config.max_pool_connections == 2
+            await aclient.head_object(Bucket=server_bucket.name, Key="empty.txt")
+            await aclient.meta.events.emit(
+                "response-received.s3.HeadObject",
+                parsed_response={"Error": {"Code": "SlowDown"}},
+            )
+
+    asyncio.run(check())
+
+    assert throttling.events() == {"HeadObject": 1}
+
+
+def test_run_bounded_keeps_to_max_requests():
+    running = []
+    most = []
+
+    async def call(item):
+        running.append(item)
+        most.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(item)
+
+    limit = async_engine.in_flight(10, 3)
+    failed = asyncio.run(async_engine.run_bounded(call, range(20), limit))
+
+    assert failed == []
+    assert max(most) == 3
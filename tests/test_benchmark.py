@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from s3_tool import benchmark, main, metrics
+from s3_tool.choices.workloads import Workloads
+
+
+@pytest.fixture
+def restore_settings():
+    yield
+    metrics.reset()
+    main._login.clear()
+
+
+def test_bench_runs_every_workload(tmp_path, restore_settings, capsys):
+    output = tmp_path / "bench.json"
+    main.bench(objects=5, size="2KB", threads=2, workloads=[], output=str(output))
+
+    written = json.loads(output.read_text())
+    assert written["settings"] == {"objects": 5, "size": 2048, "threads": 2}
+    results = {r["workload"]: r for r in written["results"]}
+    assert list(results) == list(benchmark.WORKLOADS)
+    for result in results.values():
+        assert result["objects"] == 5
+        assert result["errors"] == 0
+        assert result["ops_per_second"] > 0
+        assert 0 < result["p50"] <= result["p99"]
+    assert results["upload"]["bytes"] == 5 * 2048
+    assert results["upload"]["requests"] == 5
+    assert results["list"]["bytes"] == 0
+    assert "change-permissions" in capsys.readouterr().out
+
+
+def test_bench_uploads_what_chosen_workloads_need(restore_settings, capsys):
+    main.bench(
+        objects=3,
+        size="1KB",
+        threads=2,
+        workloads=[Workloads.download],
+        output=None,
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    workload, objects = lines[1].split()[:2]
+    assert (workload, objects) == ("download", "3")
+
+
+def test_bench_rejects_bad_sizes(restore_settings):
+    with pytest.raises(main.typer.Exit):
+        main.bench(objects=1, size="big", threads=1, workloads=[], output=None)
+
+
+def test_compare_flags_slower_workloads():
+    def run(upload, download):
+        return {
+            "version": "0",
+            "settings": {},
+            "results": [
+                {
+                    "workload": name,
+                    "ops_per_second": ops,
+                    "mb_per_second": ops,
+                    "p50": 0.01,
+                    "p99": 0.1,
+                }
+                for name, ops in (("upload", upload), ("download", download))
+            ],
+        }
+
+    report, regressed = benchmark.compare(run(100, 100), run(95, 80), tolerance=0.1)
+    assert regressed == ["download"]
+    assert "-20.0%" in report
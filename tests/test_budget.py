@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from moto import mock_s3
+
+from s3_tool import budget
+
+from .test_login_data import bucket_contents
+
+
+def wait_until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise TimeoutError
+
+
+def test_budget_caps_requests_in_flight():
+    limiter = budget.RequestBudget(2)
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+
+    def request(_):
+        limiter.acquire()
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.pop()
+        limiter.release()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(request, range(20)))
+
+    assert max(peak) == 2
+    assert limiter._in_flight == 0
+
+
+def test_budget_shares_slots_between_groups():
+    limiter = budget.RequestBudget(1)
+    order = []
+
+    def request(name):
+        limiter.acquire()
+        order.append(name)
+        limiter.release()
+
+    limiter.acquire()
+    threads = [
+        threading.Thread(target=limiter.grouped("big", request), args=("big",))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    wait_until(lambda: len(limiter._waiting.get("big", [])) == 5)
+
+    small = threading.Thread(target=limiter.grouped("small", request), args=("small",))
+    small.start()
+    wait_until(lambda: "small" in limiter._waiting)
+
+    limiter.release()
+    for t in threads + [small]:
+        t.join()
+
+    assert order == ["big", "small", "big", "big", "big", "big"]
+
+
+@mock_s3
+def test_budget_is_released_after_every_request():
+    _, _, bucket_name, client = bucket_contents()
+    limiter = budget.attach(client, 1)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(
+            executor.map(
+                lambda key: client.head_object(Bucket=bucket_name, Key=key),
+                ["empty.txt", "source/empty.txt"] * 4,
+            )
+        )
+
+    assert limiter._in_flight == 0
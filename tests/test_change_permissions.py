@@ -1,12 +1,16 @@
 import ast
+import json
 import os
 from unittest import mock
 
+import click
 import pytest
 from moto import mock_s3
 
+from s3_tool import acls
 from s3_tool.choices import access_types, object_methods
 from s3_tool.main import change_permissions, list_keys
+from s3_tool.options import Options
 
 from .test_login_data import bucket_contents
 
@@ -42,6 +46,8 @@ def test_change_permissions_public_read_write(mock_bucket, capsys):
         prefix_threads=1,
         changer_threads=1,
         permissions=access_types.ACLTypes.public_read_write,
+        index_ttl=0,
+        diff=False,
     )
 
     list_keys(
@@ -52,6 +58,7 @@ def test_change_permissions_public_read_write(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -71,6 +78,8 @@ def test_change_permissions_public_read(mock_bucket, capsys):
         prefix_threads=1,
         changer_threads=1,
         permissions=access_types.ACLTypes.public_read,
+        index_ttl=0,
+        diff=False,
     )
 
     list_keys(
@@ -81,6 +90,7 @@ def test_change_permissions_public_read(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -103,6 +113,8 @@ def test_change_permissions_private(mock_bucket, capsys):
         prefix_threads=1,
         changer_threads=1,
         permissions=access_types.ACLTypes.private,
+        index_ttl=0,
+        diff=False,
     )
 
     list_keys(
@@ -113,6 +125,7 @@ def test_change_permissions_private(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -139,6 +152,8 @@ def test_change_permissions_authenticated_read(mock_bucket, capsys):
         prefix_threads=1,
         changer_threads=1,
         permissions=access_types.ACLTypes.authenticated_read,
+        index_ttl=0,
+        diff=False,
     )
 
     list_keys(
@@ -149,6 +164,7 @@ def test_change_permissions_authenticated_read(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -172,6 +188,8 @@ def test_change_permissions_aws_exec_read(mock_bucket, capsys):
         prefix_threads=1,
         changer_threads=1,
         permissions=access_types.ACLTypes.aws_exec_read,
+        index_ttl=0,
+        diff=False,
     )
 
     list_keys(
@@ -182,6 +200,7 @@ def test_change_permissions_aws_exec_read(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -203,6 +222,8 @@ def test_change_permissions_bucket_owner_full_control(mock_bucket, capsys):
         prefix_threads=1,
         changer_threads=1,
         permissions=access_types.ACLTypes.bucket_owner_full_control,
+        index_ttl=0,
+        diff=False,
     )
 
     list_keys(
@@ -213,6 +234,7 @@ def test_change_permissions_bucket_owner_full_control(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -234,6 +256,8 @@ def test_change_permissions_bucket_owner_read(mock_bucket, capsys):
         prefix_threads=1,
         changer_threads=1,
         permissions=access_types.ACLTypes.bucket_owner_read,
+        index_ttl=0,
+        diff=False,
     )
 
     list_keys(
@@ -244,6 +268,7 @@ def test_change_permissions_bucket_owner_read(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -251,3 +276,68 @@ def test_change_permissions_bucket_owner_read(mock_bucket, capsys):
     captured_dict = ast.literal_eval(captured.out)
     assert captured_dict[0].get("Grantee").get("Type") == "CanonicalUser"
     assert captured_dict[0].get("Permission") == "FULL_CONTROL"
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_change_permissions_diff(mock_bucket, capsys):
+    mock_bucket.return_value = bucket_contents()
+    _, _, bucket_name, client = mock_bucket.return_value
+    # Every fixture object starts public-read
+    client.put_object_acl(Bucket=bucket_name, Key="source/empty.txt", ACL="private")
+
+    with mock.patch.object(
+        client, "put_object_acl", wraps=client.put_object_acl
+    ) as put_object_acl:
+        change_permissions(
+            args=["source/"],
+            prefix_threads=1,
+            changer_threads=2,
+            permissions=access_types.ACLTypes.public_read,
+            index_ttl=0,
+            diff=True,
+        )
+
+    assert [c.kwargs["Key"] for c in put_object_acl.call_args_list] == [
+        "source/empty.txt"
+    ]
+    assert capsys.readouterr().err.endswith("Changed: 1 | Unchanged: 3 | Failed: 0\n")
+
+
+def test_has_canned_acl():
+    owner = {"ID": "owner-id"}
+    owner_grant = {
+        "Grantee": {"ID": "owner-id", "Type": "CanonicalUser"},
+        "Permission": "FULL_CONTROL",
+    }
+    public_grant = {
+        "Grantee": {"URI": acls.ALL_USERS, "Type": "Group"},
+        "Permission": "READ",
+    }
+    public = {"Owner": owner, "Grants": [owner_grant, public_grant]}
+
+    assert acls.has_canned_acl(public, "public-read")
+    assert not acls.has_canned_acl(public, "private")
+    assert not acls.has_canned_acl(public, "public-read-write")
+    assert acls.has_canned_acl({"Owner": owner, "Grants": [owner_grant]}, "private")
+    assert not acls.has_canned_acl(public, "bucket-owner-read")
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_change_permissions_reports_progress(mock_bucket, capsys):
+    mock_bucket.return_value = bucket_contents()
+    with click.Context(click.Command("s3-tool"), obj=Options(progress_mode="json")):
+        change_permissions(
+            args=["source/"],
+            prefix_threads=1,
+            changer_threads=2,
+            permissions=access_types.ACLTypes.private,
+            index_ttl=0,
+            diff=False,
+        )
+
+    final = json.loads(capsys.readouterr().err.splitlines()[-2])
+    assert final["command"] == "change-permissions"
+    assert final["objects"] == final["total_objects"] == 4
+    assert final["done"]
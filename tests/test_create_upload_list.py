@@ -3,6 +3,7 @@ import sys
 from pathlib import Path
 from unittest import mock
 
+from s3_tool import manifest
 from s3_tool.main import create_upload_list
 
 
@@ -22,6 +23,9 @@ def test_create_upload_list(tmp_path):
         files_path=d,
         file_extension="txt",
         output_path=d,
+        recursive=False,
+        fmt="commas",
+        details=False,
     )
 
     upload_txt_path = Path(os.path.join(d, "upload.txt"))
@@ -46,7 +50,33 @@ def test_incompatible_os(mock_sys, tmp_path, capsys):
         files_path=d,
         file_extension="txt",
         output_path=d,
+        recursive=False,
+        fmt="commas",
+        details=False,
     )
 
     captured = capsys.readouterr()
     assert captured.out == "OS not compatible\n"
+
+
+def test_create_upload_list_recursive_lines(tmp_path):
+    d = create_files(tmp_path)
+    sub = d / "sub, with a comma"
+    sub.mkdir()
+    (sub / "nested.txt").write_text("nested")
+    (sub / "skipped.log").write_text("skipped")
+
+    create_upload_list(
+        files_path=str(d),
+        file_extension="txt",
+        output_path=str(tmp_path),
+        recursive=True,
+        fmt="lines",
+        details=True,
+    )
+
+    entries = list(manifest.read(str(tmp_path / "upload.txt")))
+    assert sorted(os.path.relpath(entry.path, d) for entry in entries) == sorted(
+        [f"file {i}.txt" for i in range(10)] + [os.path.join(sub.name, "nested.txt")]
+    )
+    assert all(entry.size == os.path.getsize(entry.path) for entry in entries)
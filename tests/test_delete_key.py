@@ -2,8 +2,9 @@ from unittest import mock
 
 import pytest
 from moto import mock_s3
-from typer import Abort
+from typer import Abort, Exit
 
+from s3_tool import deletion
 from s3_tool.main import delete_key
 
 from .test_login_data import bucket_contents
@@ -11,7 +12,7 @@ from .test_login_data import bucket_contents
 
 def test_delete_key_no_files(capsys):
     with pytest.raises(Abort):
-        delete_key(files=[], prompt=False, threads=1)
+        delete_key(files=[], prompt=False, threads=1, prefix=None)
 
         captured = capsys.readouterr()
         assert captured.out == "No files provided\n"
@@ -21,7 +22,7 @@ def test_delete_key_no_files(capsys):
 @mock_s3
 def test_delete_key_one_file_no_prompt(mock_bucket, capsys):
     mock_bucket.return_value = bucket_contents()
-    delete_key(files=["source/empty.txt"], prompt=False, threads=1)
+    delete_key(files=["source/empty.txt"], prompt=False, threads=1, prefix=None)
 
     assert mock_bucket.called is True
     captured = capsys.readouterr()
@@ -35,7 +36,7 @@ def test_delete_key_one_file_no_prompt(mock_bucket, capsys):
 def test_delete_key_ending_with_delimiter(mock_bucket, capsys):
     with pytest.raises(Abort):
         mock_bucket.return_value = bucket_contents()
-        delete_key(files=["source/"], prompt=False, threads=1)
+        delete_key(files=["source/"], prompt=False, threads=1, prefix=None)
 
         captured = capsys.readouterr()
         assert captured.out == "DO NOT DELETE A KEY ENDING WITH /\n"
@@ -48,7 +49,7 @@ def test_delete_key_ending_with_delimiter(mock_bucket, capsys):
 def test_delete_key_starting_with_delimiter(mock_bucket, capsys):
     with pytest.raises(Abort):
         mock_bucket.return_value = bucket_contents()
-        delete_key(files=["/source"], prompt=False, threads=1)
+        delete_key(files=["/source"], prompt=False, threads=1, prefix=None)
 
         captured = capsys.readouterr()
         assert captured.out == "DO NOT DELETE A KEY STARTING WITH /\n"
@@ -64,6 +65,7 @@ def test_delete_multiple_keys_no_prompt(mock_bucket, capsys):
         files=["source/empty.txt", "delimiter/delimiter/empty2.txt"],
         prompt=False,
         threads=1,
+        prefix=None,
     )
 
     assert mock_bucket.called is True
@@ -77,19 +79,76 @@ def test_delete_multiple_keys_no_prompt(mock_bucket, capsys):
 @mock.patch("s3_tool.main.get_login")
 @mock_s3
 def test_delete_non_existing_key_no_prompt(mock_bucket, capsys):
+    # DeleteObjects reports missing keys as deleted, no existence check is made
+    mock_bucket.return_value = bucket_contents()
+
+    delete_key(
+        files=["non_existing_file", "non_existing_file2"],
+        prompt=False,
+        threads=1,
+        prefix=None,
+    )
+
+    captured = capsys.readouterr()
+    assert (
+        captured.out
+        == "Deleted Key: non_existing_file\nDeleted Key: non_existing_file2\n"
+    )
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_delete_prefix_no_prompt(mock_bucket, capsys):
+    mock_bucket.return_value = bucket_contents()
+    contents = mock_bucket.return_value[0]
+
+    delete_key(files=None, prompt=False, threads=2, prefix="source/")
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "Deleted Key: source/empty.txt\n"
+        "Deleted Key: source/empty2.txt\n"
+        "Deleted Key: source/subdir/empty3.txt\n"
+        "Deleted Key: source/subdir/empty4.txt\n"
+    )
+    assert [o.key for o in contents.objects.filter(Prefix="source/")] == []
+    assert len(list(contents.objects.all())) == 3
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_delete_refused_batch(mock_bucket, capsys):
+    contents, s3, _, client = bucket_contents()
+    mock_bucket.return_value = contents, s3, "missing_bucket", client
+
+    with pytest.raises(Exit) as exited:
+        delete_key(files=["source/empty.txt"], prompt=False, threads=1, prefix=None)
+
+    assert exited.value.exit_code == 1
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "NoSuchBucket" in captured.err
+
+
+def test_delete_prefix_without_delimiter():
     with pytest.raises(Abort):
+        delete_key(files=None, prompt=False, threads=1, prefix="source")
 
-        mock_bucket.return_value = bucket_contents()
 
-        delete_key(
-            files=["non_existing_file", "non_existing_file2"],
-            prompt=False,
-            threads=1,
-        )
+@mock_s3
+def test_delete_keys_in_batches():
+    _, _, bucket_name, client = bucket_contents()
+    keys = ["empty.txt", "source/empty.txt", "source/empty2.txt", "listkeys/empty.txt"]
 
-        captured = capsys.readouterr()
-        print(captured.out)
-        assert (
-            captured.out
-            == "non_existing_file does not exists!\nnon_existing_file2 does not exists!\n"
-        )
+    results = list(
+        deletion.delete_keys(client, bucket_name, iter(keys), threads=2, batch_size=3)
+    )
+
+    assert sorted(len(deleted) for deleted, _ in results) == [1, 3]
+    assert sorted(k for deleted, _ in results for k in deleted) == sorted(keys)
+    assert all(errors == [] for _, errors in results)
+
+
+def test_iter_batches():
+    batches = list(deletion.iter_batches(range(2500)))
+    assert [len(b) for b in batches] == [1000, 1000, 500]
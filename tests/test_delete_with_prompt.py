@@ -19,7 +19,7 @@ Input is "y" first, "n" second.
 @mock_s3
 def test_delete_key_one_file_prompt_positive(mock_bucket, capsys):
     mock_bucket.return_value = bucket_contents()
-    delete_key(files=["source/empty.txt"], prompt=True, threads=1)
+    delete_key(files=["source/empty.txt"], prompt=True, threads=1, prefix=None)
 
     assert mock_bucket.called is True
     captured = capsys.readouterr()
@@ -35,7 +35,7 @@ def test_delete_key_one_file_prompt_positive(mock_bucket, capsys):
 def test_delete_key_one_file_prompt_negative(mock_bucket, capsys):
     with pytest.raises(Exit):
         mock_bucket.return_value = bucket_contents()
-        delete_key(files=["source/empty.txt"], prompt=True, threads=1)
+        delete_key(files=["source/empty.txt"], prompt=True, threads=1, prefix=None)
 
         assert mock_bucket.called is True
         captured = capsys.readouterr()
@@ -25,6 +25,14 @@ def test_download_file(mock_bucket, tmp_path):
         files=["source/empty.txt"],
         recursive=None,
         threads=1,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        index_ttl=0,
+        pack=None,
+        skip_existing=None,
     )
 
     expected_file = Path(os.path.join(download_folder, "empty.txt"))
@@ -48,6 +56,14 @@ def test_download_multiple_files(mock_bucket, tmp_path):
         ],
         recursive=None,
         threads=2,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        index_ttl=0,
+        pack=None,
+        skip_existing=None,
     )
 
     expected_files = [file for file in Path(download_folder).iterdir()]
@@ -69,6 +85,14 @@ def test_download_is_not_file(mock_bucket, tmp_path, capsys):
             files=None,
             recursive=None,
             threads=1,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            index_ttl=0,
+            pack=None,
+            skip_existing=None,
         )
 
 
@@ -85,6 +109,14 @@ def test_download_recursive(mock_bucket, tmp_path):
         files=None,
         recursive="source/",
         threads=3,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        index_ttl=0,
+        pack=None,
+        skip_existing=None,
     )
 
     expected_files = [file for file in Path(download_folder).glob("**/*.*")]
@@ -93,6 +125,43 @@ def test_download_recursive(mock_bucket, tmp_path):
         assert Path.exists(file) is True
 
 
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_download_recursive_reuses_listing(mock_bucket, tmp_path):
+    contents, s3, bucket_name, client = bucket_contents()
+    mock_bucket.return_value = contents, s3, bucket_name, client
+    # Big enough to be fetched in ranged parts
+    client.put_object(
+        Bucket=bucket_name, Key="source/big.bin", Body=b"x" * 6 * 1024 * 1024
+    )
+    operations = []
+    client.meta.events.register(
+        "before-call.s3", lambda model, **kwargs: operations.append(model.name)
+    )
+
+    download_folder = tmp_path / "download_folder"
+    download_folder.mkdir()
+
+    download(
+        download_path=download_folder,
+        files=None,
+        recursive="source/",
+        threads=3,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold="5MB",
+        max_connections=64,
+        resume=False,
+        index_ttl=0,
+        pack=None,
+        skip_existing=None,
+    )
+
+    assert "HeadObject" not in operations
+    assert (download_folder / "source" / "big.bin").stat().st_size == 6 * 1024 * 1024
+    assert (download_folder / "source" / "subdir" / "empty4.txt").is_file()
+
+
 @mock.patch("s3_tool.main.get_login")
 @mock_s3
 def test_download_recursive_fail_with_no_delimiter(mock_bucket, tmp_path):
@@ -107,4 +176,12 @@ def test_download_recursive_fail_with_no_delimiter(mock_bucket, tmp_path):
             files=None,
             recursive="source",
             threads=3,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            index_ttl=0,
+            pack=None,
+            skip_existing=None,
         )
@@ -0,0 +1,209 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from moto import mock_s3
+
+from s3_tool import index
+from s3_tool.choices.object_methods import ObjectMethods
+from s3_tool.main import download, list_keys
+
+from .test_login_data import bucket_contents
+
+
+@pytest.fixture
+def index_file(tmp_path, monkeypatch):
+    path = tmp_path / "index.sqlite3"
+    monkeypatch.setenv("S3_TOOL_INDEX", str(path))
+    return path
+
+
+# Stands in for the client of fake_pages' listings
+CLIENT = SimpleNamespace(meta=SimpleNamespace(endpoint_url="https://s3.example"))
+
+
+def listed_keys(client, bucket_name, prefix=""):
+    endpoint = client.meta.endpoint_url
+    return [obj["Key"] for obj in index.query(endpoint, bucket_name, prefix)]
+
+
+@mock_s3
+def test_refresh_is_incremental(index_file):
+    contents, _, bucket_name, client = bucket_contents()
+
+    assert index.refresh(client, bucket_name, "source/", ttl=60) == 4
+    assert listed_keys(client, bucket_name, "source/") == [
+        "source/empty.txt",
+        "source/empty2.txt",
+        "source/subdir/empty3.txt",
+        "source/subdir/empty4.txt",
+    ]
+
+    contents.put_object(Key="source/zzz.txt", Body=b"")
+    with mock.patch.object(
+        client, "list_objects_v2", wraps=client.list_objects_v2
+    ) as spy:
+        assert index.refresh(client, bucket_name, "source/", ttl=60) == 1
+
+    assert spy.call_args.kwargs["StartAfter"] == "source/subdir/empty4.txt"
+    assert listed_keys(client, bucket_name, "source/")[-1] == "source/zzz.txt"
+    # Other prefixes were never listed
+    assert listed_keys(client, bucket_name, "delimiter/") == []
+
+
+@mock_s3
+def test_expired_prefix_is_listed_again(index_file):
+    contents, _, bucket_name, client = bucket_contents()
+    index.refresh(client, bucket_name, "source/", ttl=60)
+
+    contents.Object("source/empty.txt").delete()
+    index.refresh(client, bucket_name, "source/", ttl=60)
+    assert "source/empty.txt" in listed_keys(client, bucket_name, "source/")
+
+    index.refresh(client, bucket_name, "source/", ttl=0)
+    assert "source/empty.txt" not in listed_keys(client, bucket_name, "source/")
+
+
+@mock_s3
+def test_listed_prefix_covers_its_subfolders(index_file):
+    contents, _, bucket_name, client = bucket_contents()
+    index.refresh(client, bucket_name, "", ttl=60)
+
+    with mock.patch.object(
+        client, "list_objects_v2", wraps=client.list_objects_v2
+    ) as spy:
+        found = list(index.objects(client, bucket_name, "source/subdir/", ttl=60))
+
+    assert [obj["Key"] for obj in found] == [
+        "source/subdir/empty3.txt",
+        "source/subdir/empty4.txt",
+    ]
+    assert found[0]["Size"] == contents.Object(found[0]["Key"]).content_length
+    assert spy.call_args.kwargs["StartAfter"] == "source/subdir/empty4.txt"
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_list_keys_from_index(mock_bucket, index_file, capsys):
+    mock_bucket.return_value = bucket_contents()
+
+    list_keys(
+        prefix="source/subdir/",
+        delimiter="",
+        max_keys=1000,
+        limit=1,
+        all=False,
+        http_prefix=False,
+        key_methods=ObjectMethods.key,
+        index_ttl=60,
+    )
+
+    assert capsys.readouterr().out == "source/subdir/empty3.txt\n"
+    assert index_file.exists()
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_recursive_download_from_index(mock_bucket, index_file, tmp_path):
+    mock_bucket.return_value = bucket_contents()
+
+    download(
+        download_path=str(tmp_path),
+        files=None,
+        recursive="source/subdir/",
+        threads=1,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        index_ttl=60,
+        pack=None,
+        skip_existing=None,
+    )
+
+    assert (tmp_path / "source" / "subdir" / "empty4.txt").is_file()
+    assert listed_keys(mock_bucket.return_value[3], "testing_bucket") == [
+        "source/subdir/empty3.txt",
+        "source/subdir/empty4.txt",
+    ]
+
+
+def fake_pages(pages_by_prefix, paused=None, resume=None):
+    """iter_pages standing in for a listing, pausing after its first page"""
+
+    def iter_pages(client, bucket, prefix, start_after=None):
+        for i, keys in enumerate(pages_by_prefix[prefix]):
+            if i == 1 and paused is not None:
+                paused.set()
+                assert resume.wait(10)
+            yield {
+                "Contents": [
+                    {
+                        "Key": key,
+                        "Size": 1,
+                        "ETag": '"etag"',
+                        "LastModified": datetime.now(timezone.utc),
+                    }
+                    for key in keys
+                ]
+            }
+
+    return iter_pages
+
+
+def test_refreshes_of_other_prefixes_run_while_listing(index_file):
+    paused, resume = threading.Event(), threading.Event()
+    pages = {"a/": [["a/1"], ["a/2"]], "b/": [["b/1"]]}
+
+    with mock.patch.object(
+        index.listing, "iter_pages", fake_pages(pages, paused, resume)
+    ):
+        slow = threading.Thread(target=index.refresh, args=(CLIENT, "bucket", "a/", 0))
+        slow.start()
+        assert paused.wait(10)
+        # The first page of a/ is written but a/ is still being listed
+        assert index.refresh(CLIENT, "bucket", "b/", ttl=0) == 1
+        resume.set()
+        slow.join()
+
+    assert listed_keys(CLIENT, "bucket", "a/") == ["a/1", "a/2"]
+    assert listed_keys(CLIENT, "bucket", "b/") == ["b/1"]
+
+
+def test_full_listing_replaces_entries_page_by_page(index_file):
+    before = {"a/": [["a/1", "a/2"], ["a/3", "a/4"], ["a/5"]]}
+    after = {"a/": [["a/1"], ["a/3"]]}
+    with mock.patch.object(index.listing, "iter_pages", fake_pages(before)):
+        index.refresh(CLIENT, "bucket", "a/", ttl=0)
+    with mock.patch.object(index.listing, "iter_pages", fake_pages(after)):
+        index.refresh(CLIENT, "bucket", "a/", ttl=0)
+
+    assert listed_keys(CLIENT, "bucket", "a/") == ["a/1", "a/3"]
+
+
+def test_endpoints_are_indexed_apart(index_file):
+    other = SimpleNamespace(meta=SimpleNamespace(endpoint_url="http://minio:9000"))
+    with mock.patch.object(index.listing, "iter_pages", fake_pages({"": [["a"]]})):
+        index.refresh(CLIENT, "bucket", "", ttl=60)
+    with mock.patch.object(index.listing, "iter_pages", fake_pages({"": [["b"]]})):
+        assert index.refresh(other, "bucket", "", ttl=60) == 1
+
+    assert listed_keys(CLIENT, "bucket") == ["a"]
+    assert listed_keys(other, "bucket") == ["b"]
+
+
+def test_index_of_an_older_schema_is_dropped(index_file):
+    db = sqlite3.connect(index_file)
+    db.execute("CREATE TABLE objects (bucket TEXT, key TEXT)")
+    db.execute("INSERT INTO objects VALUES ('bucket', 'old')")
+    db.commit()
+    db.close()
+
+    with mock.patch.object(index.listing, "iter_pages", fake_pages({"": [["a"]]})):
+        index.refresh(CLIENT, "bucket", "", ttl=60)
+
+    assert listed_keys(CLIENT, "bucket") == ["a"]
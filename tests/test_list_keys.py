@@ -4,6 +4,7 @@ from unittest import mock
 
 from moto import mock_s3
 
+from s3_tool import listing
 from s3_tool.main import list_keys
 from s3_tool.choices.object_methods import ObjectMethods
 
@@ -22,6 +23,7 @@ def test_list_keys_limit0_key(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -41,6 +43,7 @@ def test_list_keys_limit0_no_key(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -61,6 +64,7 @@ def test_list_keys_limit0_size(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=ObjectMethods.size,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -82,6 +86,7 @@ def test_list_keys_limit0_last_modified(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=ObjectMethods.last_modified,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -104,6 +109,7 @@ def test_list_keys_limit0_owner(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=ObjectMethods.owner,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -127,6 +133,7 @@ def test_list_keys_limit0_acl(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=ObjectMethods.acl,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -152,6 +159,7 @@ def test_list_keys_limit0_http_prefix(mock_bucket, capsys, env_variables):
         max_keys=1,
         all=False,
         http_prefix=True,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -170,6 +178,8 @@ def test_list_keys_limit0_all(mock_bucket, capsys):
         max_keys=10,
         all=True,
         http_prefix=False,
+        shards=0,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -194,6 +204,8 @@ def test_list_keys_limit0_all_http_prefix(mock_bucket, capsys, env_variables):
         max_keys=1,
         all=True,
         http_prefix=True,
+        shards=0,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -216,6 +228,7 @@ def test_list_keys_limit1_http_prefix(mock_bucket, capsys, env_variables):
         max_keys=1,
         all=False,
         http_prefix=True,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -235,8 +248,95 @@ def test_list_keys_limit1(mock_bucket, capsys):
         max_keys=1,
         all=True,
         http_prefix=False,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
     captured = capsys.readouterr()
     assert captured.out == "source/empty.txt\n"
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_list_keys_all_sharded(mock_bucket, capsys):
+    mock_bucket.return_value = bucket_contents()
+
+    list_keys(
+        limit=0,
+        prefix="source/",
+        delimiter="",
+        max_keys=10,
+        all=True,
+        http_prefix=False,
+        shards=4,
+        index_ttl=0,
+    )
+
+    assert mock_bucket.called is True
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "delimiter/delimiter/empty2.txt\n"
+        "empty.txt\n"
+        "listkeys/empty.txt\n"
+        "source/empty.txt\n"
+        "source/empty2.txt\n"
+        "source/subdir/empty3.txt\n"
+        "source/subdir/empty4.txt\n"
+    )
+
+
+@mock_s3
+def test_discover_shards():
+    _, _, bucket_name, client = bucket_contents()
+
+    shards = listing.discover_shards(client, bucket_name, fan_out=3)
+    assert shards == [
+        listing.Shard("", "listkeys/"),
+        listing.Shard("listkeys/", "source/"),
+        listing.Shard("source/", None),
+    ]
+
+    # Subfolders are merged into fan_out ranges
+    shards = listing.discover_shards(client, bucket_name, fan_out=2)
+    assert shards == [listing.Shard("", "listkeys/"), listing.Shard("listkeys/", None)]
+
+
+@mock_s3
+def test_discover_shards_keeps_flat_levels_whole():
+    _, _, bucket_name, client = bucket_contents()
+
+    shards = listing.discover_shards(client, bucket_name, fan_out=8, max_direct_keys=0)
+    assert shards == [listing.Shard("", None)]
+
+
+@mock_s3
+def test_many_subfolders_are_listed_in_fan_out_ranges():
+    _, _, bucket_name, client = bucket_contents()
+    for i in range(40):
+        client.put_object(Bucket=bucket_name, Key=f"many/{i:02d}/a.txt", Body=b"")
+        client.put_object(Bucket=bucket_name, Key=f"many/{i:02d}/b.txt", Body=b"")
+    # A folder marker and an object sitting directly on the level
+    client.put_object(Bucket=bucket_name, Key="many/10/", Body=b"")
+    client.put_object(Bucket=bucket_name, Key="many/10.txt", Body=b"")
+
+    shards = listing.discover_shards(client, bucket_name, "many/", fan_out=4)
+    assert len(shards) == 4
+
+    expected = [
+        o["Key"]
+        for o in client.list_objects_v2(Bucket=bucket_name, Prefix="many/")["Contents"]
+    ]
+    listed = []
+    client.meta.events.register(
+        "before-call.s3.ListObjectsV2", lambda **kwargs: listed.append(1)
+    )
+    keys = [
+        obj["Key"]
+        for obj in listing.iter_sharded(
+            client, bucket_name, "many/", fan_out=4, page_size=1000
+        )
+    ]
+    assert keys == expected
+    assert len(keys) == 82
+    # One listing to discover the level and one per shard
+    assert len(listed) == 1 + 4
@@ -2,7 +2,9 @@ import os
 from datetime import datetime
 from unittest import mock
 
+import pytest
 from moto import mock_s3
+from typer import Exit
 
 from s3_tool.main import list_keys_v2
 from s3_tool.choices.object_methods import ObjectMethods
@@ -19,6 +21,7 @@ def test_list_keys_v2_key(mock_bucket, capsys):
         delimiter="",
         max_keys=1,
         http_prefix=False,
+        limit=1,
         key_methods=ObjectMethods.key,
     )
 
@@ -36,6 +39,7 @@ def test_list_keys_v2_no_key(mock_bucket, capsys):
         delimiter="",
         max_keys=1,
         http_prefix=False,
+        limit=1,
         key_methods=ObjectMethods.key,
     )
 
@@ -44,6 +48,27 @@ def test_list_keys_v2_no_key(mock_bucket, capsys):
     assert captured.out == "No key was found!\n"
 
 
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_list_keys_v2_error_before_any_key(mock_bucket, capsys):
+    contents, s3, _, client = bucket_contents()
+    mock_bucket.return_value = contents, s3, "missing_bucket", client
+    with pytest.raises(Exit) as exited:
+        list_keys_v2(
+            prefix="source/",
+            delimiter="",
+            max_keys=1,
+            http_prefix=False,
+            limit=0,
+            key_methods=ObjectMethods.key,
+        )
+
+    assert exited.value.exit_code == 1
+    captured = capsys.readouterr()
+    assert "No key was found!" not in captured.out
+    assert "NoSuchBucket" in captured.err
+
+
 @mock.patch("s3_tool.main.get_login")
 @mock_s3
 def test_list_keys_v2_size(mock_bucket, capsys):
@@ -53,6 +78,7 @@ def test_list_keys_v2_size(mock_bucket, capsys):
         delimiter="",
         max_keys=1,
         http_prefix=False,
+        limit=1,
         key_methods=ObjectMethods.size,
     )
 
@@ -70,6 +96,7 @@ def test_list_keys_v2_last_modified(mock_bucket, capsys):
         delimiter="",
         max_keys=1,
         http_prefix=False,
+        limit=1,
         key_methods=ObjectMethods.last_modified,
     )
 
@@ -89,6 +116,7 @@ def test_list_keys_v2_http_prefix(mock_bucket, capsys, env_variables):
         delimiter="",
         max_keys=1,
         http_prefix=True,
+        limit=1,
         key_methods=ObjectMethods.key,
     )
     assert mock_bucket.called is True
@@ -105,6 +133,7 @@ def test_list_keys_v2_owner(mock_bucket, capsys):
         delimiter="",
         max_keys=1,
         http_prefix=False,
+        limit=1,
         key_methods=ObjectMethods.owner,
     )
 
@@ -125,9 +154,51 @@ def test_list_keys_v2_delimiter(mock_bucket, capsys):
         delimiter="/",
         max_keys=1,
         http_prefix=False,
+        limit=1,
         key_methods=ObjectMethods.key,
     )
 
     assert mock_bucket.called is True
     captured = capsys.readouterr()
     assert captured.out == "delimiter/delimiter/\n"
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_list_keys_v2_follows_continuation_tokens(mock_bucket, capsys):
+    mock_bucket.return_value = bucket_contents()
+    list_keys_v2(
+        prefix="source/",
+        delimiter="",
+        max_keys=1,
+        http_prefix=False,
+        limit=0,
+        key_methods=ObjectMethods.key,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "source/empty.txt\n"
+        "source/empty2.txt\n"
+        "source/subdir/empty3.txt\n"
+        "source/subdir/empty4.txt\n"
+    )
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_list_keys_v2_limit_across_pages(mock_bucket, capsys):
+    mock_bucket.return_value = bucket_contents()
+    list_keys_v2(
+        prefix="source/",
+        delimiter="",
+        max_keys=1,
+        http_prefix=False,
+        limit=3,
+        key_methods=ObjectMethods.key,
+    )
+
+    captured = capsys.readouterr()
+    assert captured.out == (
+        "source/empty.txt\nsource/empty2.txt\nsource/subdir/empty3.txt\n"
+    )
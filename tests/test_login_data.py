@@ -1,10 +1,12 @@
 import os
+from unittest import mock
 
 import boto3
 import pytest
 from moto import mock_s3
 
-from s3_tool.main import bucket
+from s3_tool import main
+from s3_tool.main import bucket, get_login
 
 
 @pytest.fixture
@@ -27,6 +29,41 @@ def test_bucket():
     assert bucket_name == "bucket_name"
 
 
+@pytest.fixture
+def clear_login():
+    main._login.clear()
+    yield
+    main._login.clear()
+
+
+@mock.patch("s3_tool.main.bucket", return_value="testing_bucket")
+def test_get_login_is_cached(mock_bucket, clear_login):
+    first = get_login("https://s3.endpoint.com", "access_key", "secret")
+    second = get_login()
+
+    assert first is second
+    assert mock_bucket.call_count == 1
+    contents, s3, bucket_name, client = first
+    assert client is s3.meta.client
+    assert contents.name == bucket_name == "testing_bucket"
+
+
+@mock.patch("s3_tool.main.bucket", return_value="testing_bucket")
+def test_get_login_grows_connection_pool(mock_bucket, clear_login):
+    _, _, _, client = get_login(
+        "https://s3.endpoint.com", "access_key", "secret", max_pool_connections=5
+    )
+    assert client.meta.config.max_pool_connections == 5
+
+    # A smaller or unspecified pool reuses the cached connection
+    assert get_login(max_pool_connections=2)[3] is client
+
+    _, _, _, bigger_client = get_login(max_pool_connections=50)
+    assert bigger_client is not client
+    assert bigger_client.meta.config.max_pool_connections == 50
+    assert mock_bucket.call_count == 1
+
+
 # To use for the client upload_file method
 def empty_file(tmp_path):
     d = tmp_path / "sub"
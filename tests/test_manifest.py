@@ -0,0 +1,101 @@
+import io
+
+import pytest
+
+from s3_tool import manifest
+
+
+@pytest.mark.parametrize("fmt", ["commas", "lines", "nul"])
+def test_write_and_read_back(tmp_path, fmt):
+    paths = [str(tmp_path / f"file {i}.txt") for i in range(5)]
+    out = tmp_path / "upload.txt"
+
+    with open(out, "w") as f:
+        assert manifest.write(f, iter(paths), fmt) == 5
+
+    assert [entry.path for entry in manifest.read(str(out))] == paths
+
+
+@pytest.mark.parametrize("fmt", ["lines", "nul"])
+def test_paths_with_commas_and_tabs(tmp_path, fmt):
+    paths = [str(tmp_path / "a, b.txt"), str(tmp_path / "c\td.txt")]
+    for path in paths:
+        open(path, "w").write("12345")
+    out = tmp_path / "upload.txt"
+
+    with open(out, "w") as f:
+        manifest.write(f, paths, fmt, details=True)
+
+    entries = list(manifest.read(str(out)))
+    assert [entry.path for entry in entries] == paths
+    assert [entry.size for entry in entries] == [5, 5]
+    assert all(entry.mtime for entry in entries)
+
+
+def test_commas_manifests_can_not_have_details():
+    with pytest.raises(ValueError):
+        manifest.write(io.StringIO(), ["a"], "commas", details=True)
+
+
+def test_read_is_lazy(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, "READ_SIZE", 16)
+    out = tmp_path / "upload.txt"
+    out.write_text("".join(f"/some/long/path/{i}.txt\n" for i in range(1000)))
+
+    entries = manifest.read(str(out))
+    assert next(entries).path == "/some/long/path/0.txt"
+    assert sum(1 for _ in entries) == 999
+
+
+def test_read_commas_strips_whitespace(tmp_path):
+    out = tmp_path / "upload.txt"
+    out.write_text(" /a.txt, /b.txt ,/c.txt ")
+
+    assert [entry.path for entry in manifest.read(str(out))] == [
+        "/a.txt",
+        "/b.txt",
+        "/c.txt",
+    ]
+
+
+@pytest.mark.parametrize("ending", ["\n", "\r\n", "\n\n"])
+def test_read_commas_ending_with_a_new_line(tmp_path, ending):
+    out = tmp_path / "upload.txt"
+    out.write_bytes(f"/a.txt,/b.txt,/c.txt{ending}".encode())
+
+    assert [entry.path for entry in manifest.read(str(out))] == [
+        "/a.txt",
+        "/b.txt",
+        "/c.txt",
+    ]
+
+
+def test_read_lines_with_a_single_path(tmp_path):
+    out = tmp_path / "upload.txt"
+    out.write_text("/a.txt\n")
+
+    assert [entry.path for entry in manifest.read(str(out))] == ["/a.txt"]
+
+
+@pytest.mark.parametrize("fmt", ["lines", "nul"])
+def test_single_path_with_a_comma(tmp_path, fmt):
+    out = tmp_path / "upload.txt"
+
+    with open(out, "w", newline="") as f:
+        manifest.write(f, ["/data/a,b.mp4"], fmt)
+
+    assert out.read_text().startswith(manifest.FORMAT_HEADER)
+    assert [entry.path for entry in manifest.read(str(out))] == ["/data/a,b.mp4"]
+
+
+def test_format_given_for_a_list_without_header(tmp_path):
+    out = tmp_path / "upload.txt"
+    out.write_text("/data/a,b.mp4\n")
+
+    assert [entry.path for entry in manifest.read(str(out), "lines")] == [
+        "/data/a,b.mp4"
+    ]
+    assert [entry.path for entry in manifest.read(str(out))] == [
+        "/data/a",
+        "b.mp4",
+    ]
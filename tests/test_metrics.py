@@ -0,0 +1,112 @@
+import io
+import json
+
+import pytest
+from botocore.awsrequest import AWSResponse
+from moto import mock_s3
+
+from s3_tool import metrics
+
+from .test_login_data import bucket_contents
+from .test_throttling import SLOW_DOWN, RawBody
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "metrics.json"
+    metrics.reset()
+    yield path
+    metrics.reset()
+
+
+@mock_s3
+def test_requests_are_counted_per_operation(recording):
+    _, _, bucket_name, client = bucket_contents()
+    metrics.attach(client)
+
+    client.put_object(Bucket=bucket_name, Key="metrics.txt", Body=b"x" * 1000)
+    client.get_object(Bucket=bucket_name, Key="metrics.txt")["Body"].read()
+    client.head_object(Bucket=bucket_name, Key="metrics.txt")
+    with pytest.raises(client.exceptions.ClientError):
+        client.head_object(Bucket=bucket_name, Key="missing.txt")
+
+    metrics.write(str(recording), "json", "upload")
+    written = json.loads(recording.read_text())
+    assert written["command"] == "upload"
+    operations = written["operations"]
+    assert set(operations) == {"PutObject", "GetObject", "HeadObject"}
+    assert operations["PutObject"]["requests"] == 1
+    assert operations["PutObject"]["bytes_sent"] == 1000
+    assert operations["GetObject"]["bytes_received"] == 1000
+    # HEAD responses have a Content-Length but no body
+    assert operations["HeadObject"]["bytes_received"] == 0
+    client.list_objects_v2(Bucket=bucket_name)
+    assert metrics.operations()["ListObjectsV2"].bytes_received > 0
+    assert operations["HeadObject"]["requests"] == 2
+    assert operations["HeadObject"]["errors"] == 1
+    latency = operations["PutObject"]["latency_seconds"]
+    assert 0 < latency["p50"] <= latency["max"]
+    assert sum(operations["HeadObject"]["histogram"].values()) == 2
+
+
+@mock_s3
+def test_retries_are_counted(recording):
+    _, _, bucket_name, client = bucket_contents()
+    metrics.attach(client)
+    calls = []
+
+    def slow_down_once(request, **kwargs):
+        calls.append(request.url)
+        if len(calls) == 1:
+            return AWSResponse(request.url, 503, {}, RawBody(SLOW_DOWN))
+        return None
+
+    client.meta.events.register_first("before-send.s3", slow_down_once)
+    client.head_object(Bucket=bucket_name, Key="empty.txt")
+
+    operation = metrics.operations()["HeadObject"]
+    assert operation.requests == 1
+    assert operation.retries == 1
+    assert operation.errors == 0
+
+
+def test_nothing_is_written_without_a_path():
+    metrics._operations["GetObject"] = metrics.Operation()
+    out = io.StringIO()
+    try:
+        metrics.write(None, out=out)
+    finally:
+        metrics.reset()
+    assert out.getvalue() == ""
+
+
+def test_percentiles_from_histogram():
+    operation = metrics.Operation()
+    for _ in range(98):
+        operation.record(0.010, 0, 0, 0, False)
+    operation.record(1.0, 0, 0, 0, False)
+    operation.record(2.0, 0, 0, 0, False)
+
+    assert operation.percentile(0.5) == pytest.approx(0.010, rel=0.2)
+    assert operation.percentile(0.99) == pytest.approx(1.0, rel=0.2)
+    assert operation.percentile(1.0) == 2.0
+
+
+def test_prometheus_output(recording):
+    operation = metrics.Operation()
+    operation.record(0.02, 0, 512, 1, False)
+    operation.record(0.5, 0, 512, 0, True)
+    metrics._operations["GetObject"] = operation
+
+    metrics.write(str(recording), "prometheus", "download")
+    lines = recording.read_text().splitlines()
+    labels = 'command="download",operation="GetObject"'
+    assert f"s3_tool_requests_total{{{labels}}} 2" in lines
+    assert f"s3_tool_request_errors_total{{{labels}}} 1" in lines
+    assert f"s3_tool_retries_total{{{labels}}} 1" in lines
+    assert f"s3_tool_received_bytes_total{{{labels}}} 1024" in lines
+    assert f's3_tool_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f"s3_tool_request_duration_seconds_count{{{labels}}} 2" in lines
+    buckets = [line for line in lines if "_bucket{" in line]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
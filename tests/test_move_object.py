@@ -1,10 +1,13 @@
+import os
 from unittest import mock
 
 import pytest
 from moto import mock_s3
 
+from s3_tool import moving
 from s3_tool.choices import access_types, object_methods
 from s3_tool.main import list_keys, list_keys_v2, move_object
+from s3_tool.transfer_config import MB, TransferSettings
 
 from .test_login_data import bucket_contents
 
@@ -20,6 +23,11 @@ def test_move_one_object(mock_bucket, capsys):
         rename=None,
         permission=access_types.ACLTypes.public_read,
         threads=1,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
     )
 
     list_keys(
@@ -30,6 +38,7 @@ def test_move_one_object(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -50,6 +59,11 @@ def test_move_one_object_empty_destination(mock_bucket):
             rename=None,
             permission=access_types.ACLTypes.public_read,
             threads=1,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            prefix=None,
         )
 
 
@@ -64,6 +78,11 @@ def test_move_one_object_in_root(mock_bucket, capsys):
         rename=None,
         permission=access_types.ACLTypes.public_read,
         threads=1,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
     )
 
     list_keys(
@@ -74,6 +93,7 @@ def test_move_one_object_in_root(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -95,6 +115,11 @@ def test_fail_move_non_existing_object(mock_bucket):
             rename=None,
             permission=access_types.ACLTypes.public_read,
             threads=1,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            prefix=None,
         )
 
         assert mock_bucket.called is True
@@ -111,6 +136,11 @@ def test_move_two_objects(mock_bucket, capsys):
         rename=None,
         permission=access_types.ACLTypes.public_read,
         threads=2,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
     )
 
     list_keys(
@@ -121,6 +151,7 @@ def test_move_two_objects(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -140,6 +171,11 @@ def test_fail_on_destination_path_with_delimiter(mock_bucket, capsys):
             destination_path="source2/",
             permission=access_types.ACLTypes.public_read,
             threads=1,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            prefix=None,
         )
 
         assert mock_bucket.called is True
@@ -159,6 +195,11 @@ def test_delete_origin_object(mock_bucket, capsys):
         rename=None,
         permission=access_types.ACLTypes.public_read,
         threads=1,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
     )
 
     list_keys_v2(
@@ -166,6 +207,7 @@ def test_delete_origin_object(mock_bucket, capsys):
         delimiter="",
         max_keys=1,
         http_prefix=False,
+        limit=0,
         key_methods=object_methods.ObjectMethods.key,
     )
 
@@ -185,6 +227,11 @@ def test_move_and_rename_one_object(mock_bucket, capsys):
         rename="new_empty.txt",
         threads=1,
         permission=access_types.ACLTypes.public_read,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
     )
 
     list_keys(
@@ -195,6 +242,7 @@ def test_move_and_rename_one_object(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -213,6 +261,11 @@ def test_move_and_rename_one_object_many_sublevels(mock_bucket, capsys):
         rename="new_empty.txt",
         threads=1,
         permission=access_types.ACLTypes.public_read,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
     )
 
     list_keys(
@@ -223,6 +276,7 @@ def test_move_and_rename_one_object_many_sublevels(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -241,6 +295,11 @@ def test_move_and_rename_object_in_root(mock_bucket, capsys):
         rename="new_empty.txt",
         threads=1,
         permission=access_types.ACLTypes.public_read,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        prefix=None,
     )
 
     list_keys(
@@ -251,6 +310,7 @@ def test_move_and_rename_object_in_root(mock_bucket, capsys):
         all=False,
         http_prefix=False,
         key_methods=object_methods.ObjectMethods.key,
+        index_ttl=0,
     )
 
     assert mock_bucket.called is True
@@ -271,4 +331,165 @@ def test_move_and_rename_more_than_one_object(mock_bucket):
             rename="new_empty.txt",
             threads=1,
             permission=access_types.ACLTypes.public_read,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            prefix=None,
         )
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_move_copies_server_side(mock_bucket):
+    mock_bucket.return_value = bucket_contents()
+    contents, _, _, client = mock_bucket.return_value
+
+    with mock.patch.object(
+        client, "get_object", side_effect=AssertionError("Body downloaded")
+    ), mock.patch.object(
+        client, "delete_objects", wraps=client.delete_objects
+    ) as delete_objects:
+        move_object(
+            origin_files=["source/empty.txt", "source/empty2.txt"],
+            destination_path="source2",
+            rename=None,
+            permission=access_types.ACLTypes.public_read,
+            threads=2,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            prefix=None,
+        )
+
+    assert delete_objects.call_count == 1
+    assert sorted(o.key for o in contents.objects.filter(Prefix="source2/")) == [
+        "source2/empty.txt",
+        "source2/empty2.txt",
+    ]
+    assert "source/empty.txt" not in [o.key for o in contents.objects.all()]
+
+
+@mock_s3
+def test_multipart_copy_keeps_metadata(monkeypatch):
+    # Newer botocore sends bodies aws-chunked with a checksum trailer, which
+    # moto counts as part of the body
+    monkeypatch.setenv("AWS_REQUEST_CHECKSUM_CALCULATION", "when_required")
+    contents, _, bucket_name, client = bucket_contents()
+    body = os.urandom(12 * MB)
+    contents.put_object(
+        Key="videos/video.mp4",
+        Body=body,
+        ContentType="video/mp4",
+        Metadata={"origin": "camera"},
+    )
+    settings = TransferSettings(chunk_size="5MB", multipart_threshold="5MB")
+
+    with mock.patch.object(
+        client, "upload_part_copy", wraps=client.upload_part_copy
+    ) as upload_part_copy:
+        results = list(
+            moving.move_objects(
+                client,
+                bucket_name,
+                [("videos/video.mp4", "archive/video.mp4", None)],
+                "private",
+                settings,
+            )
+        )
+
+    assert results == [("videos/video.mp4", None)]
+    assert upload_part_copy.call_count == 3
+    moved = contents.Object("archive/video.mp4").get()
+    assert moved["Body"].read() == body
+    assert moved["ContentType"] == "video/mp4"
+    assert moved["Metadata"] == {"origin": "camera"}
+
+
+@mock_s3
+def test_move_onto_itself_keeps_the_object():
+    contents, _, bucket_name, client = bucket_contents()
+
+    [(key, error)] = moving.move_objects(
+        client, bucket_name, [("empty.txt", "empty.txt", None)], "private"
+    )
+
+    assert isinstance(error, ValueError)
+    assert contents.Object("empty.txt").content_length is not None
+
+
+def move_prefix(prefix, destination_path, threads=2):
+    move_object(
+        origin_files=None,
+        destination_path=destination_path,
+        rename=None,
+        prefix=prefix,
+        permission=access_types.ACLTypes.public_read,
+        threads=threads,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+    )
+
+
+@pytest.fixture
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("S3_TOOL_JOURNAL_DIR", str(tmp_path))
+    return tmp_path
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_move_prefix(mock_bucket, journal_dir):
+    mock_bucket.return_value = bucket_contents()
+    contents = mock_bucket.return_value[0]
+
+    move_prefix("source/", "moved/")
+
+    assert sorted(o.key for o in contents.objects.all() if "empty" in o.key) == [
+        "delimiter/delimiter/empty2.txt",
+        "empty.txt",
+        "listkeys/empty.txt",
+        "moved/empty.txt",
+        "moved/empty2.txt",
+        "moved/subdir/empty3.txt",
+        "moved/subdir/empty4.txt",
+    ]
+    assert list(journal_dir.iterdir()) == []
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_interrupted_prefix_move_does_not_copy_twice(mock_bucket, journal_dir):
+    mock_bucket.return_value = bucket_contents()
+    contents, _, _, client = mock_bucket.return_value
+
+    with mock.patch.object(
+        client, "delete_objects", side_effect=ConnectionError("Connection lost")
+    ), pytest.raises(Exception):
+        move_prefix("source/", "moved/")
+
+    assert len(list(journal_dir.iterdir())) == 1
+
+    with mock.patch.object(client, "copy_object", wraps=client.copy_object) as spy:
+        move_prefix("source/", "moved/")
+
+    assert spy.call_count == 0
+    assert list(contents.objects.filter(Prefix="source/")) == []
+    assert len(list(contents.objects.filter(Prefix="moved/"))) == 4
+    assert list(journal_dir.iterdir()) == []
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_move_prefix_into_itself(mock_bucket, capsys):
+    mock_bucket.return_value = bucket_contents()
+
+    with pytest.raises(Exception):
+        move_prefix("source/", "source/subdir")
+
+    assert capsys.readouterr().out == (
+        "Origin and destination prefixes can not contain each other\n"
+    )
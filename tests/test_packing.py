@@ -0,0 +1,231 @@
+import io
+import json
+import tarfile
+import zipfile
+from unittest import mock
+
+import boto3
+import pytest
+from moto import mock_s3
+from typer import Exit
+
+from s3_tool import packing
+from s3_tool.main import download, upload
+
+from .test_login_data import bucket_contents
+
+
+def create_files(tmp_path, sizes):
+    root = tmp_path / "small"
+    files = []
+    for i, size in enumerate(sizes):
+        path = root / f"dir{i % 2}" / f"file{i}.bin"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(bytes([i % 256]) * size)
+        files.append((str(path), f"dir{i % 2}/file{i}.bin"))
+    return files
+
+
+@pytest.mark.parametrize("fmt", ["tar", "zip"])
+def test_offsets_point_to_member_data(tmp_path, fmt):
+    files = create_files(tmp_path, [0, 1, 511, 512, 513, 3000])
+
+    (archive,) = list(packing.pack(files, fmt, pack_size=1024 * 1024))
+
+    for path, name in files:
+        offset, size = archive.members[name]
+        with open(path, "rb") as f:
+            assert archive.body[offset : offset + size] == f.read()
+
+    # Archives are regular archives as well
+    if fmt == "tar":
+        with tarfile.open(fileobj=io.BytesIO(archive.body)) as tar:
+            assert sorted(tar.getnames()) == sorted(name for _, name in files)
+    else:
+        with zipfile.ZipFile(io.BytesIO(archive.body)) as zf:
+            assert sorted(zf.namelist()) == sorted(name for _, name in files)
+
+
+def test_pack_splits_archives_and_skips_big_files(tmp_path):
+    files = create_files(tmp_path, [600, 600, 600, 5000])
+
+    packed = list(packing.pack(files, "tar", pack_size=3000, max_member_size=4000))
+
+    archives = [item for item in packed if isinstance(item, packing.Archive)]
+    singles = [item for item in packed if isinstance(item, packing.Single)]
+    assert [archive.number for archive in archives] == [0, 1]
+    assert sum(len(archive.members) for archive in archives) == 3
+    assert singles == [packing.Single(*files[3])]
+
+
+def test_unknown_pack_format():
+    with pytest.raises(ValueError):
+        list(packing.pack([], "rar"))
+
+
+def test_pack_rejects_a_member_name_given_twice(tmp_path):
+    files = create_files(tmp_path, [10, 20])
+    same_name = [(path, "file.bin") for path, _ in files]
+
+    with pytest.raises(ValueError, match="file.bin"):
+        list(packing.pack(same_name))
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_and_download_packed(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    files = create_files(tmp_path, [10, 20, 30, 40])
+
+    upload(
+        files=None,
+        upload_from_file=None,
+        manifest_format=None,
+        upload_path="packed",
+        permissions="public-read",
+        threads=2,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        directory=str(tmp_path / "small"),
+        include=None,
+        exclude=None,
+        pack="tar",
+        pack_size="64MB",
+        skip_identical=False,
+    )
+
+    client = boto3.client("s3")
+    keys = [
+        obj["Key"]
+        for obj in client.list_objects_v2(Bucket="testing_bucket", Prefix="packed/")[
+            "Contents"
+        ]
+    ]
+    assert len(keys) == 2
+    archive_key = next(key for key in keys if key.endswith(".tar"))
+    assert f"{archive_key}{packing.INDEX_SUFFIX}" in keys
+
+    index = json.loads(
+        client.get_object(
+            Bucket="testing_bucket", Key=f"{archive_key}{packing.INDEX_SUFFIX}"
+        )["Body"].read()
+    )
+    assert sorted(index["members"]) == sorted(name for _, name in files)
+
+    dest = tmp_path / "out"
+    download(
+        download_path=str(dest),
+        files=["dir1/file3.bin", "dir0/file0.bin"],
+        recursive=None,
+        threads=2,
+        pack=archive_key,
+        skip_existing=None,
+    )
+
+    assert (dest / "dir1" / "file3.bin").read_bytes() == bytes([3]) * 40
+    assert (dest / "dir0" / "file0.bin").read_bytes() == bytes([0]) * 10
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_download_missing_member(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    client = boto3.client("s3")
+    client.put_object(
+        Bucket="testing_bucket",
+        Key="packed/pack.tar.index.json",
+        Body=packing.index_body("packed/pack.tar", "tar", {"../escape": (0, 1)}),
+    )
+
+    with pytest.raises(Exit):
+        download(
+            download_path=str(tmp_path),
+            files=["missing", "../escape"],
+            recursive=None,
+            threads=1,
+            pack="packed/pack.tar",
+            skip_existing=None,
+        )
+
+    captured = capsys.readouterr()
+    assert "Member not found in pack! -> missing" in captured.err
+    assert "Member outside of the download path! -> ../escape" in captured.err
+
+
+def same_name_files(tmp_path):
+    paths = []
+    for folder in ["a", "b"]:
+        path = tmp_path / folder / "video.mp4"
+        path.parent.mkdir()
+        path.write_bytes(b"x")
+        paths.append(str(path))
+    return paths
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_packed_files_with_the_same_name(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    paths = same_name_files(tmp_path)
+
+    with pytest.raises(Exit):
+        upload(
+            files=paths,
+            upload_from_file=None,
+            manifest_format=None,
+            upload_path="packed",
+            permissions="public-read",
+            threads=2,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            directory=None,
+            include=None,
+            exclude=None,
+            pack="tar",
+            pack_size="64MB",
+            skip_identical=False,
+        )
+
+    assert "can not be packed: video.mp4" in capsys.readouterr().out
+    listed = boto3.client("s3").list_objects_v2(
+        Bucket="testing_bucket", Prefix="packed/"
+    )
+    assert "Contents" not in listed
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_packed_manifest_with_the_same_name(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    paths = same_name_files(tmp_path)
+    listed = tmp_path / "upload.txt"
+    listed.write_text("\n".join(paths))
+
+    with pytest.raises(Exit):
+        upload(
+            files=None,
+            upload_from_file=str(listed),
+            manifest_format=None,
+            upload_path="packed",
+            permissions="public-read",
+            threads=2,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            directory=None,
+            include=None,
+            exclude=None,
+            pack="tar",
+            pack_size="64MB",
+            skip_identical=False,
+        )
+
+    assert "Two files would be packed as video.mp4" in capsys.readouterr().err
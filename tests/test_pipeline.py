@@ -0,0 +1,55 @@
+import itertools
+
+import pytest
+
+from s3_tool import pipeline
+
+
+def test_stream_yields_every_result():
+    results = list(pipeline.stream(lambda x: x * 2, range(100), threads=4))
+
+    assert sorted(result for _, result, _ in results) == list(range(0, 200, 2))
+    assert all(error is None for _, _, error in results)
+
+
+def test_stream_reports_errors_per_item():
+    def func(x):
+        if x == 3:
+            raise ValueError("three")
+        return x
+
+    failed = [
+        (item, str(error))
+        for item, _, error in pipeline.stream(func, range(5), threads=2)
+        if error
+    ]
+
+    assert failed == [(3, "three")]
+
+
+def test_stream_only_reads_ahead_up_to_the_queue_size():
+    pulled = itertools.count()
+
+    def items():
+        for n in itertools.count():
+            next(pulled)
+            yield n
+
+    results = pipeline.stream(lambda x: x, items(), threads=2, max_queued=10)
+    for _ in zip(range(50), results):
+        pass
+    results.close()
+
+    # Finished items, the two queues and one item per worker at most
+    assert next(pulled) <= 50 + 10 + 10 + 2 + 2
+
+
+def test_stream_raises_listing_errors():
+    def items():
+        yield 1
+        raise ConnectionError("Connection lost")
+
+    results = pipeline.stream(lambda x: x, items(), threads=2)
+
+    with pytest.raises(ConnectionError):
+        list(results)
@@ -0,0 +1,76 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from s3_tool import progress
+from s3_tool.options import Options
+
+
+def test_counts_from_many_threads_add_up():
+    out = io.StringIO()
+    tracker = progress.Progress(
+        "upload", total_bytes=800, total_objects=8, mode="json", stream=out
+    )
+    tracker.totals_known()
+
+    def transfer(_):
+        callback = tracker.callback()
+        for _ in range(10):
+            callback(10)
+        tracker.object_done()
+
+    with tracker:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(transfer, range(8)))
+
+    final = json.loads(out.getvalue().splitlines()[-1])
+    assert final["done"] is True
+    assert final["bytes"] == 800
+    assert final["objects"] == 8
+    assert final["total_objects"] == 8
+    assert final["eta_seconds"] == 0
+
+
+def test_totals_found_along_the_way():
+    tracker = progress.Progress("download", mode="none")
+    tracker.expect(100)
+    tracker.expect(50)
+    # Skipped, taken out again
+    tracker.expect(-50, -1)
+    tracker.add_bytes(25)
+
+    assert tracker.snapshot()["eta_seconds"] is None
+    assert tracker.summary().startswith("download: 25.0 B/? | 0/1+ objects")
+
+    tracker.totals_known()
+    assert tracker.snapshot()["total_bytes"] == 100
+    assert "/100.0 B | 0/1 objects" in tracker.summary()
+
+
+def test_summary_lines_when_not_on_a_terminal():
+    out = io.StringIO()
+    tracker = progress.Progress("move", total_objects=2, mode="auto", stream=out)
+    with tracker:
+        tracker.object_done()
+        tracker.object_failed()
+
+    assert out.getvalue().splitlines()[-1].startswith("move: 0.0 B/? | 1/2+ objects")
+    assert "1 failed" in out.getvalue()
+
+
+def test_silent_outside_of_a_command():
+    tracker = progress.silent()
+    tracker.add_bytes(10)
+
+    assert tracker.mode == "none"
+
+
+def test_tracker_follows_the_options():
+    tracker = Options(progress_mode="json", progress_interval=0).tracker("upload")
+
+    assert tracker.mode == "json"
+    assert tracker.interval == 0.1
+    with pytest.raises(ValueError):
+        Options(progress_mode="fancy").tracker("upload")
@@ -0,0 +1,150 @@
+import os
+from unittest import mock
+
+import pytest
+from boto3.s3.transfer import TransferConfig
+from moto import mock_s3
+
+from s3_tool import hashing, ranged
+from s3_tool.main import download
+from s3_tool.transfer_config import MB
+
+from .test_login_data import bucket_contents
+
+
+@pytest.fixture
+def no_flexible_checksums(monkeypatch):
+    # Newer botocore sends bodies aws-chunked with a checksum trailer, which
+    # moto counts as part of the body
+    monkeypatch.setenv("AWS_REQUEST_CHECKSUM_CALCULATION", "when_required")
+
+
+def big_object(contents, key="videos/video.mp4", size=12 * MB):
+    body = os.urandom(size)
+    contents.put_object(Key=key, Body=body)
+    return body, contents.Object(key).e_tag
+
+
+def fail_on_range(client, start):
+    get_object = client.get_object
+
+    def side_effect(**kwargs):
+        if kwargs["Range"].startswith(f"bytes={start}-"):
+            raise ConnectionError("Connection lost")
+        return get_object(**kwargs)
+
+    return mock.patch.object(client, "get_object", side_effect=side_effect)
+
+
+@mock_s3
+def test_resume_interrupted_download(tmp_path, no_flexible_checksums):
+    contents, _, bucket_name, client = bucket_contents()
+    body, etag = big_object(contents)
+    dest = str(tmp_path / "video.mp4")
+    args = (client, bucket_name, "videos/video.mp4", dest, len(body), etag, 5 * MB, 1)
+
+    with fail_on_range(client, 5 * MB), pytest.raises(ConnectionError):
+        ranged.download_file(*args)
+
+    assert not os.path.exists(dest)
+    assert os.path.getsize(dest + ranged.PARTIAL_SUFFIX) == len(body)
+
+    with mock.patch.object(client, "get_object", wraps=client.get_object) as spy:
+        ranged.download_file(*args)
+
+    fetched = [call.kwargs["Range"] for call in spy.call_args_list]
+    assert f"bytes=0-{5 * MB - 1}" not in fetched
+    assert f"bytes={5 * MB}-{10 * MB - 1}" in fetched
+
+    assert open(dest, "rb").read() == body
+    assert not os.path.exists(dest + ranged.PARTIAL_SUFFIX)
+    assert not os.path.exists(dest + ranged.SIDECAR_SUFFIX)
+
+
+@mock_s3
+def test_changed_object_starts_over(tmp_path, no_flexible_checksums):
+    contents, _, bucket_name, client = bucket_contents()
+    body, etag = big_object(contents)
+    dest = str(tmp_path / "video.mp4")
+
+    with fail_on_range(client, 5 * MB), pytest.raises(ConnectionError):
+        ranged.download_file(
+            client, bucket_name, "videos/video.mp4", dest, len(body), etag, 5 * MB, 1
+        )
+
+    body, etag = big_object(contents, size=11 * MB)
+
+    with mock.patch.object(client, "get_object", wraps=client.get_object) as spy:
+        ranged.download_file(
+            client, bucket_name, "videos/video.mp4", dest, len(body), etag, 5 * MB, 1
+        )
+
+    assert spy.call_count == 3
+    assert open(dest, "rb").read() == body
+
+
+@mock_s3
+def test_corrupted_download_fails_checksum(tmp_path, no_flexible_checksums):
+    contents, _, bucket_name, client = bucket_contents()
+    body, etag = big_object(contents)
+    dest = str(tmp_path / "video.mp4")
+    args = (client, bucket_name, "videos/video.mp4", dest, len(body), etag, 5 * MB, 1)
+
+    with fail_on_range(client, 5 * MB), pytest.raises(ConnectionError):
+        ranged.download_file(*args)
+
+    with open(dest + ranged.PARTIAL_SUFFIX, "r+b") as f:
+        f.write(b"corrupted")
+
+    with pytest.raises(ranged.ChecksumMismatch):
+        ranged.download_file(*args)
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ranged.PARTIAL_SUFFIX)
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_download_with_resume(mock_bucket, tmp_path, no_flexible_checksums):
+    mock_bucket.return_value = bucket_contents()
+    body, _ = big_object(mock_bucket.return_value[0])
+
+    download(
+        download_path=str(tmp_path),
+        files=["videos/video.mp4"],
+        recursive=None,
+        threads=1,
+        chunk_size="5MB",
+        max_concurrency=3,
+        multipart_threshold="5MB",
+        max_connections=64,
+        resume=True,
+        pack=None,
+        skip_existing=None,
+    )
+
+    assert open(tmp_path / "video.mp4", "rb").read() == body
+    assert sorted(os.listdir(tmp_path)) == ["video.mp4"]
+
+
+@mock_s3
+def test_multipart_etag_is_verified(tmp_path, no_flexible_checksums):
+    contents, _, bucket_name, client = bucket_contents()
+    source = tmp_path / "source.bin"
+    source.write_bytes(os.urandom(12 * MB))
+    contents.upload_file(
+        str(source),
+        "multipart.bin",
+        Config=TransferConfig(multipart_threshold=5 * MB, multipart_chunksize=5 * MB),
+    )
+    etag = contents.Object("multipart.bin").e_tag
+
+    part_size = hashing.object_part_size(client, bucket_name, "multipart.bin", etag)
+
+    assert etag.endswith('-3"')
+    assert part_size == 5 * MB
+    assert hashing.file_etag(str(source), 5 * MB) == etag
+    assert hashing.matches_etag(str(source), etag, part_size)
+
+    source.write_bytes(os.urandom(12 * MB))
+    assert not hashing.matches_etag(str(source), etag, part_size)
@@ -0,0 +1,156 @@
+import os
+from unittest import mock
+
+import pytest
+from moto import mock_s3
+
+from s3_tool import resumable
+from s3_tool.main import abort_uploads, upload
+from s3_tool.transfer_config import MB
+
+from .test_login_data import bucket_contents
+
+
+@pytest.fixture
+def journal_dir(tmp_path, monkeypatch):
+    d = tmp_path / "journal"
+    monkeypatch.setenv("S3_TOOL_JOURNAL_DIR", str(d))
+    # Newer botocore sends parts aws-chunked with a checksum trailer, which
+    # moto counts as part of the body
+    monkeypatch.setenv("AWS_REQUEST_CHECKSUM_CALCULATION", "when_required")
+    return d
+
+
+def big_file(tmp_path, size=12 * MB):
+    p = tmp_path / "video.mp4"
+    p.write_bytes(os.urandom(size))
+    return str(p)
+
+
+def fail_on_part(client, number):
+    upload_part = client.upload_part
+
+    def side_effect(**kwargs):
+        if kwargs["PartNumber"] == number:
+            raise ConnectionError("Connection lost")
+        return upload_part(**kwargs)
+
+    return mock.patch.object(client, "upload_part", side_effect=side_effect)
+
+
+@mock_s3
+def test_resume_interrupted_upload(tmp_path, journal_dir):
+    contents, _, bucket_name, client = bucket_contents()
+    file_path = big_file(tmp_path)
+    extra_args = {"ContentType": "video/mp4", "ACL": "private"}
+
+    with fail_on_part(client, 2), pytest.raises(ConnectionError):
+        resumable.upload_file(
+            client, bucket_name, file_path, "videos/video.mp4", extra_args, 5 * MB, 1
+        )
+
+    assert len(list(journal_dir.iterdir())) == 1
+
+    with mock.patch.object(client, "upload_part", wraps=client.upload_part) as spy:
+        resumable.upload_file(
+            client, bucket_name, file_path, "videos/video.mp4", extra_args, 5 * MB, 1
+        )
+
+    sent = sorted(call.kwargs["PartNumber"] for call in spy.call_args_list)
+    assert 1 not in sent
+    assert 2 in sent
+    assert list(journal_dir.iterdir()) == []
+
+    uploaded = contents.Object("videos/video.mp4").get()
+    assert uploaded["Body"].read() == open(file_path, "rb").read()
+    assert uploaded["ContentType"] == "video/mp4"
+
+
+@mock_s3
+def test_part_size_keeps_to_max_parts(tmp_path, journal_dir, monkeypatch):
+    monkeypatch.setattr(resumable, "MAX_PARTS", 2)
+    contents, _, bucket_name, client = bucket_contents()
+    file_path = big_file(tmp_path)
+
+    with mock.patch.object(client, "upload_part", wraps=client.upload_part) as spy:
+        resumable.upload_file(
+            client, bucket_name, file_path, "videos/video.mp4", {}, 5 * MB, 2
+        )
+
+    sizes = sorted(len(call.kwargs["Body"]) for call in spy.call_args_list)
+    assert sizes == [6 * MB, 6 * MB]
+    uploaded = contents.Object("videos/video.mp4").get()
+    assert uploaded["Body"].read() == open(file_path, "rb").read()
+
+
+@mock_s3
+def test_changed_file_starts_over(tmp_path, journal_dir):
+    contents, _, bucket_name, client = bucket_contents()
+    file_path = big_file(tmp_path)
+
+    with fail_on_part(client, 2), pytest.raises(ConnectionError):
+        resumable.upload_file(
+            client, bucket_name, file_path, "video.mp4", {}, 5 * MB, 1
+        )
+
+    file_path = big_file(tmp_path, size=11 * MB)
+
+    with mock.patch.object(client, "upload_part", wraps=client.upload_part) as spy:
+        resumable.upload_file(
+            client, bucket_name, file_path, "video.mp4", {}, 5 * MB, 1
+        )
+
+    assert sorted(call.kwargs["PartNumber"] for call in spy.call_args_list) == [1, 2, 3]
+    assert contents.Object("video.mp4").content_length == 11 * MB
+    assert (
+        list(client.list_multipart_uploads(Bucket=bucket_name).get("Uploads", [])) == []
+    )
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_with_resume(mock_bucket, tmp_path, journal_dir):
+    mock_bucket.return_value = bucket_contents()
+    file_path = big_file(tmp_path)
+
+    upload(
+        files=[file_path],
+        upload_path="videos",
+        permissions="public-read",
+        threads=1,
+        chunk_size="5MB",
+        max_concurrency=2,
+        multipart_threshold="5MB",
+        max_connections=64,
+        resume=True,
+        directory=None,
+        pack=None,
+        skip_identical=False,
+    )
+
+    obj = mock_bucket.return_value[0].Object("videos/video.mp4")
+    assert obj.content_length == 12 * MB
+    assert obj.e_tag.endswith('-3"')
+    assert list(journal_dir.iterdir()) == []
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_abort_uploads(mock_bucket, capsys):
+    # moto reports every upload as initiated on 2010-11-10
+    mock_bucket.return_value = bucket_contents()
+    _, _, bucket_name, client = mock_bucket.return_value
+    client.create_multipart_upload(Bucket=bucket_name, Key="videos/stale.mp4")
+    client.create_multipart_upload(Bucket=bucket_name, Key="other/stale.mp4")
+
+    abort_uploads(prefix="videos/", older_than=0, dry_run=True)
+    assert capsys.readouterr().out.startswith("videos/stale.mp4 -> started ")
+
+    abort_uploads(prefix="videos/", older_than=0, dry_run=False)
+    assert capsys.readouterr().out == "Aborted upload: videos/stale.mp4\n"
+
+    uploads = client.list_multipart_uploads(Bucket=bucket_name)["Uploads"]
+    assert [u["Key"] for u in uploads] == ["other/stale.mp4"]
+
+    abort_uploads(prefix="", older_than=24 * 365 * 100, dry_run=False)
+    assert capsys.readouterr().out == "No incomplete uploads found!\n"
@@ -0,0 +1,117 @@
+import os
+from unittest import mock
+
+import pytest
+from moto import mock_s3
+
+from s3_tool import hashing
+from s3_tool.main import download
+
+from .test_login_data import bucket_contents
+
+
+@pytest.fixture(autouse=True)
+def hash_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("S3_TOOL_HASH_CACHE", str(tmp_path / "hashes.sqlite3"))
+
+
+@pytest.fixture
+def login():
+    with mock_s3(), mock.patch("s3_tool.main.get_login") as mock_bucket:
+        contents, s3, bucket_name, client = bucket_contents()
+        mock_bucket.return_value = contents, s3, bucket_name, client
+        operations = []
+        client.meta.events.register(
+            "before-call.s3", lambda model, **kwargs: operations.append(model.name)
+        )
+        yield operations
+
+
+def run_download(download_path, capsys, **kwargs):
+    options = dict(
+        download_path=str(download_path),
+        files=None,
+        recursive="source/",
+        threads=2,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        index_ttl=0,
+        pack=None,
+        skip_existing=None,
+    )
+    options.update(kwargs)
+    download(**options)
+    return capsys.readouterr().out
+
+
+@pytest.mark.parametrize("mode", ["mtime", "etag"])
+def test_recursive_skip_existing(login, tmp_path, capsys, mode):
+    run_download(tmp_path, capsys, skip_existing=mode)
+    login.clear()
+
+    out = run_download(tmp_path, capsys, skip_existing=mode)
+
+    assert "Skipped 4 files already downloaded" in out
+    assert "GetObject" not in login
+
+
+def test_skip_existing_mtime_downloads_changed_files(login, tmp_path, capsys):
+    run_download(tmp_path, capsys, skip_existing="mtime")
+    changed = tmp_path / "source" / "empty.txt"
+    changed.write_text("")
+
+    out = run_download(tmp_path, capsys, skip_existing="mtime")
+
+    assert "Skipped 3 files already downloaded" in out
+    assert changed.stat().st_size > 0
+
+
+def test_skip_existing_etag_downloads_touched_files(login, tmp_path, capsys):
+    run_download(tmp_path, capsys, skip_existing="etag")
+    touched = tmp_path / "source" / "empty.txt"
+    os.utime(touched, (0, 0))
+
+    out = run_download(tmp_path, capsys, skip_existing="etag")
+
+    assert "Skipped 3 files already downloaded" in out
+
+
+def test_skip_existing_files_with_if_none_match(login, tmp_path, capsys):
+    keys = ["source/empty.txt", "source/empty2.txt"]
+    run_download(tmp_path, capsys, files=keys, recursive=None, skip_existing="etag")
+    login.clear()
+
+    out = run_download(
+        tmp_path, capsys, files=keys, recursive=None, skip_existing="etag"
+    )
+
+    assert "Skipped 2 files already downloaded" in out
+    assert login == ["HeadObject", "HeadObject"]
+
+
+def test_downloaded_etags_are_written_in_batches(tmp_path):
+    files = []
+    for i in range(3):
+        p = tmp_path / f"file{i}.txt"
+        p.write_text(str(i))
+        files.append(str(p))
+
+    etags = hashing.DownloadedETags(batch_size=2)
+    etags.remember(files[0], '"a"')
+    # Pending ETags are found before they are written
+    assert etags.get(files[0]) == '"a"'
+    with hashing.DownloadedETags() as other:
+        assert other.get(files[0]) is None
+
+    etags.remember(files[1], '"b"')
+    etags.remember(files[2], '"c"')
+    with hashing.DownloadedETags() as other:
+        assert [other.get(f) for f in files] == ['"a"', '"b"', None]
+
+    etags.close()
+    os.utime(files[1], (0, 0))
+    with hashing.DownloadedETags() as other:
+        assert [other.get(f) for f in files] == ['"a"', None, '"c"']
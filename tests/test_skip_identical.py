@@ -0,0 +1,104 @@
+from unittest import mock
+
+import pytest
+from moto import mock_s3
+from typer import Exit
+
+from s3_tool import hashing
+from s3_tool.main import upload
+
+from .test_login_data import bucket_contents
+
+
+@pytest.fixture(autouse=True)
+def hash_cache(tmp_path, monkeypatch):
+    path = tmp_path / "hashes.sqlite3"
+    monkeypatch.setenv("S3_TOOL_HASH_CACHE", str(path))
+    return path
+
+
+def test_file_etags_are_cached(tmp_path, monkeypatch):
+    p = tmp_path / "file.txt"
+    p.write_text("some content")
+    expected = [hashing.file_etag(str(p)), hashing.file_etag(str(p), 5)]
+
+    assert hashing.file_etags([(str(p), None), (str(p), 5)]) == expected
+
+    def rehashed(request):
+        raise AssertionError("Hashed again")
+
+    monkeypatch.setattr(hashing, "_hash", rehashed)
+    assert hashing.file_etags([(str(p), None), (str(p), 5)]) == expected
+
+    monkeypatch.undo()
+    p.write_text("changed content")
+    assert hashing.file_etags([(str(p), None)]) == [hashing.file_etag(str(p))]
+
+
+def upload_folder(root, capsys, **kwargs):
+    options = dict(
+        files=None,
+        upload_from_file=None,
+        manifest_format=None,
+        upload_path="identical",
+        permissions="public-read",
+        threads=2,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        directory=str(root),
+        include=None,
+        exclude=None,
+        pack=None,
+        skip_identical=True,
+    )
+    options.update(kwargs)
+    upload(**options)
+    return capsys.readouterr()
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_skips_identical_files(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    root = tmp_path / "tree"
+    (root / "sub").mkdir(parents=True)
+    for name in ["a.txt", "b.txt", "sub/c.txt"]:
+        (root / name).write_text(name)
+
+    first = upload_folder(root, capsys)
+    assert "Skipped" not in first.out
+
+    second = upload_folder(root, capsys)
+    assert "Skipped 3 identical files" in second.out
+
+    # Same size, different content
+    (root / "b.txt").write_text("B.txt")
+    third = upload_folder(root, capsys)
+    assert "Skipped 2 identical files" in third.out
+
+    files = upload_folder(
+        root, capsys, directory=None, files=[str(root / "a.txt"), str(root / "b.txt")]
+    )
+    assert "Skipped 2 identical files" in files.out
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_missing_files_are_left_for_the_upload(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    for name in ["a.txt", "gone.txt"]:
+        (tmp_path / name).write_text(name)
+    listed = tmp_path / "upload.txt"
+    listed.write_text(f"{tmp_path / 'a.txt'}\n{tmp_path / 'gone.txt'}\n")
+    upload_folder(tmp_path, capsys, directory=None, upload_from_file=str(listed))
+    (tmp_path / "gone.txt").unlink()
+
+    with pytest.raises(Exit):
+        upload_folder(tmp_path, capsys, directory=None, upload_from_file=str(listed))
+
+    out = capsys.readouterr().out
+    assert f"{tmp_path / 'gone.txt'} is not a file!" in out
+    assert "Skipped 1 identical files" in out
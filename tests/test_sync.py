@@ -0,0 +1,161 @@
+import os
+from unittest import mock
+
+from moto import mock_s3
+
+from s3_tool import sync
+from s3_tool.choices.access_types import ACLTypes
+from s3_tool.choices.directions import Directions
+from s3_tool.main import sync_folder
+
+from .test_login_data import bucket_contents
+
+
+def run_sync(local_path, prefix, **kwargs):
+    options = dict(
+        direction=Directions.up,
+        checksum=False,
+        delete=False,
+        dry_run=False,
+        permissions=ACLTypes.private,
+        threads=2,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+    )
+    options.update(kwargs)
+    sync_folder(local_path=str(local_path), prefix=prefix, **options)
+
+
+def local_tree(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "sub" / "b.txt").write_text("bb")
+    return tmp_path
+
+
+def keys(contents, prefix):
+    return sorted(obj.key for obj in contents.objects.filter(Prefix=prefix))
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_sync_up(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    contents = mock_bucket.return_value[0]
+    local_tree(tmp_path)
+
+    run_sync(tmp_path, "synced/")
+
+    assert keys(contents, "synced/") == ["synced/a.txt", "synced/sub/b.txt"]
+    assert contents.Object("synced/sub/b.txt").get()["Body"].read() == b"bb"
+
+    capsys.readouterr()
+    run_sync(tmp_path, "synced/")
+    assert capsys.readouterr().out == "Everything is up to date!\n"
+
+    (tmp_path / "a.txt").write_text("changed")
+    run_sync(tmp_path, "synced/")
+    assert contents.Object("synced/a.txt").get()["Body"].read() == b"changed"
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_sync_down(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    contents = mock_bucket.return_value[0]
+
+    run_sync(tmp_path, "source/", direction=Directions.down)
+
+    assert sorted(sync.scan_local(str(tmp_path))) == [
+        "empty.txt",
+        "empty2.txt",
+        "subdir/empty3.txt",
+        "subdir/empty4.txt",
+    ]
+    last_modified = contents.Object("source/subdir/empty3.txt").last_modified
+    assert (
+        os.path.getmtime(tmp_path / "subdir" / "empty3.txt")
+        == last_modified.timestamp()
+    )
+
+    capsys.readouterr()
+    run_sync(tmp_path, "source/", direction=Directions.down)
+    assert capsys.readouterr().out == "Everything is up to date!\n"
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_sync_delete(mock_bucket, tmp_path):
+    mock_bucket.return_value = bucket_contents()
+    contents = mock_bucket.return_value[0]
+    local_tree(tmp_path)
+
+    run_sync(tmp_path, "source/", delete=True)
+    assert keys(contents, "source/") == ["source/a.txt", "source/sub/b.txt"]
+
+    contents.put_object(Key="source/new.txt", Body=b"new")
+    (tmp_path / "extra.txt").write_text("extra")
+    run_sync(tmp_path, "source/", direction=Directions.down, delete=True)
+    assert sorted(sync.scan_local(str(tmp_path))) == ["a.txt", "new.txt", "sub/b.txt"]
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_sync_dry_run(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    contents = mock_bucket.return_value[0]
+    local_tree(tmp_path)
+
+    run_sync(tmp_path, "source/", delete=True, dry_run=True)
+
+    out = capsys.readouterr().out.splitlines()
+    assert f"upload: {tmp_path / 'a.txt'} -> source/a.txt" in out
+    assert "delete: source/subdir/empty3.txt" in out
+    assert len(out) == 6
+    assert "source/a.txt" not in keys(contents, "source/")
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_sync_checksum(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    contents = mock_bucket.return_value[0]
+    contents.put_object(Key="synced/a.txt", Body=b"a")
+    contents.put_object(Key="synced/b.txt", Body=b"b")
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("c")
+    # Older than the objects, only the content tells them apart
+    os.utime(tmp_path / "a.txt", (0, 0))
+    os.utime(tmp_path / "b.txt", (0, 0))
+
+    run_sync(tmp_path, "synced/")
+    assert capsys.readouterr().out == "Everything is up to date!\n"
+
+    run_sync(tmp_path, "synced/", checksum=True, dry_run=True)
+    assert capsys.readouterr().out == (
+        f"upload: {tmp_path / 'b.txt'} -> synced/b.txt\n"
+    )
+
+
+def test_plan():
+    local = {
+        "same.txt": sync.Entry(1, 100),
+        "newer.txt": sync.Entry(1, 200),
+        "resized.txt": sync.Entry(2, 0),
+        "only_local.txt": sync.Entry(1, 0),
+    }
+    remote = {
+        "same.txt": sync.Entry(1, 100.5),
+        "newer.txt": sync.Entry(1, 100),
+        "resized.txt": sync.Entry(1, 100),
+        "only_remote.txt": sync.Entry(1, 0),
+    }
+
+    assert sync.plan(local, remote, "up") == sync.Plan(
+        ["newer.txt", "only_local.txt", "resized.txt"], [], [], []
+    )
+    assert sync.plan(local, remote, "down", delete=True) == sync.Plan(
+        [], ["only_remote.txt", "resized.txt"], [], ["only_local.txt"]
+    )
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+from botocore.awsrequest import AWSResponse
+from moto import mock_s3
+
+from s3_tool import budget, throttling
+
+from .test_login_data import bucket_contents
+
+SLOW_DOWN = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b"<Error><Code>SlowDown</Code><Message>Please reduce your request rate.</Message></Error>"
+)
+
+
+class RawBody:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+@pytest.fixture
+def settings():
+    throttling.reset()
+    yield
+    throttling.reset()
+
+
+def slow_down_first(client, times):
+    calls = []
+
+    def handler(request, **kwargs):
+        calls.append(request.url)
+        if len(calls) <= times:
+            return AWSResponse(request.url, 503, {}, RawBody(SLOW_DOWN))
+        return None
+
+    client.meta.events.register_first("before-send.s3", handler)
+    return calls
+
+
+@mock_s3
+def test_throttled_requests_are_retried_and_counted(settings):
+    _, _, bucket_name, client = bucket_contents()
+    limiter = budget.attach(client, 4)
+    throttling.attach(client)
+    calls = slow_down_first(client, 1)
+
+    client.head_object(Bucket=bucket_name, Key="empty.txt")
+
+    assert len(calls) == 2
+    assert throttling.events() == {"HeadObject": 1}
+    assert limiter.limit == 2
+    assert limiter.lowest == 2
+    assert limiter._in_flight == 0
+
+
+def test_budget_limit_recovers_while_responses_are_clean():
+    limiter = budget.RequestBudget(8)
+    limiter.throttled()
+    # Responses to requests sent before the cut don't cut again
+    limiter.throttled()
+    assert limiter.limit == 4
+
+    for _ in range(4 + 5 + 6 + 7):
+        limiter.succeeded()
+    assert limiter.limit == 8
+
+    for _ in range(20):
+        limiter.succeeded()
+    assert limiter.limit == 8
+
+
+def test_token_bucket_caps_the_rate():
+    bucket = throttling.TokenBucket(rate=20)
+    start = time.monotonic()
+    for _ in range(30):
+        bucket.acquire()
+
+    # The first 20 go through as a burst, the next 10 take half a second
+    assert 0.4 < time.monotonic() - start < 1
+
+
+def test_retries_settings():
+    assert throttling.retries("adaptive", 5) == {
+        "mode": "adaptive",
+        "total_max_attempts": 5,
+    }
+    assert throttling.retries(max_attempts=0)["total_max_attempts"] == 1
+
+    with pytest.raises(ValueError):
+        throttling.retries("fast")
+
+
+def test_is_throttled():
+    assert throttling.is_throttled({"Error": {"Code": "SlowDown"}})
+    assert throttling.is_throttled({"ResponseMetadata": {"HTTPStatusCode": 503}})
+    assert not throttling.is_throttled({"Error": {"Code": "NoSuchKey"}})
+    assert not throttling.is_throttled(None)
@@ -0,0 +1,130 @@
+from unittest import mock
+
+import pytest
+from moto import mock_s3
+
+from s3_tool.main import list_keys_v2, upload
+from s3_tool.transfer_config import GB, MB, TransferSettings, parse_size
+
+from .test_login_data import bucket_contents
+
+
+def test_parse_size():
+    assert parse_size("1048576") == MB
+    assert parse_size("512KB") == 512 * 1024
+    assert parse_size("64mb") == 64 * MB
+    assert parse_size("1.5G") == int(1.5 * GB)
+
+    with pytest.raises(ValueError):
+        parse_size("64 parsecs")
+
+
+def test_default_settings_match_boto3():
+    config = TransferSettings().config_for(10 * GB)
+    assert config.multipart_chunksize == 8 * MB
+    assert config.max_concurrency == 10
+
+
+def test_explicit_settings():
+    settings = TransferSettings(
+        chunk_size="64MB",
+        max_concurrency=20,
+        multipart_threshold="128MB",
+        threads=4,
+        files=10,
+    )
+    config = settings.config_for(10 * GB)
+
+    assert config.multipart_chunksize == 64 * MB
+    assert config.multipart_threshold == 128 * MB
+    assert config.max_concurrency == 20
+    assert settings.pool_size == 80
+
+
+def test_chunk_size_below_s3_minimum():
+    with pytest.raises(ValueError):
+        TransferSettings(chunk_size="1MB")
+
+
+def test_auto_settings_stay_under_max_connections():
+    settings = TransferSettings(
+        chunk_size="auto", max_connections=64, files=100, threads=8
+    )
+
+    big = settings.config_for(40 * GB)
+    assert big.max_concurrency == 8
+    assert 40 * GB / big.multipart_chunksize <= 10000
+    assert settings.pool_size <= 64
+
+    # Small files get a single part and a single connection
+    small = settings.config_for(1 * MB)
+    assert small.max_concurrency == 1
+    assert small.multipart_chunksize == 8 * MB
+
+
+def test_auto_settings_single_file_uses_every_connection():
+    settings = TransferSettings(
+        chunk_size="auto", max_connections=32, files=1, threads=3
+    )
+    config = settings.config_for(10 * GB)
+
+    assert config.max_concurrency == 32
+    assert config.multipart_chunksize == 40 * MB
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_with_transfer_options(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    p = tmp_path / "big.bin"
+    p.write_bytes(b"0" * (6 * MB))
+
+    upload(
+        files=[str(p)],
+        upload_path="multipart",
+        permissions="public-read",
+        threads=1,
+        chunk_size="5MB",
+        max_concurrency=2,
+        multipart_threshold="5MB",
+        max_connections=64,
+        resume=False,
+        directory=None,
+        pack=None,
+        skip_identical=False,
+    )
+
+    list_keys_v2(
+        prefix="multipart/",
+        delimiter="",
+        max_keys=1000,
+        http_prefix=False,
+        limit=0,
+        key_methods="size",
+    )
+
+    assert capsys.readouterr().out == "multipart/big.bin -> 6.0Mb\n"
+    obj = mock_bucket.return_value[0].Object("multipart/big.bin")
+    # Multipart ETags end with the amount of parts
+    assert obj.e_tag.endswith('-2"')
+
+
+def test_upload_with_invalid_chunk_size(tmp_path):
+    p = tmp_path / "file.txt"
+    p.write_text("file")
+
+    with pytest.raises(Exception):
+        upload(
+            files=[str(p)],
+            upload_path="multipart",
+            permissions="public-read",
+            threads=1,
+            chunk_size="lots",
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            directory=None,
+            pack=None,
+            skip_identical=False,
+        )
@@ -40,6 +40,14 @@ def test_upload_one_file(mock_bucket, tmp_path, capsys):
         upload_path="test_upload_one_file",
         permissions="public-read",
         threads=1,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        directory=None,
+        pack=None,
+        skip_identical=False,
     )
 
     list_keys(
@@ -50,6 +58,7 @@ def test_upload_one_file(mock_bucket, tmp_path, capsys):
         all=False,
         http_prefix=False,
         limit=1,
+        index_ttl=0,
     )
 
     captured = capsys.readouterr()
@@ -68,6 +77,14 @@ def test_upload_multiple_files(mock_bucket, tmp_path, capsys):
         upload_path="test_upload_multiple_files",
         permissions="public-read",
         threads=1,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        directory=None,
+        pack=None,
+        skip_identical=False,
     )
 
     list_keys(
@@ -78,6 +95,7 @@ def test_upload_multiple_files(mock_bucket, tmp_path, capsys):
         all=False,
         http_prefix=False,
         limit=10,
+        index_ttl=0,
     )
 
     captured = capsys.readouterr()
@@ -108,6 +126,9 @@ def create_upload_list_for_testing(tmp_path):
         files_path=d,
         file_extension="txt",
         output_path=d,
+        recursive=False,
+        fmt="commas",
+        details=False,
     )
 
     upload_txt_path = Path(os.path.join(d, "upload.txt"))
@@ -124,9 +145,18 @@ def test_upload_from_file(mock_bucket, tmp_path, capsys):
     upload(
         files=None,
         upload_from_file=upload_file,
+        manifest_format=None,
         upload_path="test_upload_from_file",
         permissions="public-read",
         threads=3,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        directory=None,
+        pack=None,
+        skip_identical=False,
     )
 
     list_keys(
@@ -137,6 +167,7 @@ def test_upload_from_file(mock_bucket, tmp_path, capsys):
         all=False,
         http_prefix=False,
         limit=10,
+        index_ttl=0,
     )
 
     captured = capsys.readouterr()
@@ -161,7 +192,153 @@ def test_upload_is_not_file(tmp_path):
         upload(
             files=["None"],
             upload_from_file=None,
+            manifest_format=None,
             upload_path="test_upload_from_file",
             permissions="public-read",
             threads=3,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            directory=None,
+            pack=None,
+            skip_identical=False,
         )
+
+
+def test_upload_without_files(capsys):
+    with pytest.raises(Abort):
+        upload(
+            files=None,
+            upload_from_file=None,
+            manifest_format=None,
+            upload_path="test_upload_without_files",
+            permissions="public-read",
+            threads=3,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            directory=None,
+            pack=None,
+            skip_identical=False,
+        )
+    assert "You must choose at least one file to upload" in capsys.readouterr().out
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_directory(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    root = tmp_path / "tree"
+    for relative in ["a.txt", "b.log", "sub/c.txt", "sub/deeper/d.txt", "skip/e.txt"]:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+
+    upload(
+        files=None,
+        upload_from_file=None,
+        manifest_format=None,
+        upload_path="test_upload_directory",
+        permissions="public-read",
+        threads=3,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        directory=str(root),
+        include=["*.txt"],
+        exclude=["skip"],
+        pack=None,
+        skip_identical=False,
+    )
+
+    list_keys(
+        prefix="test_upload_directory",
+        delimiter="",
+        max_keys=10,
+        key_methods="key",
+        all=False,
+        http_prefix=False,
+        limit=10,
+        index_ttl=0,
+    )
+
+    captured = capsys.readouterr()
+
+    assert captured.out == (
+        "test_upload_directory/a.txt\n"
+        "test_upload_directory/sub/c.txt\n"
+        "test_upload_directory/sub/deeper/d.txt\n"
+    )
+
+
+def test_upload_directory_is_not_folder(tmp_path):
+    with pytest.raises(Abort):
+        upload(
+            files=None,
+            upload_from_file=None,
+            manifest_format=None,
+            upload_path="test_upload_directory",
+            permissions="public-read",
+            threads=3,
+            chunk_size=None,
+            max_concurrency=None,
+            multipart_threshold=None,
+            max_connections=64,
+            resume=False,
+            directory=str(tmp_path / "missing"),
+            pack=None,
+            skip_identical=False,
+        )
+
+
+@mock.patch("s3_tool.main.get_login")
+@mock_s3
+def test_upload_from_lines_manifest(mock_bucket, tmp_path, capsys):
+    mock_bucket.return_value = bucket_contents()
+    d = tmp_path / "upload-files"
+    d.mkdir()
+    for name in ["a, b.txt", "c.txt"]:
+        (d / name).write_text(name)
+    listed = tmp_path / "upload.txt"
+    listed.write_text(f"{d / 'a, b.txt'}\n{d / 'c.txt'}\n")
+
+    upload(
+        files=None,
+        upload_from_file=str(listed),
+        manifest_format=None,
+        upload_path="test_upload_from_lines_manifest",
+        permissions="public-read",
+        threads=2,
+        chunk_size=None,
+        max_concurrency=None,
+        multipart_threshold=None,
+        max_connections=64,
+        resume=False,
+        directory=None,
+        pack=None,
+        skip_identical=False,
+    )
+
+    list_keys(
+        prefix="test_upload_from_lines_manifest",
+        delimiter="",
+        max_keys=10,
+        key_methods="key",
+        all=False,
+        http_prefix=False,
+        limit=10,
+        index_ttl=0,
+    )
+
+    captured = capsys.readouterr()
+
+    assert captured.out == (
+        "test_upload_from_lines_manifest/a, b.txt\n"
+        "test_upload_from_lines_manifest/c.txt\n"
+    )
@@ -0,0 +1,81 @@
+import itertools
+
+from s3_tool import walking
+
+
+def create_tree(tmp_path):
+    root = tmp_path / "tree"
+    for relative in [
+        "a.mp4",
+        "b.txt",
+        "videos/c.mp4",
+        "videos/deep/d.mp4",
+        "videos/deep/e.txt",
+        "node_modules/f.mp4",
+    ]:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+    return root
+
+
+def test_walk_finds_every_file_with_relative_paths(tmp_path):
+    root = create_tree(tmp_path)
+
+    found = sorted(walking.walk(str(root), threads=3))
+
+    assert [relative for _, relative in found] == [
+        "a.mp4",
+        "b.txt",
+        "node_modules/f.mp4",
+        "videos/c.mp4",
+        "videos/deep/d.mp4",
+        "videos/deep/e.txt",
+    ]
+    assert all(path == str(root / relative) for path, relative in found)
+
+
+def test_walk_include_and_exclude(tmp_path):
+    root = create_tree(tmp_path)
+
+    found = walking.walk(str(root), include=["*.mp4"], exclude=["node_modules"])
+
+    assert sorted(relative for _, relative in found) == [
+        "a.mp4",
+        "videos/c.mp4",
+        "videos/deep/d.mp4",
+    ]
+
+
+def test_walk_globs_match_relative_paths(tmp_path):
+    root = create_tree(tmp_path)
+
+    found = walking.walk(str(root), include=["videos/*"], exclude=["*/deep/*.txt"])
+
+    assert sorted(relative for _, relative in found) == [
+        "videos/c.mp4",
+        "videos/deep/d.mp4",
+    ]
+
+
+def test_walk_stops_when_closed_early(tmp_path):
+    root = tmp_path / "many"
+    for i in range(50):
+        (root / f"dir{i}").mkdir(parents=True)
+        for j in range(20):
+            (root / f"dir{i}" / f"{j}.txt").write_text("")
+
+    found = walking.walk(str(root), max_queued=5)
+    first = list(itertools.islice(found, 10))
+    found.close()
+
+    assert len(first) == 10
+
+
+def test_walk_reports_unreadable_folders(tmp_path):
+    errors = []
+
+    found = list(walking.walk(str(tmp_path / "missing"), onerror=errors.append))
+
+    assert found == []
+    assert len(errors) == 1